@@ -1,5 +1,5 @@
 from feasp import Feasp
-from feasp import render_template, url_for, redirect, make_response, connect, request, session, current_app
+from feasp import render_template, stream_template, url_for, redirect, make_response, connect, request, session, current_app
 
 
 """
@@ -106,6 +106,13 @@ def for_list():
     return render_template("For_list.html", name_list=name_list)
 
 
+@app.route("/stream_list", methods=["GET"])
+def stream_list():
+    # 很长的页面可以边渲染边发送，客户端无需等待整个页面渲染完毕
+    name_list = [f"XueFeng{i}" for i in range(10000)]
+    return stream_template("For_list.html", name_list=name_list)
+
+
 @app.route("/make_resp", methods=["GET"])
 def make_resp():
     # 为你提供了工具函数，并可使用它返回一个可自定义的响应
@@ -131,6 +138,13 @@ def if_and_for():
     return render_template("If_For.html", name_list=name_list)
 
 
+@app.route("/extends", methods=["GET"])
+def extends():
+    # 模板支持Extends/Block继承、Include包含以及For与If的相互嵌套
+    name_list = ["XueLian", "XueXue", "XueFeng"]
+    return render_template("extends.html", name_list=name_list)
+
+
 @app.route("/save_to_db", methods=["GET", "POST"])
 def save_to_db():
     with connect("feasp.db") as handler:
@@ -1,15 +1,61 @@
-from .feasp import Feasp
-from .feasp import render_template, url_for, redirect, make_response, connect, request, session, current_app
+import importlib
+
+from .feasp import Feasp, SimpleSqlite
+from .feasp import render_template, stream_template, event_stream, url_for, bundle, redirect, remaining_time, make_response, connect, write_behind, request, session, current_app
+
+
+# 以下名称在第一次访问时才导入其所在的模块，以缩短import feasp的耗时，见__getattr__
+_LAZY_NAMES: dict[str, str] = {
+    "Markup": ".template",
+    "SessionInterface": ".sessions",
+    "MemorySessionStore": ".sessions",
+    "SqliteSessionStore": ".sessions",
+    "AdmissionControl": ".admission",
+    "Watchdog": ".watchdog",
+    "MemoryProfiler": ".memory",
+    "BackgroundQueue": ".background",
+    "RateLimit": ".ratelimit",
+    "MemoryBucketStore": ".ratelimit",
+    "SqliteBucketStore": ".ratelimit",
+    "EventHub": ".sse",
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
 
 
 __all__ = [
-    Feasp,
-    render_template,
-    url_for,
-    redirect,
-    make_response,
-    connect,
-    request,
-    session,
-    current_app
+    "Feasp",
+    "Markup",
+    "SimpleSqlite",
+    "render_template",
+    "stream_template",
+    "event_stream",
+    "url_for",
+    "bundle",
+    "redirect",
+    "remaining_time",
+    "make_response",
+    "connect",
+    "write_behind",
+    "request",
+    "session",
+    "current_app",
+    "SessionInterface",
+    "MemorySessionStore",
+    "SqliteSessionStore",
+    "AdmissionControl",
+    "Watchdog",
+    "MemoryProfiler",
+    "BackgroundQueue",
+    "RateLimit",
+    "MemoryBucketStore",
+    "SqliteBucketStore",
+    "EventHub"
 ]
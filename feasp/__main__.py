@@ -0,0 +1,51 @@
+"""
+Feasp的命令行工具，使用示例：
+  python -m feasp precompile example --cache-dir .feasp_cache
+"""
+
+
+import os
+import sys
+import argparse
+
+from .template import TemplateLoader
+from .template import BytecodeCache
+from .config import TemplateSyntaxError
+
+
+def precompile(app_dir: str, cache_dir: str) -> int:
+    """
+      编译app_dir/templates下的所有模板并保存至磁盘缓存，
+      cache_dir为相对路径时相对于app_dir，应与Feasp(template_cache_dir=...)保持一致
+    """
+    app_dir = os.path.abspath(app_dir)
+    loader = TemplateLoader(
+        os.path.join(app_dir, "templates"),
+        bytecode_cache=BytecodeCache(os.path.join(app_dir, cache_dir)))
+    try:
+        names = loader.precompile()
+    except TemplateSyntaxError as e:
+        print(f"precompile failed: {e}", file=sys.stderr)
+        return 1
+    for name in names:
+        print(f"compiled {name}")
+    print(f"{len(names)} templates compiled into {loader.bytecode_cache.directory}")
+    return 0
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m feasp")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    precompile_parser = commands.add_parser("precompile", help="compile all templates into the disk cache")
+    precompile_parser.add_argument("app_dir", help="directory of the app, which contains `templates`")
+    precompile_parser.add_argument("--cache-dir", default=".feasp_cache", help="cache directory relative to app_dir")
+
+    args = parser.parse_args(argv)
+    if args.command == "precompile":
+        return precompile(args.app_dir, args.cache_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
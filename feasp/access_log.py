@@ -0,0 +1,215 @@
+"""
+Feasp的访问日志：请求线程只将日志记录追加至队列，
+由后台线程格式化并批量写入文件，写日志不会阻塞请求的处理，
+支持combined与json两种格式、按大小轮转与按比例采样
+"""
+
+
+import os
+import sys
+import json
+import time
+import atexit
+import random
+import threading
+import typing as t
+
+from collections import deque
+from wsgiref.simple_server import WSGIRequestHandler
+
+
+class AccessLogger:
+    """
+      AccessLogger在请求线程中只做一次deque.append（在GIL下是原子操作，无需加锁），
+      后台线程每隔flush_interval秒或积累batch_size条记录时将它们格式化并一次写入，
+      fmt为"combined"（Apache/Nginx的combined格式）或"json"（每行一个JSON对象），
+      path为None时写入标准错误，max_bytes大于0时日志文件超过该大小后轮转，保留backup_count个旧文件，
+      sample_rate小于1时只记录部分请求，状态码为5xx的请求总是被记录，
+      队列中的记录超过maxsize时新的记录被丢弃并计入dropped
+      使用代码示例:
+        app.run("127.0.0.1", 8000, access_log=AccessLogger("access.log", fmt="json", sample_rate=0.1))
+    """
+
+    def __init__(
+            self,
+            path: t.Optional[str] = None,
+            fmt: str = "combined",
+            batch_size: int = 256,
+            flush_interval: float = 1.0,
+            max_bytes: int = 0,
+            backup_count: int = 5,
+            sample_rate: float = 1.0,
+            maxsize: int = 100000
+    ) -> None:
+        if fmt not in ("combined", "json"):
+            raise ValueError(f"unknown access log format: {fmt}")
+        self.path: t.Optional[str] = path
+        self.fmt: str = fmt
+        self.batch_size: int = batch_size
+        self.flush_interval: float = flush_interval
+        self.max_bytes: int = max_bytes
+        self.backup_count: int = backup_count
+        self.sample_rate: float = sample_rate
+        self.maxsize: int = maxsize
+
+        self._queue: deque = deque()
+        self._wakeup: threading.Event = threading.Event()
+        # 后台线程与flush可能同时写入，写入时需持有此锁
+        self._write_lock: threading.Lock = threading.Lock()
+        self._closed: bool = False
+        self._stream: t.Optional[t.TextIO] = None
+        self._size: int = 0
+        # 同一秒内的请求共用格式化后的时间
+        self._last_second: int = -1
+        self._last_time: str = ""
+
+        # 统计信息：写入的记录数量与因队列已满而丢弃的记录数量
+        self.written: int = 0
+        self.dropped: int = 0
+
+        self._thread: threading.Thread = threading.Thread(target=self._run, name="feasp-access-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(
+            self,
+            remote_addr: str,
+            request_line: str,
+            status: int,
+            size: int,
+            referer: str = "-",
+            user_agent: str = "-",
+            duration: float = 0.0
+    ) -> None:
+        """ 在请求线程中调用，只追加一条记录，格式化与写入由后台线程完成 """
+        if self.sample_rate < 1.0 and status < 500 and random.random() >= self.sample_rate:
+            return
+        queue = self._queue
+        if len(queue) >= self.maxsize:
+            self.dropped += 1
+            return
+        queue.append((time.time(), remote_addr, request_line, status, size, referer, user_agent, duration))
+        if len(queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def _format_time(self, timestamp: float) -> str:
+        second = int(timestamp)
+        if second != self._last_second:
+            self._last_second = second
+            self._last_time = time.strftime("%d/%b/%Y:%H:%M:%S %z", time.localtime(second))
+        return self._last_time
+
+    def _format(self, record: tuple) -> str:
+        timestamp, remote_addr, request_line, status, size, referer, user_agent, duration = record
+        if self.fmt == "json":
+            return json.dumps({
+                "time": self._format_time(timestamp),
+                "remote_addr": remote_addr,
+                "request": request_line,
+                "status": status,
+                "size": size,
+                "referer": referer,
+                "user_agent": user_agent,
+                "duration_ms": round(duration * 1000, 3),
+            }, ensure_ascii=False)
+        return (f'{remote_addr} - - [{self._format_time(timestamp)}] "{request_line}" {status} '
+                f'{size if size else "-"} "{referer}" "{user_agent}"')
+
+    def _open(self) -> t.TextIO:
+        if self.path is None:
+            return sys.stderr
+        stream = open(self.path, "a", encoding="utf-8")
+        self._size = stream.tell()
+        return stream
+
+    def _rotate(self) -> None:
+        """ access.log -> access.log.1 -> access.log.2 ...，超出backup_count的文件被删除 """
+        self._stream.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._stream = self._open()
+
+    def _drain(self) -> None:
+        with self._write_lock:
+            self._write_all()
+
+    def _write_all(self) -> None:
+        queue = self._queue
+        while queue:
+            lines = []
+            while queue and len(lines) < self.batch_size:
+                lines.append(self._format(queue.popleft()))
+            data = "\n".join(lines) + "\n"
+            if self._stream is None:
+                self._stream = self._open()
+            try:
+                self._stream.write(data)
+                self._stream.flush()
+            except (OSError, ValueError):
+                # 日志写入失败不应影响服务，丢弃这一批记录
+                self.dropped += len(lines)
+                continue
+            self.written += len(lines)
+            if self.path is not None and self.max_bytes > 0:
+                self._size += len(data.encode("utf-8"))
+                if self._size >= self.max_bytes:
+                    self._rotate()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+        self._drain()
+
+    def flush(self) -> None:
+        """ 在调用线程中写入队列中的所有记录，用于测试或需要立即落盘的场景 """
+        self._drain()
+
+    def close(self) -> None:
+        """ 写入剩余的记录并结束后台线程 """
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        if self._stream is not None and self._stream is not sys.stderr:
+            self._stream.close()
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Path: {self.path or '<stderr>'} Format: {self.fmt} Pending: {len(self._queue)}>"
+
+
+class AccessLogHandler(WSGIRequestHandler):
+    """
+      将访问日志交给access_logger的WSGIRequestHandler，
+      access_logger为None时不记录访问日志，错误信息仍写入标准错误
+    """
+
+    access_logger: t.Optional[AccessLogger] = None
+
+    def handle(self) -> None:
+        self._start_time = time.perf_counter()
+        super().handle()
+
+    def log_request(self, code: t.Union[int, str] = '-', size: t.Union[int, str] = '-') -> None:
+        logger = self.access_logger
+        if logger is None:
+            return
+        headers = getattr(self, "headers", None)
+        logger.log(
+            # Unix域套接字的连接没有客户端地址
+            (self.client_address[0] if self.client_address else "") or "-",
+            self.requestline,
+            int(code) if str(code).isdigit() else 0,
+            size if isinstance(size, int) else 0,
+            headers.get("Referer", "-") if headers is not None else "-",
+            headers.get("User-Agent", "-") if headers is not None else "-",
+            time.perf_counter() - getattr(self, "_start_time", time.perf_counter()),
+        )
@@ -0,0 +1,100 @@
+"""
+Feasp的准入控制：限制同时处理的请求数量与排队等待的请求数量，
+排队已满时立即以503拒绝新的请求（load shedding），而不是让所有请求一起变慢，
+健康检查与静态文件走单独的优先通道，不会排在普通请求之后
+"""
+
+
+import threading
+import typing as t
+
+
+class AdmissionControl:
+    """
+      AdmissionControl最多同时处理max_concurrency个普通请求与priority_concurrency个优先请求，
+      通道已满时请求最多排队queue_timeout秒，排队的请求超过max_queue个时新的请求被立即拒绝，
+      被拒绝的请求返回503并带有Retry-After: retry_after，
+      priority_paths中的路径与静态文件请求走优先通道，需配合多线程服务器使用
+      使用代码示例:
+        app.admission_control = AdmissionControl(max_concurrency=32, max_queue=64)
+        app.run("127.0.0.1", 8000, threaded=True)
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int = 64,
+            max_queue: int = 128,
+            queue_timeout: float = 5.0,
+            retry_after: int = 1,
+            priority_paths: t.Iterable[str] = ("/health",),
+            priority_concurrency: int = 16
+    ) -> None:
+        self.max_concurrency: int = max_concurrency
+        self.max_queue: int = max_queue
+        self.queue_timeout: float = queue_timeout
+        self.retry_after: int = retry_after
+        self.priority_paths: frozenset[str] = frozenset(priority_paths)
+        self.priority_concurrency: int = priority_concurrency
+
+        self._normal: threading.BoundedSemaphore = threading.BoundedSemaphore(max_concurrency)
+        self._priority: threading.BoundedSemaphore = threading.BoundedSemaphore(priority_concurrency)
+        self._lock: threading.Lock = threading.Lock()
+
+        # 统计信息：正在处理的请求数量、排队的请求数量、被拒绝的请求数量
+        self.in_flight: int = 0
+        self.waiting: int = 0
+        self.shed: int = 0
+
+    def acquire(self, priority: bool = False) -> t.Optional[threading.BoundedSemaphore]:
+        """ 获取一个处理请求的名额，返回需要在请求结束后交还的通道，被拒绝时返回None """
+        lane = self._priority if priority else self._normal
+        if not lane.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.max_queue:
+                    self.shed += 1
+                    return None
+                self.waiting += 1
+            try:
+                admitted = lane.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not admitted:
+                with self._lock:
+                    self.shed += 1
+                return None
+        with self._lock:
+            self.in_flight += 1
+        return lane
+
+    def release(self, lane: threading.BoundedSemaphore) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        lane.release()
+
+    def __repr__(self) -> str:
+        return (f"<{type(self).__name__} In-flight: {self.in_flight}/{self.max_concurrency} "
+                f"Waiting: {self.waiting}/{self.max_queue} Shed: {self.shed}>")
+
+
+class ReleasingIterable:
+    """
+      包装WSGI应用返回的可迭代对象，服务器调用close（正文发送完毕）时交还通道，
+      这样流式响应在发送期间仍然占用名额
+    """
+
+    def __init__(self, body: t.Iterable[bytes], release: t.Callable[[], None]) -> None:
+        self.body: t.Iterable[bytes] = body
+        self._release: t.Optional[t.Callable[[], None]] = release
+
+    def __iter__(self) -> t.Iterator[bytes]:
+        return iter(self.body)
+
+    def close(self) -> None:
+        try:
+            if hasattr(self.body, "close"):
+                self.body.close()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
@@ -0,0 +1,249 @@
+"""
+Feasp的静态资源打包：将多个CSS或JS文件合并为一个文件并压缩，
+打包结果保存在内存中并作为静态文件提供，源文件修改后在清单刷新时重新打包
+"""
+
+
+import re
+import typing as t
+
+from .config import FeaspNotFound
+from .template import Markup
+
+
+# CSS中的字符串与注释，字符串原样保留，注释被删除
+_CSS_STRING_OR_COMMENT_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+_CSS_STRING_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', re.S)
+_CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,>])\s*')
+
+# JS中出现在这些字符之后的`/`是正则表达式的开始而不是除号
+_JS_REGEX_PREFIX: str = "(,=:[!&|?{};+-*%<>~^"
+_JS_REGEX_KEYWORDS: frozenset = frozenset({
+    "return", "typeof", "instanceof", "in", "of", "new", "delete", "void",
+    "throw", "case", "do", "else", "yield", "await",
+})
+# 换行前后为这些字符时可以安全地删除换行，`++`、`--`与正则表达式之后的换行需要保留
+_JS_NEWLINE_SKIP_BEFORE: str = "{[(,;:=*%<>&|!?"
+_JS_NEWLINE_SKIP_AFTER: str = "}]),;:=.?"
+
+
+def minify_css(source: str) -> str:
+    """ 删除注释与多余的空白，字符串中的内容保持不变 """
+    source = _CSS_STRING_OR_COMMENT_RE.sub(lambda m: m.group(1) or ' ', source)
+    parts = _CSS_STRING_RE.split(source)
+    # split之后奇数位置为字符串
+    for i in range(0, len(parts), 2):
+        part = re.sub(r'\s+', ' ', parts[i])
+        part = _CSS_PUNCTUATION_RE.sub(r'\1', part)
+        parts[i] = re.sub(r':\s+', ':', part).replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c in "_$\\" or c > '\x7f'
+
+
+def _skip_string(source: str, i: int, quote: str) -> int:
+    """ 返回从i开始的字符串（或模板字符串）结束后的位置 """
+    n = len(source)
+    i += 1
+    while i < n:
+        c = source[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == quote:
+            return i + 1
+        i += 1
+    return n
+
+
+def _skip_regex(source: str, i: int) -> int:
+    """ 返回从i开始的正则表达式字面量（包括标志）结束后的位置 """
+    n = len(source)
+    i += 1
+    in_class = False
+    while i < n:
+        c = source[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '\n':
+            return i
+        if c == '[':
+            in_class = True
+        elif c == ']':
+            in_class = False
+        elif c == '/' and not in_class:
+            i += 1
+            while i < n and _is_word_char(source[i]):
+                i += 1
+            return i
+        i += 1
+    return n
+
+
+def minify_js(source: str) -> str:
+    """
+      删除注释与多余的空白，字符串、模板字符串与正则表达式字面量保持不变，
+      可能影响自动分号插入的换行会被保留，因此压缩结果与源代码的语义一致
+    """
+    out = []
+    last = ''   # 最后输出的非空白字符
+    last_token = ''
+    pending = ''   # 尚未输出的空白，'\n'或' '
+    i, n = 0, len(source)
+    while i < n:
+        c = source[i]
+        if c in " \t\r\n\f\v" or source.startswith("//", i) or source.startswith("/*", i):
+            if c == '/' and source[i + 1] == '/':
+                end = source.find('\n', i)
+                i = n if end == -1 else end
+                continue
+            if c == '/':
+                end = source.find("*/", i + 2)
+                end = n if end == -1 else end + 2
+                comment, i = source[i:end], end
+                pending = '\n' if '\n' in comment or pending == '\n' else ' '
+                continue
+            if c == '\n':
+                pending = '\n'
+            elif not pending:
+                pending = ' '
+            i += 1
+            continue
+
+        if c in "'\"`":
+            end = _skip_string(source, i, c)
+        elif c == '/' and (not last or last in _JS_REGEX_PREFIX or last_token in _JS_REGEX_KEYWORDS):
+            end = _skip_regex(source, i)
+        elif _is_word_char(c):
+            end = i + 1
+            while end < n and _is_word_char(source[end]):
+                end += 1
+        else:
+            end = i + 1
+
+        if pending and last:
+            if pending == '\n' and last not in _JS_NEWLINE_SKIP_BEFORE and c not in _JS_NEWLINE_SKIP_AFTER:
+                out.append('\n')
+            elif (_is_word_char(last) and _is_word_char(c)) or (last == c and c in "+-"):
+                out.append(' ')
+        pending = ''
+        token = source[i:end]
+        out.append(token)
+        last, last_token = token[-1], token
+        i = end
+    return "".join(out)
+
+
+class Bundle:
+    """
+      Bundle描述一个打包后的文件，name的扩展名决定其类型（.css或.js），
+      files为相对于挂载点mount的源文件列表，按顺序合并
+    """
+
+    def __init__(self, name: str, files: list[str], mount: str = "static") -> None:
+        if name.endswith(".css"):
+            self.kind: str = "css"
+        elif name.endswith(".js"):
+            self.kind: str = "js"
+        else:
+            raise ValueError(f"bundle name must end with .css or .js: {name}")
+        self.name: str = name
+        self.files: list[str] = list(files)
+        self.mount: str = mount
+        # 源文件的(路径, 修改时间, 大小)，与清单中的不同时重新打包
+        self.signature: t.Optional[tuple] = None
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name}: {self.files}>"
+
+
+class AssetBundler:
+    """
+      AssetBundler管理所有的Bundle，打包后的文件位于挂载点的URL前缀之下，
+      例如 Bundle("site.css", ["reset.css", "style.css"]) -> /static/site.3f9a1c2b.css，
+      源文件的修改时间与大小直接来自静态文件清单，检查是否需要重新打包不会访问文件系统
+      使用代码示例:
+        app.add_bundle("site.css", ["reset.css", "style.css"])
+        模板中: {{ bundle('site.css') }}
+    """
+
+    def __init__(self, manifest: t.Any, minify: bool = True) -> None:
+        self.manifest: t.Any = manifest
+        self.minify: bool = minify
+        self.bundles: dict[str, Bundle] = {}
+        manifest.add_listener(self.rebuild)
+
+    def add(self, name: str, files: list[str], mount: str = "static") -> Bundle:
+        bundle = Bundle(name, files, mount)
+        self.build(bundle)
+        self.bundles[name] = bundle
+        return bundle
+
+    def _url_path(self, bundle: Bundle) -> str:
+        mount = self.manifest.mounts.get(bundle.mount)
+        if mount is None:
+            raise FeaspNotFound(f"not found static mount: {bundle.mount}")
+        return f"{mount[0]}/{bundle.name}"
+
+    def build(self, bundle: Bundle) -> bool:
+        """ 源文件有变化时重新打包，返回是否重新打包 """
+        url_prefix = self._url_path(bundle).rpartition('/')[0]
+        entries = []
+        for filename in bundle.files:
+            entry = self.manifest.lookup(f"{url_prefix}/{filename.lstrip('/')}")
+            if entry is None or entry.filepath is None:
+                raise FeaspNotFound(f"not found file of bundle {bundle.name}: {filename}")
+            entries.append(entry)
+        signature = tuple((entry.url_path, entry.mtime, entry.size) for entry in entries)
+        if signature == bundle.signature:
+            return False
+
+        sources = []
+        for entry in entries:
+            content = self.manifest.read(entry)
+            if not isinstance(content, bytes):
+                content = b"".join(content)
+            sources.append(content.decode("utf-8"))
+        if bundle.kind == "css":
+            text = "\n".join(sources)
+            mimetype = "text/css"
+            if self.minify:
+                text = minify_css(text)
+        else:
+            # 以分号分隔，避免一个文件的结尾与下一个文件的开头被连在一起解析
+            text = ";\n".join(sources)
+            mimetype = "text/javascript"
+            if self.minify:
+                text = minify_js(text)
+        self.manifest.add_virtual(self._url_path(bundle), text.encode("utf-8"), mimetype)
+        bundle.signature = signature
+        return True
+
+    def rebuild(self) -> None:
+        """ 清单刷新后调用，只重新打包源文件有变化的Bundle """
+        for bundle in list(self.bundles.values()):
+            try:
+                self.build(bundle)
+            except FeaspNotFound:
+                # 源文件被删除时保留上一次的打包结果
+                continue
+
+    def url_for(self, name: str) -> str:
+        bundle = self.bundles.get(name)
+        if bundle is None:
+            raise FeaspNotFound(f"not found bundle: {name}")
+        entry = self.manifest.lookup(self._url_path(bundle))
+        return entry.fingerprinted_path or entry.url_path
+
+    def tag(self, name: str) -> Markup:
+        """ 返回引用打包后文件的<link>或<script>标签 """
+        url = self.url_for(name)
+        if self.bundles[name].kind == "css":
+            return Markup(f'<link rel="stylesheet" href="{url}">')
+        return Markup(f'<script src="{url}"></script>')
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Bundles: {list(self.bundles)}>"
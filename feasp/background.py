@@ -0,0 +1,118 @@
+"""
+Feasp的后台任务：视图通过app.background提交的任务在响应正文发送完毕之后才进入有界的执行器，
+发送邮件、写入统计等不影响响应内容的工作不会拖慢客户端收到响应
+"""
+
+
+import sys
+import functools
+import threading
+import traceback
+import typing as t
+
+from .config import BackgroundQueueFull
+
+
+class BackgroundQueue:
+    """
+      BackgroundQueue在执行器中执行任务，默认为最多max_workers个线程的线程池，
+      CPU密集的任务可传入executor=ProcessPoolExecutor()（此时任务及其参数需要可以被pickle），
+      最多max_queue个任务在等待或执行，队列已满时submit最多等待submit_timeout秒，
+      仍然已满时抛出BackgroundQueueFull，已关闭时抛出RuntimeError，任务不会在提交它的线程中执行，
+      任务抛出的异常写入标准错误，不影响其它任务
+      使用代码示例:
+        app.background_queue = BackgroundQueue(max_workers=8, max_queue=4096)
+        app.background_queue = BackgroundQueue(max_queue=64, executor=ProcessPoolExecutor(4))
+    """
+
+    def __init__(
+            self,
+            max_workers: int = 4,
+            max_queue: int = 1024,
+            executor: t.Any = None,
+            submit_timeout: t.Optional[float] = 0.0
+    ) -> None:
+        self.max_workers: int = max_workers
+        self.max_queue: int = max_queue
+        self.submit_timeout: t.Optional[float] = submit_timeout
+        self._executor: t.Any = executor
+        # 只关闭自己创建的执行器，传入的执行器由调用者管理
+        self._own_executor: bool = executor is None
+        self._lock: threading.Lock = threading.Lock()
+        # 任务结束时通知，drain等待队列清空，submit等待空位
+        self._changed: threading.Condition = threading.Condition(self._lock)
+        self._closed: bool = False
+
+        # 统计信息：等待或正在执行的任务数量（队列深度）及其最大值，
+        # 执行完毕与抛出异常（或被取消）的任务数量，因队列已满而被拒绝的任务数量
+        self.pending: int = 0
+        self.max_pending: int = 0
+        self.completed: int = 0
+        self.failed: int = 0
+        self.rejected: int = 0
+
+    def submit(self, fn: t.Callable, *args: t.Any, **kwargs: t.Any) -> t.Any:
+        """
+          提交任务，返回执行器的Future
+          :raise BackgroundQueueFull 队列在submit_timeout秒内一直是满的
+          :raise RuntimeError 队列已关闭
+        """
+        with self._changed:
+            if not self._changed.wait_for(lambda: self._closed or self.pending < self.max_queue, self.submit_timeout):
+                self.rejected += 1
+                raise BackgroundQueueFull(f"background queue is full ({self.max_queue} pending)")
+            if self._closed:
+                raise RuntimeError("background queue is closed")
+            self.pending += 1
+            self.max_pending = max(self.max_pending, self.pending)
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="feasp-background")
+            executor = self._executor
+        try:
+            future = executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            # 执行器已关闭（例如解释器正在退出）
+            self._finish(None)
+            raise
+        future.add_done_callback(functools.partial(self._done, fn))
+        return future
+
+    def _done(self, fn: t.Callable, future: t.Any) -> None:
+        error = None if future.cancelled() else future.exception()
+        if error is not None:
+            sys.stderr.write(f"Exception in background task {getattr(fn, '__name__', fn)}:\n"
+                             f"{''.join(traceback.format_exception(type(error), error, error.__traceback__))}")
+        self._finish(not future.cancelled() and error is None)
+
+    def _finish(self, succeeded: t.Optional[bool]) -> None:
+        with self._changed:
+            self.pending -= 1
+            if succeeded:
+                self.completed += 1
+            elif succeeded is not None:
+                self.failed += 1
+            self._changed.notify_all()
+
+    def drain(self, timeout: t.Optional[float] = None) -> bool:
+        """ 等待已提交的任务全部执行完毕，超时返回False """
+        with self._changed:
+            return self._changed.wait_for(lambda: self.pending == 0, timeout)
+
+    def shutdown(self, timeout: t.Optional[float] = None) -> bool:
+        """
+          停止接收新任务（之后的submit抛出RuntimeError），最多等待timeout秒让已提交的任务执行完毕，
+          超时后取消尚未开始的任务，返回所有任务是否都已执行完毕
+        """
+        with self._changed:
+            self._closed = True
+            executor = self._executor
+            # 唤醒正在等待空位的提交者
+            self._changed.notify_all()
+        drained = self.drain(timeout)
+        if executor is not None and self._own_executor:
+            executor.shutdown(wait=drained, cancel_futures=not drained)
+        return drained
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Workers: {self.max_workers} Pending: {self.pending}>"
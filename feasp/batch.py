@@ -0,0 +1,169 @@
+"""
+Feasp的批量请求：客户端在一个POST请求中发送多个子请求，
+子请求在进程内直接通过Feasp.dispatch处理，不经过网络与WSGI服务器，
+相互独立的子请求在线程池中并行处理，所有结果合并为一个JSON响应
+"""
+
+
+import io
+import json
+import base64
+import threading
+import typing as t
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import FEASP_ERROR
+from .static import is_text_mimetype
+
+
+# 这些方法不会修改服务端状态，连续的此类子请求可以并行处理
+SAFE_METHODS: frozenset = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# 子请求不继承的外层请求字段
+_BODY_KEYS: tuple = ("CONTENT_TYPE", "CONTENT_LENGTH", "QUERY_STRING")
+
+
+class BatchHandler:
+    """
+      BatchHandler处理批量请求，请求体为子请求的JSON数组，每个子请求形如：
+        {"method": "GET", "path": "/api/user?id=1", "headers": {"X-Token": "..."}, "body": {...}}
+      响应为同样顺序的JSON数组，每一项形如：
+        {"status": 200, "headers": {...}, "body": ...}
+      JSON类型的子响应body为解析后的值，文本为字符串，二进制内容为base64编码并带有"encoding": "base64"，
+      正文为生成器的流式响应不被支持，其结果为400，
+      子请求继承外层请求的Cookie等请求头，并与外层请求共享同一个会话，会话由外层请求加载与保存一次，
+      子响应的Set-Cookie不会出现在结果中（避免绕过HttpOnly），而是合并至外层响应，
+      连续的GET/HEAD/OPTIONS子请求并行处理，其它方法的子请求单独按顺序处理，
+      保证写操作之间以及写操作前后的读操作的顺序
+    """
+
+    def __init__(self, app: t.Any, path: str, max_requests: int = 32, max_workers: int = 4) -> None:
+        self.app: t.Any = app
+        self.path: str = path
+        self.max_requests: int = max_requests
+        self.max_workers: int = max_workers
+        self._executor: t.Optional[ThreadPoolExecutor] = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="feasp-batch")
+            return self._executor
+
+    def build_environ(self, base: dict, item: dict) -> dict:
+        """ 以外层请求的environ为基础构建子请求的environ """
+        path, _, query = str(item.get("path", "/")).partition('?')
+        body = item.get("body")
+        if body is None:
+            data = b""
+        elif isinstance(body, str):
+            data = body.encode("utf-8")
+        else:
+            data = json.dumps(body).encode("utf-8")
+
+        environ = {k: v for k, v in base.items() if k not in _BODY_KEYS}
+        environ["REQUEST_METHOD"] = str(item.get("method", "GET")).upper()
+        environ["PATH_INFO"] = path
+        environ["QUERY_STRING"] = query
+        environ["wsgi.input"] = io.BytesIO(data)
+        environ["CONTENT_LENGTH"] = str(len(data))
+        if body is not None and not isinstance(body, str):
+            environ["CONTENT_TYPE"] = "application/json"
+        for key, value in (item.get("headers") or {}).items():
+            key = key.upper().replace('-', '_')
+            if key not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                key = f"HTTP_{key}"
+            environ[key] = str(value)
+        return environ
+
+    def run_one(self, environ: dict, parent: t.Any = None, cookies: t.Optional[list] = None) -> dict:
+        """
+          在当前线程中处理一个子请求，返回其结果，parent为外层请求的上下文，
+          子请求使用外层请求的会话，通过app.background提交的任务随外层请求一起执行，
+          子响应的Set-Cookie从结果中移除并加入cookies
+        """
+        app = self.app
+        if environ["PATH_INFO"] == self.path:
+            body, mimetype, status = FEASP_ERROR["HTTP_400"]
+            return {"status": status, "headers": {"Content-Type": mimetype}, "body": "nested batch is not allowed"}
+
+        with app.request_context(environ) as req_ctx:
+            if parent is not None:
+                req_ctx.parent = parent
+                req_ctx.background_tasks = parent.background_tasks
+            request = req_ctx.request
+            body, mimetype, status, *headers = app.dispatch(request.path, request.method)
+            response = app.make_response(body, mimetype, status, *headers)
+
+        result = {"status": response.status, "headers": {}}
+        for key, value in [*response.headers.items(), *response.header_list]:
+            if key.lower() == "set-cookie":
+                if cookies is not None:
+                    cookies.append(value)
+            else:
+                result["headers"].setdefault(key, value)
+
+        body = response.body
+        if not isinstance(body, (str, bytes)):
+            # 流式正文（例如事件流）可能永远不会结束，也可能很大，不在批量请求中读取
+            close = getattr(body, "close", None)
+            if close is not None:
+                close()
+            _, mimetype, status = FEASP_ERROR["HTTP_400"]
+            return {"status": status, "headers": {"Content-Type": mimetype},
+                    "body": "streaming responses are not supported in batch"}
+        mimetype = response.mimetype or "text/html"
+        if mimetype == "application/json":
+            try:
+                result["body"] = json.loads(body)
+            except ValueError:
+                result["body"] = body if isinstance(body, str) else body.decode("utf-8", "replace")
+        elif isinstance(body, str):
+            result["body"] = body
+        elif is_text_mimetype(mimetype):
+            result["body"] = body.decode("utf-8")
+        else:
+            result["body"] = base64.b64encode(body).decode("ascii")
+            result["encoding"] = "base64"
+        return result
+
+    def handle(
+            self,
+            environ: dict,
+            items: t.Any,
+            parent: t.Any = None,
+            cookies: t.Optional[list] = None
+    ) -> tuple[t.Union[str, list], int]:
+        """ 处理解析后的请求体，返回(结果, 状态码)，请求体不合法时结果为错误信息，parent与cookies见run_one """
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return "batch body must be a JSON array of objects", 400
+        if len(items) > self.max_requests:
+            return f"batch can contain at most {self.max_requests} requests", 413
+
+        environs = [self.build_environ(environ, item) for item in items]
+        results: list = [None] * len(environs)
+        group: list[int] = []
+
+        def run_group() -> None:
+            if len(group) == 1:
+                results[group[0]] = self.run_one(environs[group[0]], parent, cookies)
+            elif group:
+                executor = self._get_executor()
+                futures = [(i, executor.submit(self.run_one, environs[i], parent, cookies)) for i in group]
+                for i, future in futures:
+                    results[i] = future.result()
+            group.clear()
+
+        for i, sub_environ in enumerate(environs):
+            if sub_environ["REQUEST_METHOD"] in SAFE_METHODS:
+                group.append(i)
+                continue
+            run_group()
+            results[i] = self.run_one(sub_environ, parent, cookies)
+        run_group()
+        return results, 200
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Path: {self.path} Max: {self.max_requests}>"
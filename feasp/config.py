@@ -46,6 +46,7 @@ FEASP_ERROR: dict[str, tuple[str, str, int]] = {
     "HTTP_415": ("<h1>UNSUPPORTED MEDIA TYPE</h1>", "text/html", 415),
     "HTTP_416": ("<h1>REQUESTED RANGE NOT SATISFIABLE</h1>", "text/html", 416),
     "HTTP_417": ("<h1>EXPECTATION FAILED</h1>", "text/html", 417),
+    "HTTP_429": ("<h1>TOO MANY REQUESTS</h1>", "text/html", 429),
     "HTTP_500": ("<h1>INTERNAL SERVER ERROR</h1>", "text/html", 500),
     "HTTP_501": ("<h1>NOT IMPLEMENTED</h1>", "text/html", 501),
     "HTTP_502": ("<h1>BAD GATEWAY</h1>", "text/html", 502),
@@ -91,6 +92,7 @@ REASON_PHRASE: dict[int, str] = {
         415: "UNSUPPORTED MEDIA TYPE",
         416: "REQUESTED RANGE NOT SATISFIABLE",
         417: "EXPECTATION FAILED",
+        429: "TOO MANY REQUESTS",
         500: "INTERNAL SERVER ERROR",
         501: "NOT IMPLEMENTED",
         502: "BAD GATEWAY",
@@ -106,3 +108,23 @@ class FeaspNotFound(Exception):
 
 class NotSupportType(Exception):
     pass
+
+
+class TemplateSyntaxError(Exception):
+    pass
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+class RequestTooLarge(BadRequest):
+    pass
+
+
+class BackgroundQueueFull(Exception):
+    pass
@@ -0,0 +1,30 @@
+"""
+Feasp的ETag与条件请求：根据响应正文或视图提供的版本号生成ETag，
+请求的If-None-Match与之相同时返回不带正文的304
+"""
+
+
+import hashlib
+import typing as t
+
+
+def make_etag(data: bytes, weak: bool = True) -> str:
+    """ 以blake2b哈希生成ETag，正文经过编码后得到的同一份字节总是生成同一个ETag """
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def etag_matches(if_none_match: t.Optional[str], etag: str) -> bool:
+    """ 按弱比较判断If-None-Match是否包含etag，`*`匹配任意ETag """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
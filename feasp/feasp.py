@@ -12,79 +12,167 @@ __version__ = "1.0"
 __license__ = "MIT"
 
 
+import io
 import os
 import re
+import sys
+import time
 import json
+import codecs
+import keyword
+import itertools
 import threading
-import wsgiref
-import sqlite3
+import importlib
+import wsgiref.util
 import warnings
 import typing as t
 
 from threading import local
+from collections.abc import Iterator
 from contextlib import contextmanager
 
 from .config import METHOD
 from .config import FEASP_ERROR
 from .config import REASON_PHRASE
 from .config import FeaspNotFound
+from .config import BackgroundQueueFull
 from .config import NotSupportType
+from .config import DeadlineExceeded
+from .config import BadRequest
+from .config import RequestTooLarge
+from .static import StaticManifest
+from .static import is_text_mimetype
+from .static import IMMUTABLE_CACHE_CONTROL
+from .etag import make_etag
+from .etag import etag_matches
+
+if t.TYPE_CHECKING:
+    import sqlite3
+    from .template import Markup
+    from .template import TemplateLoader
+
+
+# 模板引擎等只在第一次使用时才导入，以缩短import feasp的耗时，见__getattr__
+_LAZY_NAMES: dict[str, str] = {
+    "Markup": ".template",
+    "FeaspTemplate": ".template",
+    "TemplateLoader": ".template",
+    "BytecodeCache": ".template",
+}
+
+# freeze时预先导入的、处理请求的过程中才会用到的模块
+_WARMUP_MODULES: tuple[str, ...] = ("urllib.parse", "concurrent.futures", "traceback")
+
+
+def __getattr__(name: str) -> t.Any:
+    """ 在第一次访问_LAZY_NAMES中的名称时导入其所在的模块，例如 from feasp.feasp import FeaspTemplate """
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __package__), name)
+    globals()[name] = value
+    return value
+
+
+_json_loads: t.Optional[t.Callable[[bytes], t.Any]] = None
+
+
+def _get_json_loads() -> t.Callable[[bytes], t.Any]:
+    """ 安装了orjson时使用orjson解析JSON，否则使用标准库的json，只在第一次解析时导入 """
+    global _json_loads
+    if _json_loads is None:
+        try:
+            import orjson
+            _json_loads = orjson.loads
+        except ImportError:
+            _json_loads = json.loads
+    return _json_loads
 
 
-def _fetch_images(image_path: str) -> bytes:
-    """
-      处理图片相关的请求，支持jpg、png、ico格式的图片
-      image_path: 相对于static目录的路径
-      例如: 在`example/static`之中的`favicon。ico`
-      你应该在html中这样写: /static/favicon.ico 或者 使用 url_for 函数
-      :raise FeaspNotFound
-    """
-
-    if image_path == "/favicon.ico":
-        image_path = image_path[1:]
-        filepath = os.path.join(_global_var["user_pkg_abspath"], "static", image_path)
-
-    elif image_path[0] == '/':
-        image_path = image_path[1:]
-        filepath = os.path.join(_global_var["user_pkg_abspath"], image_path)
-
-    if os.path.exists(filepath):
-        with open(filepath, "rb") as fp:
-            content = fp.read()
-        return content
-    raise FeaspNotFound(f"not found {image_path}")
-
-
-def _fetch_files(link_path: str) -> str:
+def _iter_json_array(stream: t.Any, size: int, chunk_size: int = 64 * 1024) -> t.Iterator[t.Any]:
     """
-      处理css、js相关文件的请求
-      link_path: 相对于static目录的路径
-      例如: 在`example/static`之中的`style.css`
-      你应该在html中这样写: /static/style.css 或者 使用 url_for 函数
-      :raise FeaspNotFound
+      从stream中逐块读取最多size字节，逐个解析并产生顶层JSON数组中的元素，
+      内存中只保留尚未解析的部分，而不是整个请求体
+      :raise BadRequest
     """
-
-    if link_path[0] == '/':
-        link_path = link_path[1:]
-
-    filepath = os.path.join(_global_var["user_pkg_abspath"], link_path)
-    if os.path.exists(filepath):
-        with open(filepath, 'r', encoding="utf-8") as fp:
-            content = fp.read()
-        return content
-    raise FeaspNotFound(f"not found {link_path}")
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer, pos, remaining = "", 0, size
+    eof = False
+    started = False
+
+    def fill() -> bool:
+        nonlocal buffer, pos, remaining, eof
+        if eof:
+            return False
+        chunk = stream.read(min(chunk_size, remaining)) if remaining > 0 else b""
+        remaining -= len(chunk)
+        eof = not chunk or remaining <= 0
+        try:
+            buffer = buffer[pos:] + text_decoder.decode(chunk, final=eof)
+        except UnicodeDecodeError:
+            raise BadRequest("request body is not valid UTF-8") from None
+        pos = 0
+        return True
+
+    def skip_whitespace() -> t.Optional[str]:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill():
+                return None
+
+    if skip_whitespace() != '[':
+        raise BadRequest("request body is not a JSON array")
+    pos += 1
+    while True:
+        c = skip_whitespace()
+        if c == ']':
+            return
+        if started:
+            if c != ',':
+                raise BadRequest("invalid JSON array in request body")
+            pos += 1
+            skip_whitespace()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                item, end = None, -1
+            # 数字等元素可能在块的边界处被截断（例如1.5e10被读成1.5e），
+            # 元素之后不是分隔符时需要读取更多数据再确认
+            truncated = end == len(buffer) or (end != -1 and buffer[end] not in " \t\r\n,]")
+            if end == -1 or (truncated and not eof):
+                if fill():
+                    continue
+                if end == -1:
+                    raise BadRequest("invalid JSON array in request body")
+            break
+        pos = end
+        started = True
+        yield item
 
 
 class Request:
     """
       Request类是一个解析类，解析由WSGI传来的environ字典，
-      然后我们可以从该字典中得到HTTP的字段, 以提供给用户使用
+      然后我们可以从该字典中得到HTTP的字段, 以提供给用户使用，
+      请求体只在第一次访问data、form或json时读取与解析
     """
 
+    # request.json允许的最大请求体字节数，超出时视图返回413
+    max_json_size: int = 16 * 1024 * 1024
+
     def __init__(self, environ: dict):
         self.__environ: dict = environ
+        self.__data: t.Optional[bytes] = None
         self.__url: str = self.__get_url()
-        self.__form: dict = self.__get_form()
+        self.__form: t.Optional[dict] = None
+        self.__json: t.Any = None
+        self.__json_loaded: bool = False
         self.__cookies: dict = self.__get_cookies()
 
     @property
@@ -102,9 +190,68 @@ class Request:
         """ 获取请求的IP和端口号 """
         return self.environ.get("HTTP_HOST", '')
 
+    @property
+    def data(self) -> bytes:
+        """ 请求体的原始字节，只会从wsgi.input读取一次 """
+        if self.__data is None:
+            rb_size = self.content_length
+            wsgi_input = self.environ.get("wsgi.input")
+            self.__data = wsgi_input.read(rb_size) if wsgi_input is not None and rb_size > 0 else b""
+        return self.__data
+
+    @property
+    def content_length(self) -> int:
+        content_length = self.environ.get("CONTENT_LENGTH", "")
+        return int(content_length) if content_length.isdigit() else 0
+
+    @property
+    def is_json(self) -> bool:
+        """ 请求体的类型是否为JSON（application/json或application/*+json） """
+        mimetype = self.environ.get("CONTENT_TYPE", "").split(';')[0].strip().lower()
+        return mimetype == "application/json" or (mimetype.startswith("application/") and mimetype.endswith("+json"))
+
+    @property
+    def json(self) -> t.Any:
+        """
+          解析为JSON的请求体，只在第一次访问时解析，请求体的类型不是JSON时为None
+          :raise BadRequest, RequestTooLarge
+        """
+        if not self.__json_loaded:
+            if not self.is_json:
+                return None
+            if self.content_length > self.max_json_size:
+                raise RequestTooLarge(f"JSON body is larger than {self.max_json_size} bytes")
+            try:
+                self.__json = _get_json_loads()(self.data) if self.data else None
+            except ValueError:
+                raise BadRequest("request body is not valid JSON") from None
+            self.__json_loaded = True
+        return self.__json
+
+    def iter_json_items(self, chunk_size: int = 64 * 1024) -> t.Iterator[t.Any]:
+        """
+          逐个产生请求体中顶层JSON数组的元素，边读取边解析，适合很大的请求体，
+          请求体已经被读取时直接遍历解析后的结果，
+          注意：遍历之后data、form与json不再可用
+          :raise BadRequest
+        """
+        if self.__data is not None:
+            items = self.json if self.__json_loaded else json.loads(self.__data or b"null")
+            if not isinstance(items, list):
+                raise BadRequest("request body is not a JSON array")
+            yield from items
+            return
+        wsgi_input = self.environ.get("wsgi.input")
+        self.__data = b""
+        if wsgi_input is None:
+            raise BadRequest("request body is not a JSON array")
+        yield from _iter_json_array(wsgi_input, self.content_length, chunk_size)
+
     @property
     def form(self) -> dict:
-        """ 获取易于用户阅读的表单字典 """
+        """ 获取易于用户阅读的表单字典，只在第一次访问时解析 """
+        if self.__form is None:
+            self.__form = self.__get_form()
         return self.__form
 
     @property
@@ -159,13 +306,8 @@ class Request:
         return self.environ.get("HTTP_USER_AGENT", '')
 
     def __get_form(self) -> dict:
-        if self.environ.get("CONTENT_LENGTH", "") == '':
-            rb_size = 0
-        else:
-            rb_size = int(self.environ.get("CONTENT_LENGTH", 0))
-        wsgi_input = self.environ.get("wsgi.input", '')
-        if not wsgi_input == "":
-            rb = wsgi_input.read(rb_size)
+        if "wsgi.input" in self.environ and not self.is_json:
+            rb = self.data
             from urllib.parse import parse_qs
             rb_form = parse_qs(rb)
             # 将rb_form中字节的键和值解码为字符串
@@ -177,9 +319,9 @@ class Request:
         cookies = {}
         http_cookie = self.environ.get("HTTP_COOKIE")
         if http_cookie is not None:
-            cl = http_cookie.split(' ')
-            for kv in cl:
-                k, v = tuple(kv.split("="))
+            # 浏览器以`; `分隔多个cookie，set_cookie设置的多个cookie则以空格分隔
+            for kv in http_cookie.replace(';', ' ').split():
+                k, _, v = kv.partition("=")
                 cookies[k] = v
         return cookies
 
@@ -206,12 +348,12 @@ class Response:
 
     def __init__(
             self,
-            body: str = None,
+            body: t.Union[str, bytes, t.Iterator] = None,
             mimetype: str = None,
             status: int = None
     ) -> None:
-        # 响应正文
-        self.body: str = body
+        # 响应正文，可以是字符串、字节或产生字符串/字节块的迭代器
+        self.body: t.Union[str, bytes, t.Iterator] = body
 
         # 响应的状态代码
         self.status: int = status
@@ -219,10 +361,16 @@ class Response:
         # 设置响应的类型
         self.mimetype: str = mimetype
 
-        # 响应头，可动态添加多个字段
-        self.headers: dict[str, str] = {
-            "Content-Type": f"{self.mimetype}; charset=utf-8",
-        }
+        # 响应头，可动态添加多个字段，只有文本类型才声明字符集，没有类型的响应（例如304）不返回Content-Type
+        self.headers: dict[str, str] = {}
+        if self.mimetype is not None:
+            content_type = self.mimetype
+            if is_text_mimetype(content_type):
+                content_type = f"{content_type}; charset=utf-8"
+            self.headers["Content-Type"] = content_type
+
+        # 可重复的响应头，例如多个Set-Cookie
+        self.header_list: list[tuple[str, str]] = []
 
     def set_cookie(self, key: str, value: str) -> None:
         """
@@ -236,18 +384,39 @@ class Response:
         new_cookie = old_cookie + add_cookie
         self.headers["Set-Cookie"] = new_cookie
 
-    def __call__(self, environ: dict, start_response: t.Callable) -> list[bytes]:
+    def add_header(self, key: str, value: str) -> None:
+        """
+          添加一个可重复的响应头，与self.headers不同，同名的响应头不会相互覆盖
+        """
+        self.header_list.append((key, value))
+
+    def __call__(self, environ: dict, start_response: t.Callable) -> t.Iterable[bytes]:
         """
-          返回要传递给客户端的包装响应
+          返回要传递给客户端的包装响应，
+          正文为迭代器时逐块编码并返回，客户端无需等待整个正文生成完毕
         """
         start_response(
             f"{self.status} {self.reason_phrase[self.status]}",
-            [(k, v) for k, v in self.headers.items()]
+            [(k, v) for k, v in self.headers.items()] + self.header_list
         )
 
         if isinstance(self.body, bytes):
             return [self.body]
-        return [self.body.encode("utf-8")]
+        if isinstance(self.body, str):
+            return [self.body.encode("utf-8")]
+        return self._iter_body()
+
+    def _iter_body(self) -> t.Iterator[bytes]:
+        try:
+            for chunk in self.body:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                if chunk:
+                    yield chunk
+        finally:
+            close = getattr(self.body, "close", None)
+            if close is not None:
+                close()
 
     def __repr__(self) -> str:
         return f"<{type(self).__name__} ResHeader: {self.mimetype}" \
@@ -289,18 +458,27 @@ class LocalStack:
     def __init__(self):
         # 基于threading的本地线程
         self._local: threading.local = local()
-        # 创建一个容器作为栈
-        self._local.stack: list = []
+
+    @property
+    def _stack(self) -> list:
+        # 每个线程在第一次使用时创建各自的栈
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
 
     def push(self, item):
-        self._local.stack.append(item)
+        self._stack.append(item)
 
     def pop(self):
-        return self._local.stack.pop()
+        return self._stack.pop()
 
     @property
     def top(self):
-        return self._local.stack[-1]
+        # 栈为空（不在请求中）时返回None
+        stack = self._stack
+        return stack[-1] if stack else None
 
     def __repr__(self):
         return f"{type(self).__name__} Thread: {self._local}"
@@ -328,244 +506,112 @@ class _RequestContext:
         self.url_func_map: dict = app.url_func_map
         # 指向请求的相关解析信息
         self.request: Request = app.request_class(environ)
-        # 会话对象用于设置cookie
-        self.session: dict = {}
+        # 会话对象，在第一次访问时才会加载
+        self._session: t.Optional[dict] = None
+        # 请求的截止时间（time.monotonic），未设置超时时为None
+        self.deadline: t.Optional[float] = None
+        # app.background提交的任务，正文发送完毕后才进入后台线程池
+        self.background_tasks: list[tuple[t.Callable, tuple, dict]] = []
+        # 批量请求的子请求指向外层请求的上下文，与其共享会话，会话由外层请求统一保存
+        self.parent: t.Optional[_RequestContext] = None
+
+    @property
+    def session(self) -> dict:
+        if self._session is None:
+            if self.parent is not None:
+                # 并行的子请求只会加载一次外层请求的会话
+                with _parent_session_lock:
+                    self._session = self.parent.session
+            else:
+                self._session = self.app.open_session(self.request)
+        return self._session
+
+    @property
+    def session_accessed(self) -> bool:
+        return self._session is not None
 
     def __enter__(self):
         _request_ctx_stack.push(self)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_tb is None:
-            _request_ctx_stack.pop()
+        # 无论是否发生异常都需要弹出，否则复用的工作线程中会残留上一个请求的上下文
+        _request_ctx_stack.pop()
 
     def __repr__(self):
         return f"<{type(self).__name__} CtxRequest: {self.request}>"
 
 
-class FeaspTemplate:
-    """
-      Template是一个渲染类，用于解析HTML并重新拼接的模板，
-      当前，支持定义变量、定义url_for函数、单个If语句、单层For循环：
-        1.定义变量的占位符为: {{}},
-        变量在花括号内定义，例如 {{ name }}
-        2.定义url_for函数: {{ url_for('static', filename='head.jpg') }}
-        3.定义判断语句（目前仅能定义单个If判断）:
-            {% If name_list: %}
-                {{ name_list[0] }}
-            {% Endif %}
-        4.定义循环语句（目前仅能定义单个且单层For循环）:
-            {% For name in name_list %}
-                {{ name }}
-            {% Endfor %}
-        5.定义注释:
-            {# 这是一个注释 #}
-        注意：支持一个HTML文件内同时定义多个For与If语句但不支持其之间的相互嵌套
-      注意：传入的变量必须与模板中定义的变量匹配，并且以key=value的形式传递给渲染函数
-    """
-
-    def __init__(self, text: str, context: dict) -> None:
-        # self.text指向内存中的HTML字符串
-        self.text: str = text
-
-        # self.context指向内存中用户传入的上下文变量
-        self.context: dict = context
-
-        # 保存从self.text中匹配的所有的模板变量、语句
-        self.snippet_list: list[str] = re.split("({{.*?}}|{%.*?%}|{#.*?#})", self.text, flags=re.DOTALL)
-
-        # 保存从HTML解析的语句代码段
-        self.grammar_snippet: list[str] = []
-
-        # 保存从HTML解析的if语句代码段
-        self.if_snippet: list[str] = []
-
-        # 保存从HTML解析的for语句代码段
-        self.for_snippet: list[str] = []
-
-        # 保存从HTML解析的注释语句代码段
-        self.comments_snippet: list[str] = []
-
-        # 保存最终渲染拼接完的HTML字符串
-        self.finally_result: list[str] = []
-
-        # 处理self.snippet_list中的代码段
-        self._deal_code_segment()
-
-    def _get_var_value(self, var_name: str) -> str:
-        """
-          根据变量名称获取变量的值
-        """
-        if "." not in var_name:
-            value = self.context.get(var_name)
-        elif "url_for" in var_name:   # 支持在template中定义url_for函数
-            value = eval(var_name)
-        else:  # 处理obj.attr
-            obj, attr = var_name.split('.')
-            value = getattr(self.context.get(obj), attr)
-
-        if not isinstance(value, str):
-            value = str(value)
-        return value
-
-    def _deal_code_segment(self) -> None:
-        """
-          处理所有匹配的代码段
-        """
-        is_grammar_snippet = False   # 标记它是否是控制语句代码段
-        is_if_snippet = False   # 标记它是否为if语句代码段
-        is_for_snippet = False   # 标记它是否为for语句代码段
-        is_comments_snippet = False   # 标记它是否是注释代码段
-
-        for snippet in self.snippet_list:
-            # 解析模板变量
-            if snippet.startswith("{{"):
-                if not is_for_snippet:
-                    var_name = snippet[2:-2].strip()
-                    snippet = self._get_var_value(var_name)
-            elif snippet.startswith("{#"):
-                is_comments_snippet = True   # 标记
-            # 给for语句在最终HTML字符串中占位
-            elif snippet.startswith("{%"):
-                if "in" in snippet:
-                    is_for_snippet = True   # 标记
-                elif "If" in snippet:
-                    is_if_snippet = True   # 标记
-                else:
-                    snippet = ""
-                    is_if_snippet = False
-                    is_for_snippet = False
-                is_grammar_snippet = True   # 标记
-            else:
-                is_grammar_snippet = False
-                is_comments_snippet = False
-
-            if is_for_snippet:
-                # 如果是for语句代码段，它需要添加至self.for_snippet以待处理
-                self.for_snippet.append(snippet)
-                self.grammar_snippet.append(snippet)
-            elif is_if_snippet:
-                # 如果是if语句代码段，它需要添加至self.if_snippet以待处理
-                self.if_snippet.append(snippet)
-                self.grammar_snippet.append(snippet)
-            elif is_comments_snippet:
-                # 如果是注释语句代码段，将它添加至self.comments_snippet什么也不干
-                self.comments_snippet.append(snippet)
-            else:
-                # 如果是模板变量，则将变量值直接附加到结果列表
-                self.finally_result.append(snippet)
-
-        for snippet in self.snippet_list:
-            # 将语法语句作为整体进行处理，预留一个空位即可
-            if snippet.startswith("{%"):
-                self.finally_result.append("{}")
-                break
-
-    def _parse_for_snippet(self, words: list) -> list[str]:
-        """
-          解析for语句片段的代码
-        """
-        result = []   # 保存for语句片段的解析结果
-        iter_obj_from_context = self.context.get(words[-1])
-        for value in iter_obj_from_context:
-            for snippet in self.for_snippet[1:]:
-                if snippet.startswith("{{"):
-                    var = snippet[2:-2].strip()
-                    if '.' not in var:
-                        snippet = value
-                    else:
-                        obj, attr = var.split('.')
-                        snippet = getattr(value, attr)
-                if not isinstance(snippet, str):
-                    snippet = str(snippet)
-                result.append(snippet)
-        return result
-
-    def _parse_if_snippet(self, words: list) -> list[str]:
-        """
-          解析if语句片段的代码
-        """
-        result = []   # 保存if语句片段的解析结果
-        if_obj_from_context = self.context.get(words[-1])
-        if if_obj_from_context:
-            for snippet in self.if_snippet[1:]:
-                if snippet.startswith("{{"):
-                    var = snippet[2:-2].strip()
-                    if "." not in var:
-                        snippet = value
-                    else:
-                        obj, attr = var.split('.')
-                        snippet = getattr(value, attr)
-                if not isinstance(snippet, str):
-                    snippet = str(snippet)
-                result.append(snippet)
-        return result
-
-    def _parse_grammar_snippet(self) -> list[str]:
-        """
-          处理语法语句代码片段，
-          支持在同一HTML文件内定义多个控制语句但不支持其之间的嵌套关系
-        """
-        result = []
-        if self.grammar_snippet:
-            for snippet in self.grammar_snippet:
-                words = snippet[2:-2].strip().split()
-                if words[0] == "If":
-                    if_result = self._parse_if_snippet(words)
-                    result.extend(if_result)
-                if words[0] == "For":
-                    for_result = self._parse_for_snippet(words)
-                    result.extend(for_result)
-        return result
-
-    def render(self) -> str:
-        """
-          将self.finally_result与result合并，
-          self.finally_result为还未结合类似于for语句这样的执行结果的字符串列表
-        """
-        result = self._parse_grammar_snippet()
-        return "".join(self.finally_result).format("".join(result))
-
-    def __repr__(self) -> str:
-        return f"<{type(self).__name__} Ctx: {self.context}>"
-
-
 class FeaspServer:
     """
       FeaspServer类，遵守WSGI规范，利用以下组件实现的服务器程序，
-      wsgiref，make_server, WSGIRequestHandler, WSGIServer implemented server
+      wsgiref，make_server, WSGIRequestHandler, WSGIServer implemented server，
+      access_log为AccessLogger时访问日志由其后台线程批量写入，为None时不记录访问日志，
+      threaded为True时每个连接在单独的线程中处理，
+      unix_socket为Unix域套接字的路径（文件权限为unix_socket_mode），fd为从父进程继承的已绑定套接字，
+      二者之一被提供时不再监听host:port，
+      reuse_port为True时设置SO_REUSEPORT，多个进程可以监听同一端口，由内核在它们之间分配连接
     """
 
-    def __init__(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+    def __init__(
+            self,
+            host: str = "127.0.0.1",
+            port: int = 8080,
+            access_log: t.Any = None,
+            threaded: bool = False,
+            unix_socket: t.Optional[str] = None,
+            unix_socket_mode: t.Optional[int] = 0o660,
+            fd: t.Optional[int] = None,
+            reuse_port: bool = False
+    ) -> None:
         self.host: str = host
         self.port: int = int(port)
+        self.access_log: t.Any = access_log
+        self.threaded: bool = threaded
+        self.unix_socket: t.Optional[str] = unix_socket
+        self.unix_socket_mode: t.Optional[int] = unix_socket_mode
+        self.fd: t.Optional[int] = fd
+        self.reuse_port: bool = reuse_port
 
     def run(self, app: t.Callable) -> None:
-        from wsgiref.simple_server import make_server
-        from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+        import socket
+        from .sockets import make_server
+        from .access_log import AccessLogHandler
 
-        f_srv = make_server(self.host, self.port, app, WSGIServer, WSGIRequestHandler)
-        self.port = f_srv.server_port
+        handler_class = type("FeaspRequestHandler", (AccessLogHandler,), {"access_logger": self.access_log})
+        f_srv = make_server(app, handler_class, self.host, self.port, self.threaded,
+                            self.unix_socket, self.unix_socket_mode, self.fd, self.reuse_port)
         try:
-            print(f"{self.__class__.__name__} working on {self.port}...")
-            print(f"Please click `http://{self.host}:{self.port}`...")
+            if f_srv.address_family == socket.AF_UNIX:
+                print(f"{self.__class__.__name__} working on unix:{f_srv.server_address}...")
+            else:
+                self.host, self.port = f_srv.server_address[:2]
+                print(f"{self.__class__.__name__} working on {self.port}...")
+                print(f"Please click `http://{self.host}:{self.port}`...")
             f_srv.serve_forever()
         except KeyboardInterrupt:
             warnings.warn("A KeyboardInterrupt was happend...")
-            f_srv.server_close()
             raise
+        finally:
+            f_srv.server_close()
+            if self.access_log is not None:
+                self.access_log.close()
 
     def __repr__(self) -> str:
+        if self.fd is not None:
+            return f"{type(self).__name__} Fd: {self.fd}"
+        if self.unix_socket is not None:
+            return f"{type(self).__name__} Address: unix:{self.unix_socket}"
         return f"{type(self).__name__} Address: {self.host}:{self.port}"
 
 
 class Feasp:
     """
-      Feasp是一个简单的单线程的Web框架，基于WSGI标准，仅用于学习与交流，
+      Feasp是一个简单的Web框架，基于WSGI标准，默认单线程运行（可使用run(threaded=True)），仅用于学习与交流，
 
       实现了路由注册（支持GET，POST），WSGI应用程序，请求的分发等，
 
-      内置各种资源自动处理，支持在视图路径中定义变量，
+      内置静态文件处理（static目录默认挂载至/static），支持在视图路径中定义变量，
       使用app.response.session可在视图函数中设置cookie，
 
       支持返回字符串、HTML、字典和响应作为返回值，
@@ -590,17 +636,150 @@ class Feasp:
     # 指向响应类
     response_class: t.Any = Response
 
-    def __init__(self, filename: str) -> None:
+    # 服务端会话，为None时session中的键值对直接作为cookie返回给客户端，
+    # 例如: app.session_interface = SessionInterface("secret key", SqliteSessionStore("session.db"))
+    session_interface: t.Any = None
+
+    # 准入控制，为None时不限制并发，需配合app.run(threaded=True)使用
+    # 例如: app.admission_control = AdmissionControl(max_concurrency=32, max_queue=64)
+    admission_control: t.Any = None
+
+    # 所有视图的超时秒数，为None时不限制，可在route(timeout=...)中为单个视图设置，
+    # 超时的请求立即返回timeout_status（504或503），仍在执行的视图在后台线程中继续执行直至结束
+    request_timeout: t.Optional[float] = None
+    timeout_status: int = 504
+    # 超时后仍在执行的视图最多max_abandoned_views个，线程池为它们预留了线程，
+    # 达到上限时有超时限制的视图不再执行，直接返回timeout_status，避免卡住的线程无限增长
+    max_abandoned_views: int = 16
+
+    # 慢请求看门狗，例如: app.watchdog = Watchdog(slow_threshold=2.0)
+    watchdog: t.Any = None
+
+    # 按端点统计被抽中的请求的内存分配，例如: app.memory_profiler = MemoryProfiler(sample_rate=0.01)
+    memory_profiler: t.Any = None
+
+    # 全局限流策略，作用于所有视图（静态文件除外），为None时不限流，
+    # 例如: app.rate_limit = RateLimit(120, per=60, store=SqliteBucketStore("ratelimit.db"))
+    rate_limit: t.Any = None
+
+    # 执行app.background提交的任务的有界队列，为None时在第一次提交任务时创建默认的BackgroundQueue（线程池），
+    # 例如: app.background_queue = BackgroundQueue(max_workers=8)，CPU密集的任务可使用进程池：
+    # app.background_queue = BackgroundQueue(executor=ProcessPoolExecutor(4))，
+    # run退出时最多等待background_drain_timeout秒让已提交的任务执行完毕
+    background_queue: t.Any = None
+    background_drain_timeout: t.Optional[float] = 10.0
+
+    # 为True时GET请求的200响应自动带有由正文哈希生成的弱ETag，If-None-Match匹配时返回304
+    auto_etag: bool = False
+
+    def __init__(
+            self,
+            filename: str,
+            precompile_templates: bool = False,
+            template_cache_dir: t.Optional[str] = None,
+            static_folder: str = "static",
+            static_url_path: str = "/static",
+            static_fingerprint: bool = True
+    ) -> None:
         # 保存URL与view_func的映射
         self.__url_func_map: dict = {"path_have_var": {}}
 
         # self.__url_func_map：传入全局字典
         _global_var["url_func_map"] = self.__url_func_map
 
+        # 端点 -> 超时秒数，见route(timeout=...)
+        self.view_timeouts: dict[str, float] = {}
+        # 端点 -> 返回版本号的函数，见route(etag=...)
+        self.view_etags: dict[str, t.Callable] = {}
+        # 执行有超时限制的视图的线程池，以及其中超时后仍在执行的视图数量
+        self._deadline_executor: t.Any = None
+        self._deadline_lock: threading.Lock = threading.Lock()
+        self._abandoned_views: int = 0
+        self._background_lock: threading.Lock = threading.Lock()
+
         # 获取用户程序包的绝对路径，以便于后续构建路径等
         self.__user_pkg_abspath: str = os.path.abspath(os.path.dirname(filename))
         _global_var["user_pkg_abspath"] = self.__user_pkg_abspath
 
+        # 加载并缓存templates目录下编译后的模板，加载器在第一次渲染模板时才创建，见template_loader，
+        # 若提供了template_cache_dir（相对路径相对于用户程序包），编译结果会被保存至磁盘供各进程共享
+        self._template_cache_dir: t.Optional[str] = template_cache_dir
+        self._template_loader: t.Optional["TemplateLoader"] = None
+        _global_var["app"] = self
+
+        # 在启动时编译所有模板，避免第一次请求时的延迟
+        if precompile_templates:
+            self.template_loader.precompile()
+
+        # 静态文件清单，默认将static目录挂载至/static，其它目录可通过add_static_mount挂载，
+        # static_fingerprint为True时url_for返回带有内容哈希的URL，例如 /static/style.3f9a1c2b.css
+        self.static_manifest: StaticManifest = StaticManifest(fingerprint=static_fingerprint)
+        self.static_manifest.mount("static", static_url_path, os.path.join(self.__user_pkg_abspath, static_folder))
+        self.static_manifest.alias("/favicon.ico", f"{self.static_manifest.mounts['static'][0]}/favicon.ico")
+        _global_var["static_manifest"] = self.static_manifest
+
+        # CSS/JS打包，第一次调用add_bundle时创建
+        self.assets: t.Any = None
+
+        # 调用freeze之后为True，不能再注册路由
+        self.frozen: bool = False
+        _global_var.pop("endpoint_paths", None)
+
+    @property
+    def template_loader(self) -> "TemplateLoader":
+        """
+          模板加载器，第一次访问时才导入模板引擎并创建，不渲染模板的应用无需承担其导入耗时
+        """
+        if self._template_loader is None:
+            from .template import TemplateLoader, BytecodeCache
+
+            bytecode_cache = None
+            if self._template_cache_dir is not None:
+                bytecode_cache = BytecodeCache(os.path.join(self.__user_pkg_abspath, self._template_cache_dir))
+            self._template_loader = TemplateLoader(
+                os.path.join(self.__user_pkg_abspath, "templates"), bytecode_cache=bytecode_cache)
+        return self._template_loader
+
+    @template_loader.setter
+    def template_loader(self, loader: "TemplateLoader") -> None:
+        self._template_loader = loader
+
+    def freeze(self) -> "Feasp":
+        """
+          在注册完路由等配置之后、开始处理请求之前调用（多进程部署时在fork之前调用），
+          预先完成原本推迟到第一次请求时的工作：编译所有模板并关闭模板的自动重新加载，
+          重新建立静态文件清单与打包结果，建立url_for使用的端点索引，导入处理请求时才会用到的模块，
+          最后通过gc.freeze将此时已有的对象移出垃圾回收的跟踪范围，减少之后每次回收的耗时以及fork后子进程的写时复制，
+          冻结后不能再注册路由，返回应用本身
+          使用示例：
+          app.freeze().run("127.0.0.1", 8000)
+        """
+        import gc
+
+        loader = self.template_loader
+        if loader.searchpath is not None and os.path.isdir(loader.searchpath):
+            loader.precompile()
+        loader.auto_reload = False
+
+        self.static_manifest.refresh()
+        if self.assets is not None:
+            self.assets.rebuild()
+
+        endpoint_paths = {}
+        for path, values in self.__url_func_map.items():
+            if path != "path_have_var":
+                endpoint_paths.setdefault(values[0], path)
+        _global_var["endpoint_paths"] = endpoint_paths
+
+        _get_json_loads()
+        for module in _WARMUP_MODULES:
+            importlib.import_module(module)
+
+        self.frozen = True
+        gc.collect()
+        gc.freeze()
+        return self
+
     @property
     def url_func_map(self) -> dict:
         """
@@ -622,31 +801,139 @@ class Feasp:
         """
         return self.__user_pkg_abspath
 
-    @staticmethod
-    def _deal_static_request(path: str) -> t.Optional[tuple[t.Union[str, bytes], str, int]]:
-        """
-          处理对图像、CSS和js文件的请求
-        """
-        for bq in (".ico", ".jpg", ".png"):
-            if bq in path:
-                mimetype = "image/x-icon"
-                content = _fetch_images(path)
-                return content, 200, mimetype
-
-        for bq in (".css", ".js"):
-            if bq in path and bq == ".css":
-                mimetype = "text/css"
-                content = _fetch_files(path)
-                return content, 200, mimetype
-            if bq in path and bq == ".js":
-                mimetype = "application/javascript"
-                content = _fetch_files(path)
-                return content, 200, mimetype
+    def add_static_mount(self, name: str, url_path: str, directory: str) -> None:
+        """
+          将directory（相对路径相对于用户程序包）挂载至url_path，
+          之后可使用url_for(name, filename=...)构建其中文件的URL
+        """
+        directory = os.path.join(self.__user_pkg_abspath, directory)
+        self.static_manifest.mount(name, url_path, directory)
+
+    def add_bundle(self, name: str, files: list[str], mount: str = "static", minify: bool = True) -> None:
+        """
+          将挂载点mount下的files按顺序合并并压缩为name（扩展名为.css或.js），
+          打包结果保存在内存中，模板中使用{{ bundle(name) }}引用，源文件修改后会被重新打包，
+          minify只在第一次调用时生效
+          使用示例：
+          app.add_bundle("site.css", ["reset.css", "style.css"])
+        """
+        if self.assets is None:
+            from .assets import AssetBundler
+            self.assets = AssetBundler(self.static_manifest, minify)
+            _global_var["assets"] = self.assets
+        self.assets.add(name, files, mount)
+
+    def add_batch_endpoint(self, path: str = "/batch", max_requests: int = 32, max_workers: int = 4) -> None:
+        """
+          在path注册批量请求的端点，请求体为子请求的JSON数组，子请求在进程内处理，
+          最多包含max_requests个子请求，相互独立的子请求最多使用max_workers个线程并行处理，
+          子请求与响应的格式见feasp.batch.BatchHandler
+          使用示例：
+          app.add_batch_endpoint("/batch")
+          POST /batch [{"method": "GET", "path": "/api/user?id=1"}, {"method": "GET", "path": "/api/news"}]
+        """
+        from .batch import BatchHandler
+        handler = BatchHandler(self, path, max_requests, max_workers)
+
+        def batch():
+            try:
+                items = json.loads(request.data or b"null")
+            except ValueError:
+                return make_response(json.dumps({"error": "batch body is not valid JSON"}), "application/json", 400)
+            cookies = []
+            result, status = handler.handle(request.environ, items, _request_ctx_stack.top, cookies)
+            if status != 200:
+                result = {"error": result}
+            response = make_response(json.dumps(result, default=_json_default), "application/json", status)
+            # 子响应的Set-Cookie不会出现在JSON中，而是合并至外层响应
+            for value in cookies:
+                response.add_header("Set-Cookie", value)
+            return response
+
+        self._deal_view_func(batch, path, [METHOD["POST"]])
+
+    def background(self, fn: t.Callable, *args: t.Any, **kwargs: t.Any) -> None:
+        """
+          在后台执行fn(*args, **kwargs)，在视图中提交的任务在响应正文发送完毕之后才进入队列，
+          此时队列已满的任务被丢弃并在标准错误中输出警告，
+          不在请求中提交的任务立即进入队列，队列已满时抛出BackgroundQueueFull，执行器与队列长度见background_queue
+          使用示例：
+          @app.route("/signup", methods=["POST"])
+          def signup():
+              app.background(send_welcome_mail, request.form["email"])
+              return "ok"
+        """
+        req_ctx = _request_ctx_stack.top
+        if req_ctx is not None:
+            req_ctx.background_tasks.append((fn, args, kwargs))
+        else:
+            self._get_background_queue().submit(fn, *args, **kwargs)
+
+    def _get_background_queue(self) -> t.Any:
+        queue = self.background_queue
+        if queue is None:
+            with self._background_lock:
+                if self.background_queue is None:
+                    from .background import BackgroundQueue
+                    self.background_queue = BackgroundQueue()
+                queue = self.background_queue
+        return queue
+
+    def _run_background(self, req_ctx: _RequestContext) -> None:
+        """ 正文发送完毕后将请求中提交的任务交给后台队列，响应已经发送，被拒绝的任务只能丢弃 """
+        tasks, req_ctx.background_tasks = req_ctx.background_tasks, []
+        if tasks:
+            queue = self._get_background_queue()
+            for fn, args, kwargs in tasks:
+                try:
+                    queue.submit(fn, *args, **kwargs)
+                except (BackgroundQueueFull, RuntimeError) as e:
+                    sys.stderr.write(f"Background task {getattr(fn, '__name__', fn)} dropped: {e}\n")
+
+    def add_memory_endpoint(self, path: str = "/_debug/memory") -> None:
+        """
+          在path注册返回app.memory_profiler报告的调试端点，报告包含各端点的峰值、未释放内存与分配最多的代码位置，
+          报告会暴露源码路径，仅应在调试环境或内网中注册
+          使用示例：
+          app.memory_profiler = MemoryProfiler(sample_rate=0.05)
+          app.add_memory_endpoint()
+        """
+
+        def memory_report():
+            profiler = self.memory_profiler
+            if profiler is None:
+                return make_response(json.dumps({"error": "memory_profiler is not set"}), "application/json", 404)
+            return make_response(json.dumps({"samples": profiler.samples, "endpoints": profiler.report()}),
+                                 "application/json", 200)
+
+        self._deal_view_func(memory_report, path, [METHOD["GET"]])
+
+    def _deal_static_request(self, path: str) -> t.Optional[tuple]:
+        """
+          处理对挂载的静态目录中文件的请求，
+          文件的MIME类型等信息来自启动时建立的清单，不以挂载前缀开头的路径直接返回None，
+          带有内容哈希的URL会被标记为可永久缓存
+        """
+        manifest = self.static_manifest
+        if not manifest.is_static(path):
+            return None
+        entry = manifest.lookup(path)
+        if entry is None:
+            return FEASP_ERROR["HTTP_404"]
+        headers = {}
+        if entry.digest is not None:
+            # 内容哈希在建立清单时已经算好，可直接作为ETag
+            headers["ETag"] = f'"{entry.digest}"'
+        if manifest.is_immutable(path, entry):
+            headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return manifest.read(entry), entry.mimetype, 200, headers
 
     def _deal_view_func(self, func: t.Callable, path: str, methods: list[str]) -> None:
         """
           处理视图函数中定义的路径
         """
+        if self.frozen:
+            raise RuntimeError(f"cannot register {path} after the app is frozen")
         endpoint = func.__name__  # 这里的端点是视图函数的名称
         format_mark = re.findall("<string:.*?>", path)
         if format_mark and format_mark[0] in path:
@@ -655,9 +942,10 @@ class Feasp:
         else:
             self.__url_func_map[path] = (endpoint, func, methods)
 
-    def dispatch(self, path: str, method: str) -> tuple[t.Union[str, bytes], str, int]:
+    def dispatch(self, path: str, method: str) -> tuple:
         """
-          处理传来的请求并返回对相应视图函数的响应
+          处理传来的请求并返回对相应视图函数的响应，
+          返回(正文, 类型, 状态码)，需要额外的响应头时返回(正文, 类型, 状态码, 响应头字典)
         """
         # 处理与文件相关的请求
         deal_return = self._deal_static_request(path)
@@ -674,42 +962,158 @@ class Feasp:
         if values is None:   # 如果仍为“无”，则引发错误
             return FEASP_ERROR["HTTP_404"]
 
-        # 进入用户上下文----------------------------------
         endpoint, view_func, methods = values
+        if method not in methods:
+            return FEASP_ERROR["HTTP_405"]
+
+        # 在找到视图之后才限流，404与405的探测不会消耗客户端的限额
+        rate_limit = self.rate_limit
+        if rate_limit is not None:
+            allowed, retry_after = rate_limit.check(_request_ctx_stack.top.request)
+            if not allowed:
+                return (*FEASP_ERROR["HTTP_429"], {"Retry-After": str(retry_after)})
+
+        # 进入用户上下文----------------------------------
+        args = (variable,) if variable else ()
+        etag = None
         try:
-            if not variable:
-                view_func_return = view_func()
-            else:
-                view_func_return = view_func(view_func(variable))
-        except Exception as e:
+            etag_func = self.view_etags.get(endpoint)
+            if etag_func is not None and method == METHOD["GET"]:
+                # 版本号未变化时无需执行视图函数
+                etag = make_etag(f"{endpoint}:{etag_func(*args)}".encode("utf-8"))
+                if etag_matches(_request_ctx_stack.top.request.environ.get("HTTP_IF_NONE_MATCH"), etag):
+                    return b"", None, 304, {"ETag": etag}
+            view_func_return = self._call_view(endpoint, view_func, args)
+        except DeadlineExceeded:
+            return FEASP_ERROR[f"HTTP_{self.timeout_status}"]
+        except RequestTooLarge:
+            return FEASP_ERROR["HTTP_413"]
+        except BadRequest:
+            return FEASP_ERROR["HTTP_400"]
+        except Exception:
+            self.log_exception(sys.exc_info())
             return FEASP_ERROR["HTTP_500"]
         # 退出用户上下文-----------------------------------
 
-        if method not in methods:
-            return FEASP_ERROR["HTTP_405"]
+        result = self._convert_view_return(view_func_return)
+        if etag is not None and result[2] == 200:
+            return (*result[:3], {"ETag": etag})
+        return result
 
+    @staticmethod
+    def _convert_view_return(view_func_return: t.Any) -> tuple:
+        """ 将视图函数的返回值转换为(正文, 类型, 状态码) """
         if isinstance(view_func_return, str):
             mimetype = "text/html"
             return view_func_return, mimetype, 200
         elif isinstance(view_func_return, dict):
-            view_func_return = json.dumps(view_func_return)
+            view_func_return = json.dumps(view_func_return, default=_json_default)
             mimetype = "application/json"
             return view_func_return, mimetype, 200
         elif isinstance(view_func_return, Response):
+            # 保留视图设置的响应头，例如事件流的Cache-Control
+            headers = {k: v for k, v in view_func_return.headers.items() if k != "Content-Type"}
+            if headers:
+                return view_func_return.body, view_func_return.mimetype, view_func_return.status, headers
             return view_func_return.body, \
                    view_func_return.mimetype, view_func_return.status
         else:
             return FEASP_ERROR["HTTP_500"]
 
-    def route(self, path: str, methods: list[str]) -> t.Callable:
+    def _call_view(self, endpoint: str, view_func: t.Callable, args: tuple) -> t.Any:
         """
-          将用户定义的相对路径与视图函数进行绑定
+          调用视图函数，设置了超时的视图在线程池中执行，当前线程最多等待其超时秒数，
+          超时抛出DeadlineExceeded
+        """
+        timeout = self.view_timeouts.get(endpoint, self.request_timeout)
+        if timeout is None:
+            return self._run_view(endpoint, view_func, args)
+
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+        req_ctx = _request_ctx_stack.top
+        req_ctx.deadline = time.monotonic() + timeout
+        if self._abandoned_views >= self.max_abandoned_views:
+            raise DeadlineExceeded(f"{self._abandoned_views} timed out views are still running")
+        future = self._get_deadline_executor().submit(self._run_view_in_context, req_ctx, endpoint, view_func, args)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            if not future.cancel():
+                self._abandon_view(future)
+            raise DeadlineExceeded(f"{endpoint} did not finish in {timeout}s") from None
+
+    def _run_view(self, endpoint: str, view_func: t.Callable, args: tuple) -> t.Any:
+        watchdog, profiler = self.watchdog, self.memory_profiler
+        if watchdog is None and profiler is None:
+            return view_func(*args)
+        token = watchdog.begin(endpoint) if watchdog is not None else None
+        sample = profiler.begin(endpoint) if profiler is not None else None
+        try:
+            return view_func(*args)
+        finally:
+            if sample is not None:
+                profiler.end(sample)
+            if token is not None:
+                watchdog.end(token)
+
+    def _run_view_in_context(self, req_ctx: _RequestContext, endpoint: str, view_func: t.Callable, args: tuple) -> t.Any:
+        # 工作线程有各自的上下文栈，需要重新压入请求上下文
+        with req_ctx:
+            return self._run_view(endpoint, view_func, args)
+
+    def _get_deadline_executor(self) -> t.Any:
+        executor = self._deadline_executor
+        if executor is None:
+            with self._deadline_lock:
+                if self._deadline_executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    # 在默认大小之外为超时后仍在执行的视图预留线程
+                    max_workers = min(32, (os.cpu_count() or 1) + 4) + self.max_abandoned_views
+                    self._deadline_executor = ThreadPoolExecutor(max_workers, thread_name_prefix="feasp-view")
+                executor = self._deadline_executor
+        return executor
+
+    def _abandon_view(self, future: t.Any) -> None:
+        """ 超时的视图仍占用着线程池中的线程，计入_abandoned_views，视图结束后释放 """
+        with self._deadline_lock:
+            self._abandoned_views += 1
+        future.add_done_callback(self._release_abandoned_view)
+
+    def _release_abandoned_view(self, future: t.Any) -> None:
+        with self._deadline_lock:
+            self._abandoned_views -= 1
+
+    def log_exception(self, exc_info: tuple) -> None:
+        """ 视图函数抛出异常时调用，默认将调用栈写入标准错误，可在子类中重写以接入日志系统 """
+        import traceback
+
+        request_path = _request_ctx_stack.top.request.path
+        sys.stderr.write(f"Exception on {request_path}:\n{''.join(traceback.format_exception(*exc_info))}")
+
+    def route(
+            self,
+            path: str,
+            methods: list[str],
+            timeout: t.Optional[float] = None,
+            etag: t.Optional[t.Callable] = None
+    ) -> t.Callable:
+        """
+          将用户定义的相对路径与视图函数进行绑定，
+          timeout为该视图的超时秒数，会覆盖app.request_timeout，
+          etag为返回数据版本号的函数（参数与视图函数相同），GET请求的ETag由版本号生成，
+          客户端的If-None-Match与之相同时直接返回304而不执行视图函数
+          使用示例：
+          @app.route("/news", methods=["GET"], etag=lambda: news_version())
         """
         if methods is None:
             methods = [METHOD["GET"]]
 
         def decorator(func):
             self._deal_view_func(func, path, methods)   # 处理视图函数的路径
+            if timeout is not None:
+                self.view_timeouts[func.__name__] = timeout
+            if etag is not None:
+                self.view_etags[func.__name__] = etag
             return func
         return decorator
 
@@ -719,18 +1123,40 @@ class Feasp:
         """
         return _RequestContext(self, environ)
 
-    def make_response(self, body: str, mimetype: str, status: int) -> Response:
+    def open_session(self, request: Request) -> dict:
         """
-          抽象出处理response的过程，以提供更清晰的代码逻辑
+          在视图第一次访问session时调用，
+          未设置session_interface时返回一个空字典，其中的键值对会作为cookie返回
         """
-        response = self.response_class()
-        response.body = body
-        response.status = status
-        response.mimetype = mimetype
-        if session is not None:
+        if self.session_interface is None:
+            return {}
+        return self.session_interface.open_session(request)
+
+    def save_session(self, session: dict, response: Response) -> None:
+        if self.session_interface is None:
             for k, v in session.items():
                 response.set_cookie(k, v)
             session.clear()
+        else:
+            self.session_interface.save_session(session, response)
+
+    def make_response(
+            self,
+            body: str,
+            mimetype: str,
+            status: int,
+            headers: t.Optional[dict[str, str]] = None
+    ) -> Response:
+        """
+          抽象出处理response的过程，以提供更清晰的代码逻辑
+        """
+        response = self.response_class(body, mimetype, status)
+        if headers:
+            response.headers.update(headers)
+        req_ctx = _request_ctx_stack.top
+        # 未访问过session的请求无需处理会话，批量请求的子请求的会话由外层请求保存
+        if req_ctx.session_accessed and req_ctx.parent is None:
+            self.save_session(req_ctx.session, response)
         return response
 
     def wsgi_apl(self, environ: dict, start_response: t.Callable) -> list[bytes]:
@@ -739,26 +1165,189 @@ class Feasp:
           定义的参数为environ、start_response，
           environ：包括所有请求，start_response：可调用对象
         """
+        admission = self.admission_control
+        if admission is None:
+            return self._handle(environ, start_response)
+
+        path = environ.get("PATH_INFO", "/")
+        lane = admission.acquire(path in admission.priority_paths or self.static_manifest.is_static(path))
+        if lane is None:
+            return self._shed(environ, start_response)
+        try:
+            result = self._handle(environ, start_response)
+        except BaseException:
+            admission.release(lane)
+            raise
+        from .admission import ReleasingIterable
+        return ReleasingIterable(result, lambda: admission.release(lane))
+
+    def _handle(self, environ: dict, start_response: t.Callable) -> t.Iterable[bytes]:
         req_ctx = self.request_context(environ)
         with req_ctx:
             request = req_ctx.request
             # -------------------------------------------------------------------------------
-            body, mimetype, status = self.dispatch(request.path, request.method)
+            body, mimetype, status, *headers = self.dispatch(request.path, request.method)
             # -------------------------------------------------------------------------------
-            response = self.make_response(body, mimetype, status)
-            return response(environ, start_response)
+            response = self.make_response(body, mimetype, status, *headers)
+            if request.method == METHOD["GET"] and status == 200:
+                response = self._conditional_response(request, response)
+            result = response(environ, start_response)
+        # 流式正文在发送过程中仍可能提交后台任务
+        if req_ctx.background_tasks or not isinstance(result, list):
+            from .admission import ReleasingIterable
+            return ReleasingIterable(result, lambda: self._run_background(req_ctx))
+        return result
 
-    def run(self, host: str, port: int) -> None:
+    def _conditional_response(self, request: Request, response: Response) -> Response:
+        """
+          处理条件请求：开启auto_etag时为完整的正文生成ETag（流式正文除外），
+          响应带有ETag且与请求的If-None-Match匹配时改为返回不带正文的304
+        """
+        etag = response.headers.get("ETag")
+        if etag is None and self.auto_etag and isinstance(response.body, (str, bytes)):
+            body = response.body.encode("utf-8") if isinstance(response.body, str) else response.body
+            etag = response.headers["ETag"] = make_etag(body)
+        if etag is None or not etag_matches(request.environ.get("HTTP_IF_NONE_MATCH"), etag):
+            return response
+
+        not_modified = self.response_class(b"", None, 304)
+        for key in ("ETag", "Cache-Control", "Set-Cookie"):
+            if key in response.headers:
+                not_modified.headers[key] = response.headers[key]
+        not_modified.header_list = response.header_list
+        return not_modified
+
+    def _shed(self, environ: dict, start_response: t.Callable) -> t.Iterable[bytes]:
+        """ 准入控制拒绝请求时立即返回503，不创建请求上下文 """
+        response = self.response_class(*FEASP_ERROR["HTTP_503"])
+        response.headers["Retry-After"] = str(self.admission_control.retry_after)
+        return response(environ, start_response)
+
+    def run(
+            self,
+            host: str = "127.0.0.1",
+            port: int = 8080,
+            access_log: t.Any = True,
+            threaded: bool = False,
+            unix_socket: t.Optional[str] = None,
+            unix_socket_mode: t.Optional[int] = 0o660,
+            fd: t.Optional[int] = None,
+            reuse_port: bool = False
+    ) -> None:
         """
-          入口方法，可运行起基于WSGI实现的Feasp Server
+          入口方法，可运行起基于WSGI实现的Feasp Server，
+          access_log为True时访问日志以combined格式异步写入标准错误，
+          亦可传入一个AccessLogger以写入文件、使用json格式、轮转或采样，为False时不记录访问日志，
+          threaded为True时每个连接在单独的线程中处理，可配合admission_control限制并发，
+          unix_socket、fd与reuse_port见FeaspServer
+          使用示例：
+          app.run(unix_socket="/run/feasp.sock")   # 由nginx等反向代理转发
+          app.run("0.0.0.0", 8000, reuse_port=True)   # 多个进程监听同一端口
         """
-        simple_server = FeaspServer(host, port)
-        simple_server.run(self.wsgi_apl)
+        self.static_manifest.start_watcher()
+        if access_log is True:
+            from .access_log import AccessLogger
+            access_log = AccessLogger()
+        if self.admission_control is not None and not threaded:
+            warnings.warn("admission_control has no effect on a single-threaded server, use threaded=True")
+        simple_server = FeaspServer(host, port, access_log or None, threaded,
+                                    unix_socket, unix_socket_mode, fd, reuse_port)
+        try:
+            simple_server.run(self.wsgi_apl)
+        finally:
+            if self.background_queue is not None:
+                self.background_queue.shutdown(self.background_drain_timeout)
 
     def __repr__(self):
         return f"{type(self).__name__} Route: {self.url_func_map}"
 
 
+_row_classes: dict[tuple[str, tuple[str, ...]], type] = {}
+
+
+# 行类自身的属性，与之同名的列会被重命名
+_ROW_RESERVED: frozenset = frozenset({"_fields", "_asdict"})
+
+
+def make_row_class(tb_name: str, columns: t.Sequence[str]) -> type:
+    """
+      为数据库表的结构生成一个使用__slots__的行类，同样的结构只会生成一次，
+      行对象支持obj.attr与obj[index]访问，比字典占用更少的内存，
+      通过_asdict()转换为字典，Feasp返回JSON时会自动调用它，
+      不是标识符或以双下划线开头（会与特殊方法冲突或被改写）的列名改为column_<序号>，关键字加上后缀_，
+      与行类的属性同名（_fields、_asdict）或重复的列名加上后缀_<序号>
+    """
+    fields = []
+    for i, c_name in enumerate(columns):
+        if not c_name.isidentifier() or c_name.startswith("__"):
+            c_name = f"column_{i}"
+        elif keyword.iskeyword(c_name):
+            c_name = c_name + '_'
+        if c_name in _ROW_RESERVED:
+            c_name = f"{c_name}_{i}"
+        while c_name in fields:
+            c_name = f"{c_name}_{i}"
+        fields.append(c_name)
+    fields = tuple(fields)
+
+    key = (tb_name, fields)
+    row_class = _row_classes.get(key)
+    if row_class is not None:
+        return row_class
+
+    # 生成__init__的代码，逐个赋值比循环调用setattr更快
+    args = ", ".join(f"_{i}" for i in range(len(fields)))
+    body = "".join(f"    self.{f_name} = _{i}\n" for i, f_name in enumerate(fields)) or "    pass\n"
+    namespace: dict = {}
+    exec(f"def __init__(self, {args}):\n{body}", namespace)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(getattr(self, f_name) for f_name in fields[index])
+        return getattr(self, fields[index])
+
+    def __iter__(self):
+        return (getattr(self, f_name) for f_name in fields)
+
+    def __len__(self):
+        return len(fields)
+
+    def __eq__(self, other):
+        if isinstance(other, (tuple, type(self))):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __repr__(self):
+        values = ", ".join(f"{f_name}={getattr(self, f_name)!r}" for f_name in fields)
+        return f"{type(self).__name__}({values})"
+
+    def _asdict(self):
+        return {f_name: getattr(self, f_name) for f_name in fields}
+
+    class_name = tb_name if tb_name.isidentifier() else "Row"
+    row_class = type(class_name, (), {
+        "__slots__": fields,
+        "_fields": fields,
+        "__init__": namespace["__init__"],
+        "__getitem__": __getitem__,
+        "__iter__": __iter__,
+        "__len__": __len__,
+        "__eq__": __eq__,
+        "__hash__": None,
+        "__repr__": __repr__,
+        "_asdict": _asdict,
+    })
+    _row_classes[key] = row_class
+    return row_class
+
+
+def _json_default(obj: t.Any) -> t.Any:
+    """ 供json.dumps使用，将行对象转换为字典 """
+    if hasattr(obj, "_asdict"):
+        return obj._asdict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
 class SimpleSqlite:
     """
       SimpleSqlite基于Sqlite3提供了更简单便捷的方式来进行数据库的简单的增删改查
@@ -788,13 +1377,35 @@ class SimpleSqlite:
             res = handler.fetch_all("Student")
             print(res)
 
+      全文搜索举例：
+        with SimpleSqlite("test.db") as handler:
+            handler.create_search_index("Student", ["Name"])
+            res = handler.search("Student", "XueFeng", limit=10)
+
+      使用行对象举例（row_class=True时查询结果为行对象而不是元组）：
+        with SimpleSqlite("test.db", row_class=True) as handler:
+            student = handler.fetch_all("Student")[0]
+            print(student.Name, student.Age)
+
       注意：create_table不可重复调用，数据库表不可重复，不要重复的去创建同名表
     """
 
-    def __init__(self, db_name: str):
+    def __init__(self, db_name: str, row_class: bool = False):
         self.__db_name: str = db_name
+        # sqlite3在第一次连接数据库时才导入
+        import sqlite3
+
         self.__conn = sqlite3.connect(f"{self.__db_name}")
         self.__cursor = self.__conn.cursor()
+        # 为True时fetch_all与search返回make_row_class生成的行对象
+        self.row_class: bool = row_class
+
+    def _make_rows(self, tb_name: str, cursor: "sqlite3.Cursor") -> list:
+        rows = cursor.fetchall()
+        if not self.row_class:
+            return rows
+        row_class = make_row_class(tb_name, [description[0] for description in cursor.description])
+        return [row_class(*row) for row in rows]
 
     def create_table(self, tb_name: str, colum_name: list[str]) -> None:
         """
@@ -882,7 +1493,230 @@ class SimpleSqlite:
 
         result = self.__cursor.execute(fetch_all_sql)
         self.__conn.commit()
-        return result.fetchall()
+        return self._make_rows(tb_name, result)
+
+    def create_search_index(self, tb_name: str, colum_name: list[str]) -> None:
+        """
+          为数据库表创建FTS5全文索引（虚拟表{tb_name}_fts），并通过触发器与原表保持同步，
+          已存在的行会在创建时被索引，之后对原表的增删改会自动更新索引
+          :param tb_name: 数据库表的名称
+          :param colum_name: 需要被搜索的列名
+        """
+        fts_name = f"{tb_name}_fts"
+        columns = ", ".join(colum_name)
+        new_values = ", ".join(f"new.{c_name}" for c_name in colum_name)
+        old_values = ", ".join(f"old.{c_name}" for c_name in colum_name)
+        delete_sql = (f"INSERT INTO {fts_name}({fts_name}, rowid, {columns}) "
+                      f"VALUES ('delete', old.rowid, {old_values});")
+        insert_sql = f"INSERT INTO {fts_name}(rowid, {columns}) VALUES (new.rowid, {new_values});"
+
+        self.__cursor.executescript(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts_name}
+                USING fts5({columns}, content='{tb_name}', content_rowid='rowid');
+            CREATE TRIGGER IF NOT EXISTS {fts_name}_ai AFTER INSERT ON {tb_name} BEGIN
+                {insert_sql}
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts_name}_ad AFTER DELETE ON {tb_name} BEGIN
+                {delete_sql}
+            END;
+            CREATE TRIGGER IF NOT EXISTS {fts_name}_au AFTER UPDATE ON {tb_name} BEGIN
+                {delete_sql}
+                {insert_sql}
+            END;
+            INSERT INTO {fts_name}({fts_name}) VALUES ('rebuild');
+        """)
+        self.__conn.commit()
+
+    def drop_search_index(self, tb_name: str) -> None:
+        """
+          :param tb_name: 数据库表的名称，删除它的全文索引以及同步用的触发器
+        """
+        fts_name = f"{tb_name}_fts"
+        self.__cursor.executescript(f"""
+            DROP TRIGGER IF EXISTS {fts_name}_ai;
+            DROP TRIGGER IF EXISTS {fts_name}_ad;
+            DROP TRIGGER IF EXISTS {fts_name}_au;
+            DROP TABLE IF EXISTS {fts_name};
+        """)
+        self.__conn.commit()
+
+    def search(
+            self,
+            tb_name: str,
+            query: str,
+            limit: int = 10,
+            raw: bool = False,
+            highlight: tuple[str, str] = ("<b>", "</b>")
+    ) -> list:
+        """
+          使用create_search_index创建的全文索引进行搜索，按相关度排序，
+          返回的每一行为原表的所有列加上一个匹配片段（匹配的词被highlight包围）
+          :param tb_name: 数据库表的名称
+          :param query: 搜索的内容，默认按空格分词且每个词都需要匹配
+          :param limit: 最多返回的行数
+          :param raw: 为True时query直接作为FTS5的查询语法使用，例如 "Xue* OR Lns"
+        """
+        fts_name = f"{tb_name}_fts"
+        if not raw:
+            # 将每个词用引号包围，用户输入的特殊字符不会被当作FTS5的查询语法
+            query = " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+            if not query:
+                return []
+        search_sql = (f"SELECT {tb_name}.*, snippet({fts_name}, -1, ?, ?, '...', 16) AS snippet "
+                      f"FROM {fts_name} JOIN {tb_name} ON {tb_name}.rowid = {fts_name}.rowid "
+                      f"WHERE {fts_name} MATCH ? ORDER BY {fts_name}.rank LIMIT ?")
+
+        result = self.__cursor.execute(search_sql, (highlight[0], highlight[1], query, limit))
+        return self._make_rows(f"{tb_name}Result", result)
+
+    def _import_rows(self, tb_name: str, columns: t.Optional[list[str]], rows: t.Iterable, batch_size: int) -> int:
+        """
+          分批将rows插入数据库表，每批在一个事务中通过executemany完成，
+          内存占用只与batch_size有关，返回插入的行数
+        """
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return 0
+        placeholders = ", ".join("?" for _ in first)
+        if columns:
+            insert_sql = f"INSERT INTO {tb_name} ({', '.join(columns)}) VALUES ({placeholders})"
+        else:
+            insert_sql = f"INSERT INTO {tb_name} VALUES ({placeholders})"
+
+        count = 0
+        batch = [first]
+        while True:
+            batch.extend(itertools.islice(rows, batch_size - len(batch)))
+            if not batch:
+                break
+            self.__cursor.executemany(insert_sql, batch)
+            self.__conn.commit()
+            count += len(batch)
+            batch = []
+        return count
+
+    def import_csv(self, tb_name: str, fp: t.TextIO, header: bool = True, batch_size: int = 10000) -> int:
+        """
+          从文件对象中流式导入CSV，返回导入的行数
+          :param tb_name: 数据库表的名称
+          :param fp: 以newline=''打开的文本文件对象
+          :param header: 为True时第一行为列名
+        """
+        import csv
+
+        reader = csv.reader(fp)
+        columns = next(reader, None) if header else None
+        return self._import_rows(tb_name, columns, reader, batch_size)
+
+    def import_ndjson(self, tb_name: str, fp: t.TextIO, batch_size: int = 10000) -> int:
+        """
+          从文件对象中流式导入NDJSON（每行一个JSON对象或数组），返回导入的行数，
+          每行为对象时以第一行的键作为列名
+          :param tb_name: 数据库表的名称
+          :param fp: 文本文件对象
+        """
+        lines = (json.loads(line) for line in fp if line.strip())
+        first = next(lines, None)
+        if first is None:
+            return 0
+        if isinstance(first, dict):
+            columns = list(first)
+            rows = (tuple(item.get(c_name) for c_name in columns) for item in itertools.chain([first], lines))
+        else:
+            columns = None
+            rows = itertools.chain([first], lines)
+        return self._import_rows(tb_name, columns, rows, batch_size)
+
+    def _iter_export_rows(self, tb_name: str, batch_size: int) -> tuple[list[str], t.Iterator[list]]:
+        """ 使用单独的游标分批读取数据库表，返回列名与每批行的迭代器 """
+        cursor = self.__conn.cursor()
+        cursor.execute(f"SELECT * FROM {tb_name}")
+        columns = [description[0] for description in cursor.description]
+
+        def batches() -> t.Iterator[list]:
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+        return columns, batches()
+
+    @staticmethod
+    def _write_or_yield(
+            chunks: t.Callable[[t.Iterator[list]], t.Iterator[str]],
+            batches: t.Iterator[list],
+            fp: t.Optional[t.TextIO]
+    ) -> t.Union[int, t.Iterator[str]]:
+        """ chunks将每批行转换为文本块，传入fp时写入文件对象并返回导出的行数，否则返回文本块的生成器 """
+        if fp is None:
+            return chunks(batches)
+        count = 0
+
+        def counted() -> t.Iterator[list]:
+            nonlocal count
+            for rows in batches:
+                count += len(rows)
+                yield rows
+
+        for chunk in chunks(counted()):
+            fp.write(chunk)
+        return count
+
+    def export_csv(
+            self,
+            tb_name: str,
+            fp: t.Optional[t.TextIO] = None,
+            header: bool = True,
+            batch_size: int = 1000
+    ) -> t.Union[int, t.Iterator[str]]:
+        """
+          流式导出CSV，传入fp时写入文件对象并返回导出的行数（不含列名），
+          否则返回一个产生CSV文本块的生成器，可直接作为make_response的正文，
+          注意生成器在发送响应时才读取数据库，此时连接不能已经被关闭
+          :param tb_name: 数据库表的名称
+          :param batch_size: 每次从游标读取的行数，也是每个文本块包含的行数
+        """
+        import csv
+
+        columns, batches = self._iter_export_rows(tb_name, batch_size)
+
+        def chunks(batches: t.Iterator[list]) -> t.Iterator[str]:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if header:
+                writer.writerow(columns)
+            for rows in batches:
+                writer.writerows(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        return self._write_or_yield(chunks, batches, fp)
+
+    def export_ndjson(
+            self,
+            tb_name: str,
+            fp: t.Optional[t.TextIO] = None,
+            batch_size: int = 1000
+    ) -> t.Union[int, t.Iterator[str]]:
+        """
+          流式导出NDJSON，每行为一个以列名为键的JSON对象，
+          传入fp时写入文件对象并返回导出的行数，否则返回一个产生文本块的生成器
+          :param tb_name: 数据库表的名称
+          :param batch_size: 每次从游标读取的行数，也是每个文本块包含的行数
+        """
+        columns, batches = self._iter_export_rows(tb_name, batch_size)
+
+        def chunks(batches: t.Iterator[list]) -> t.Iterator[str]:
+            dumps = json.dumps
+            for rows in batches:
+                yield "".join(dumps(dict(zip(columns, row))) + "\n" for row in rows)
+        return self._write_or_yield(chunks, batches, fp)
 
     def close(self):
         """ 操作完成时调用此方法关闭游标以及连接 """
@@ -901,15 +1735,15 @@ class SimpleSqlite:
 
 
 def make_response(
-        body: t.Union[str, bytes],
+        body: t.Union[str, bytes, t.Iterator],
         mimetype: str = "text/html",
         status: int = 200) -> Response:
     """
       提供一个函数，该函数使用以下三个参数自定义响应，
-      body: 响应正文, mimetype: 响应类型, status: 响应状态码
+      body: 响应正文（亦可为产生字符串块的生成器）, mimetype: 响应类型, status: 响应状态码
     """
 
-    if isinstance(body, str) or isinstance(body, bytes):
+    if isinstance(body, str) or isinstance(body, bytes) or isinstance(body, Iterator):
         return Response(body, mimetype, status)
     return Response(*FEASP_ERROR["HTTP_500"])
 
@@ -922,16 +1756,69 @@ def render_template(filename: str, **context: dict) -> str:
       **context是来自用户传入的上下文变量，它包含键值结构，
       你应该像这样写filename: /index.html or index.html
       具体使用见example目录: example/app.py -> index and show_variable
+      模板编译后会被缓存，Extends继承的基础布局在每个进程中只会解析一次
     """
 
-    if filename[0] == '/':
-        filename = filename[1:]
+    return _global_var["app"].template_loader.render(filename, context)
 
-    filepath = os.path.join(
-        _global_var["user_pkg_abspath"], "templates", filename)
-    with open(filepath, 'r', encoding="utf-8") as fp:
-        text = fp.read()
-    return FeaspTemplate(text, context).render()
+
+def stream_template(filename: str, chunk_size: int = 8192, **context: dict) -> Response:
+    """
+      与render_template相同，但返回一个正文为生成器的响应，
+      模板在发送响应的过程中边渲染边发送，每次至少发送chunk_size个字符，
+      适合很长的页面，客户端可以更早地收到第一个字节
+      具体使用见example目录: example/app.py -> stream_list
+    """
+
+    ctx = _request_ctx_stack.top
+    loader = _global_var["app"].template_loader
+    # 在发送响应之前取得模板，模板不存在或有语法错误时仍按正常的流程返回404或500
+    template = loader.get_template(filename)
+    chunks = loader.stream(template, context, chunk_size)
+
+    def generate() -> t.Iterator[str]:
+        # 正文在视图返回之后才被迭代，因此需要重新压入请求上下文
+        _request_ctx_stack.push(ctx)
+        try:
+            yield from chunks
+        finally:
+            _request_ctx_stack.pop()
+
+    return Response(generate(), "text/html", 200)
+
+
+def event_stream(source: t.Any, heartbeat: float = 15.0, retry: t.Optional[int] = None) -> Response:
+    """
+      返回服务器推送事件（text/event-stream）的响应，
+      source为EventHub时订阅其广播，客户端重连时根据请求头Last-Event-ID补发错过的事件，
+      没有新事件时每隔heartbeat秒发送一次心跳，
+      source亦可为任意可迭代对象，其中的每一项作为一个事件的数据，(event, data)元组为带名称的事件，
+      retry为客户端断线后重连的等待毫秒数
+      使用示例：
+      return event_stream(hub)
+    """
+    from .sse import EventHub, format_event
+
+    if isinstance(source, EventHub):
+        last_event_id = _request_ctx_stack.top.request.environ.get("HTTP_LAST_EVENT_ID", "")
+        events = source.subscribe(int(last_event_id) if last_event_id.isdigit() else None, heartbeat)
+    else:
+        events = (format_event(item[1], item[0]) if isinstance(item, tuple) else format_event(item)
+                  for item in source)
+
+    def generate() -> t.Iterator[str]:
+        try:
+            if retry is not None:
+                yield f"retry: {retry}\n\n"
+            yield from events
+        finally:
+            events.close()
+
+    response = Response(generate(), "text/event-stream", 200)
+    response.headers["Cache-Control"] = "no-cache"
+    # 避免反向代理缓冲事件流
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 
 def redirect(request_url: str) -> str:
@@ -957,20 +1844,46 @@ def url_for(endpoint: str, filename: t.Optional[str] = None) -> str:
     """
 
     if endpoint and not filename:
+        # freeze建立的端点索引
+        endpoint_paths = _global_var.get("endpoint_paths")
+        if endpoint_paths is not None and endpoint in endpoint_paths:
+            return endpoint_paths[endpoint]
         url_func_map = _global_var["url_func_map"]
         for path, values in url_func_map.items():
             if endpoint in values:
                 return path
     elif endpoint and filename:
-        # base_url = "http://127.0.0.1:8000/"   # 暂时硬编码
-        base_url = request.url_scheme + request.http_host + "/"
-        request_url = os.path.join(base_url, endpoint, filename)
-        return request_url
+        # 静态文件的URL由挂载点决定，例如 url_for('static', filename='head.jpg') -> /static/head.jpg
+        request_url = _global_var["static_manifest"].url_for(endpoint, filename)
+        if request_url is not None:
+            return request_url
     raise FeaspNotFound("not found view function")
 
 
+def bundle(name: str) -> "Markup":
+    """
+      返回引用打包后文件（见Feasp.add_bundle）的<link>或<script>标签，URL带有内容哈希
+      :raise FeaspNotFound
+    """
+    assets = _global_var.get("assets")
+    if assets is None:
+        raise FeaspNotFound(f"not found bundle: {name}")
+    return assets.tag(name)
+
+
+def remaining_time() -> t.Optional[float]:
+    """
+      返回当前请求距离截止时间的秒数，可用于设置数据库或外部请求的超时，
+      当前请求未设置超时时返回None
+    """
+    deadline = _request_ctx_stack.top.deadline
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
 @contextmanager
-def connect(db_name: str) -> None:
+def connect(db_name: str, row_class: bool = False) -> None:
     """
       提供一个更为简洁明了且安全的接口以供对SimpleSqlite的使用
       使用示例（推荐使用此接口，而不是直接使用SimpleSqlite）：
@@ -982,17 +1895,31 @@ def connect(db_name: str) -> None:
           handler.update("Student", {"Name": "Lns-XueFeng"}, ("Name", "Lns_XueFeng"))
           res = handler.fetch_all("Student")
           print(res)
+      row_class为True时查询结果为行对象，可以使用res[0].Name访问
       注意：create_table不可重复调用，数据库表不可重复，不要重复的去创建同名表
     """
     try:
-        handler = SimpleSqlite(db_name)
+        handler = SimpleSqlite(db_name, row_class)
         yield handler
     finally:
         handler.close()
 
 
+def write_behind(db_name: str, **options: t.Any) -> t.Any:
+    """
+      返回db_name对应的写后队列（WriteBehindQueue），适合在视图中提交无需立即完成的写操作，
+      同一个数据库文件只有一个写线程，多个请求的写操作会被合并为一次事务提交，
+      options可以设置batch_size、max_latency、maxsize，只在第一次创建队列时生效
+      使用示例：
+      write_behind('feasp.db').submit("INSERT INTO UserLogin VALUES (?, ?)", (username, password))
+    """
+    from .write_queue import get_write_queue
+    return get_write_queue(db_name, **options)
+
+
 _global_var: dict[t.Any, t.Any] = {}
 _request_ctx_stack: LocalStack = LocalStack()
+_parent_session_lock: threading.Lock = threading.Lock()
 request: Request = LocalProxy(lambda: _request_ctx_stack.top.request)   # 供用户使用的上下文全局request对象
 session: dict = LocalProxy(lambda: _request_ctx_stack.top.session)   # 供用户使用的上下文全局session对象
 current_app: Feasp = LocalProxy(lambda: _request_ctx_stack.top.app)   # 供用户使用的上下文全局current_app对象
@@ -0,0 +1,161 @@
+"""
+Feasp的内存分析：按采样率抽取部分请求，在其视图函数执行期间使用tracemalloc跟踪内存分配，
+按端点汇总峰值与视图返回时仍未释放的内存，以及分配内存最多的代码位置
+"""
+
+
+import os
+import json
+import time
+import random
+import threading
+import tracemalloc
+import typing as t
+
+
+# 不计入tracemalloc与本模块自身的分配
+_FILTERS: list = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+]
+
+
+class EndpointMemory:
+    """ 一个端点在被抽中的请求中的内存统计 """
+
+    __slots__ = ("samples", "peak_max", "peak_total", "retained_total", "sites")
+
+    def __init__(self) -> None:
+        self.samples: int = 0
+        self.peak_max: int = 0
+        self.peak_total: int = 0
+        self.retained_total: int = 0
+        # 代码位置（文件:行号） -> 累计未释放的字节数
+        self.sites: dict[str, int] = {}
+
+    def as_dict(self, top_sites: int) -> dict:
+        samples = self.samples or 1
+        sites = sorted(self.sites.items(), key=lambda item: item[1], reverse=True)[:top_sites]
+        return {
+            "samples": self.samples,
+            "peak_max": self.peak_max,
+            "peak_avg": self.peak_total // samples,
+            "retained_avg": self.retained_total // samples,
+            "top_sites": [{"site": site, "size_avg": size // samples} for site, size in sites],
+        }
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Samples: {self.samples} Peak: {self.peak_max}>"
+
+
+class MemoryProfiler:
+    """
+      MemoryProfiler按sample_rate抽取请求，tracemalloc只在被抽中的请求的视图函数执行期间开启，
+      其它请求不受影响，同一时间只跟踪一个请求，已有请求正在被跟踪时其它请求不会被抽中，
+      跟踪期间其它线程的分配也会被计入，因此并发较低时结果最准确，
+      peak为视图执行期间内存的峰值增量，retained为视图返回时仍未释放的分配，
+      每个端点保留未释放内存最多的top_sites个代码位置，nframe为每个分配记录的调用栈深度，
+      提供dump_path时每隔dump_interval秒将报告以JSON写入该文件
+      使用代码示例:
+        app.memory_profiler = MemoryProfiler(sample_rate=0.01, dump_path="memory.json")
+        app.add_memory_endpoint("/_debug/memory")
+    """
+
+    def __init__(
+            self,
+            sample_rate: float = 0.01,
+            top_sites: int = 10,
+            nframe: int = 1,
+            dump_path: t.Optional[str] = None,
+            dump_interval: float = 60.0
+    ) -> None:
+        self.sample_rate: float = sample_rate
+        self.top_sites: int = top_sites
+        self.nframe: int = nframe
+        self.dump_path: t.Optional[str] = dump_path
+        self.dump_interval: float = dump_interval
+
+        # 保证同一时间只跟踪一个请求
+        self._sampling: threading.Lock = threading.Lock()
+        # 保护各端点的统计
+        self._lock: threading.Lock = threading.Lock()
+        self._endpoints: dict[str, EndpointMemory] = {}
+
+        # 统计信息：被抽中的请求数量
+        self.samples: int = 0
+
+        if dump_path is not None:
+            self._thread: threading.Thread = threading.Thread(target=self._run, name="feasp-memory", daemon=True)
+            self._thread.start()
+
+    def begin(self, endpoint: str) -> t.Optional[tuple]:
+        """ 在执行视图函数之前调用，请求未被抽中时返回None，否则返回end所需的采样信息 """
+        if random.random() >= self.sample_rate:
+            return None
+        if not self._sampling.acquire(blocking=False):
+            return None
+        started = not tracemalloc.is_tracing()
+        before = None
+        if started:
+            tracemalloc.start(self.nframe)
+        else:
+            # tracemalloc已由其它代码开启，通过前后两次快照的差异找出本次请求的分配
+            before = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+        tracemalloc.reset_peak()
+        return endpoint, started, before, tracemalloc.get_traced_memory()[0]
+
+    def end(self, sample: tuple) -> None:
+        """ 在视图函数返回或抛出异常之后调用，汇总本次请求的分配 """
+        endpoint, started, before, start_size = sample
+        try:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+            if started:
+                tracemalloc.stop()
+        finally:
+            self._sampling.release()
+
+        if before is None:
+            sites = [(stat.traceback[0], stat.size) for stat in snapshot.statistics("lineno")]
+        else:
+            sites = [(stat.traceback[0], stat.size_diff)
+                     for stat in snapshot.compare_to(before, "lineno") if stat.size_diff > 0]
+
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointMemory()
+            stats.samples += 1
+            stats.peak_max = max(stats.peak_max, peak - start_size)
+            stats.peak_total += peak - start_size
+            stats.retained_total += max(0, current - start_size)
+            for frame, size in sites[:self.top_sites * 2]:
+                site = f"{frame.filename}:{frame.lineno}"
+                stats.sites[site] = stats.sites.get(site, 0) + size
+            # 只保留累计最多的部分代码位置，避免统计本身不断增长
+            if len(stats.sites) > self.top_sites * 4:
+                kept = sorted(stats.sites.items(), key=lambda item: item[1], reverse=True)[:self.top_sites * 2]
+                stats.sites = dict(kept)
+            self.samples += 1
+
+    def report(self) -> dict:
+        """ 返回各端点的统计，按平均未释放内存从多到少排列 """
+        with self._lock:
+            report = {endpoint: stats.as_dict(self.top_sites) for endpoint, stats in self._endpoints.items()}
+        return dict(sorted(report.items(), key=lambda item: item[1]["retained_avg"], reverse=True))
+
+    def dump(self, path: t.Optional[str] = None) -> None:
+        """ 将报告以JSON写入path（默认为dump_path），先写入临时文件再替换，读取方不会读到写了一半的文件 """
+        path = path or self.dump_path
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            json.dump({"time": time.time(), "samples": self.samples, "endpoints": self.report()}, fp, indent=2)
+        os.replace(tmp_path, path)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.dump_interval)
+            self.dump()
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Rate: {self.sample_rate} Samples: {self.samples}>"
@@ -0,0 +1,231 @@
+"""
+Feasp的限流：以令牌桶按IP、Cookie或自定义的键限制请求频率，
+令牌桶保存在进程内的MemoryBucketStore或多进程共享的SqliteBucketStore中，
+每次检查只读写一个桶，长时间未使用（已重新装满）的桶与不存在的桶等价，会被定期清理
+"""
+
+
+import sys
+import math
+import time
+import functools
+import threading
+import typing as t
+
+from collections import OrderedDict
+
+from .config import FEASP_ERROR
+
+
+def _take_tokens(
+        tokens: float,
+        updated: float,
+        now: float,
+        rate: float,
+        capacity: float,
+        cost: float
+) -> tuple[bool, float]:
+    """ 按经过的时间补充令牌后尝试取出cost个，返回(是否取出, 剩余令牌数) """
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= cost:
+        return True, tokens - cost
+    return False, tokens
+
+
+class BucketStore:
+    """
+      令牌桶存储的接口，自定义的存储需实现take，
+      rate为每秒补充的令牌数，capacity为桶的容量，新的桶是满的
+    """
+
+    def take(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> tuple[bool, float]:
+        """ 从key的桶中取出cost个令牌，返回(是否取出, 剩余令牌数) """
+        raise NotImplementedError
+
+
+class MemoryBucketStore(BucketStore):
+    """
+      进程内的令牌桶存储，按最近使用的顺序保存，每次取令牌时从最久未使用的一端清理已重新装满的桶，
+      最多保存maxsize个桶，超出时淘汰最久未使用的桶，仅适用于单进程部署
+    """
+
+    def __init__(self, maxsize: int = 100000) -> None:
+        self.maxsize: int = maxsize
+        # 键 -> (令牌数, 更新时间, 重新装满的时间)
+        self._buckets: OrderedDict[str, tuple[float, float, float]] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._buckets
+            bucket = buckets.pop(key, None)
+            tokens, updated = (capacity, now) if bucket is None else bucket[:2]
+            allowed, tokens = _take_tokens(tokens, updated, now, rate, capacity, cost)
+            buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            # 每个桶只会被清理一次，均摊下来每次检查仍是O(1)
+            while len(buckets) > self.maxsize or next(iter(buckets.values()))[2] <= now:
+                buckets.popitem(last=False)
+                if not buckets:
+                    break
+        return allowed, tokens
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Size: {len(self._buckets)}/{self.maxsize}>"
+
+
+class SqliteBucketStore(BucketStore):
+    """
+      基于SQLite（WAL模式）的令牌桶存储，同一台机器上的多个进程共享同一份限额，
+      每次检查在一个写事务中按主键读写一行，每个线程使用各自的连接，
+      每purge_every次检查清理一次已重新装满的桶
+    """
+
+    def __init__(self, db_name: str, purge_every: int = 1024) -> None:
+        import sqlite3
+
+        self.db_name: str = db_name
+        self.purge_every: int = purge_every
+        self._sqlite3 = sqlite3
+        self._local: threading.local = threading.local()
+        self._takes: int = 0
+        conn = self._get_conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS feasp_rate_limit"
+                     "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"
+                     " WITHOUT ROWID")
+        conn.execute("CREATE INDEX IF NOT EXISTS feasp_rate_limit_full_at ON feasp_rate_limit(full_at)")
+
+    def _get_conn(self) -> t.Any:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # 事务由take显式管理
+            conn = self._sqlite3.connect(self.db_name, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, capacity: float, cost: float = 1.0) -> tuple[bool, float]:
+        # 多个进程之间只能使用墙上时间
+        now = time.time()
+        conn = self._get_conn()
+        # 立即取得写锁，避免两个进程读到同一个令牌数后各自取出令牌
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM feasp_rate_limit WHERE key = ?", (key,)).fetchone()
+            tokens, updated = (capacity, now) if row is None else row
+            allowed, tokens = _take_tokens(tokens, updated, now, rate, capacity, cost)
+            conn.execute("INSERT OR REPLACE INTO feasp_rate_limit VALUES (?, ?, ?, ?)",
+                         (key, tokens, now, now + (capacity - tokens) / rate))
+            self._takes += 1
+            if self._takes % self.purge_every == 0:
+                conn.execute("DELETE FROM feasp_rate_limit WHERE full_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens
+
+    def __len__(self) -> int:
+        return self._get_conn().execute("SELECT COUNT(*) FROM feasp_rate_limit").fetchone()[0]
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Database: {self.db_name}>"
+
+
+def _make_key_func(key: t.Union[str, t.Callable]) -> t.Callable[[t.Any], t.Optional[str]]:
+    if callable(key):
+        return key
+    if key == "ip":
+        return lambda request: request.environ.get("REMOTE_ADDR") or None
+    if key.startswith("cookie:"):
+        name = key[len("cookie:"):]
+        # 没有该Cookie的请求按IP限流，客户端无法通过删除Cookie绕过限制
+        return lambda request: (f"cookie:{request.cookies[name]}" if request.cookies.get(name)
+                                else request.environ.get("REMOTE_ADDR") or None)
+    raise ValueError(f"unknown rate limit key: {key}")
+
+
+class RateLimit:
+    """
+      RateLimit是一个令牌桶限流策略：每个键每per秒最多limit个请求，允许最多burst（默认为limit）个请求的突发，
+      key为"ip"（REMOTE_ADDR）、"cookie:<名称>"或接收request返回字符串的函数，返回None的请求不受限制，
+      部署在反向代理之后时REMOTE_ADDR是代理的地址，应传入从X-Forwarded-For等请求头中取出客户端地址的函数，
+      超出限额的请求返回429与Retry-After，存储出错（例如SQLite数据库被长时间锁定）时放行请求并在标准错误中输出警告
+      使用代码示例:
+        # 全局策略，作用于所有视图（静态文件除外）
+        app.rate_limit = RateLimit(120, per=60, store=SqliteBucketStore("ratelimit.db"))
+
+        # 单个视图的策略，同一个实例装饰多个视图时这些视图共享限额
+        @app.route("/login", methods=["POST"])
+        @RateLimit(5, per=60, key="cookie:feasp_session")
+        def login():
+            ...
+    """
+
+    def __init__(
+            self,
+            limit: int,
+            per: float = 60.0,
+            burst: t.Optional[int] = None,
+            key: t.Union[str, t.Callable] = "ip",
+            store: t.Optional[BucketStore] = None,
+            name: t.Optional[str] = None
+    ) -> None:
+        if limit <= 0 or per <= 0:
+            raise ValueError(f"rate limit needs a positive limit and period, got {limit}/{per}s")
+        if burst is not None and burst <= 0:
+            raise ValueError(f"rate limit needs a positive burst, got {burst}")
+        self.limit: int = limit
+        self.per: float = per
+        self.rate: float = limit / per
+        self.capacity: float = float(burst if burst is not None else limit)
+        self.key_func: t.Callable[[t.Any], t.Optional[str]] = _make_key_func(key)
+        self.store: BucketStore = store if store is not None else MemoryBucketStore()
+        # 桶的键的前缀，区分共享同一个存储的多个策略，作为装饰器时默认为视图函数的名称
+        self.name: t.Optional[str] = name
+
+        # 统计信息：被拒绝的请求数量，存储出错而放行的请求数量
+        self.rejected: int = 0
+        self.errors: int = 0
+
+    def check(self, request: t.Any) -> tuple[bool, int]:
+        """ 为请求取出一个令牌，返回(是否允许, 被拒绝时客户端应等待的秒数) """
+        key = self.key_func(request)
+        if key is None:
+            return True, 0
+        try:
+            allowed, tokens = self.store.take(f"{self.name or 'global'}:{key}", self.rate, self.capacity)
+        except Exception as e:
+            # 限流不应让正常的请求失败
+            self.errors += 1
+            sys.stderr.write(f"Warning: rate limit store {self.store!r} failed, request allowed: {e!r}\n")
+            return True, 0
+        if allowed:
+            return True, 0
+        self.rejected += 1
+        return False, max(1, math.ceil((1.0 - tokens) / self.rate))
+
+    def __call__(self, func: t.Callable) -> t.Callable:
+        """ 作为视图函数的装饰器，放在app.route之下 """
+        from .feasp import request, make_response
+
+        if self.name is None:
+            self.name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args: t.Any, **kwargs: t.Any) -> t.Any:
+            allowed, retry_after = self.check(request)
+            if not allowed:
+                response = make_response(*FEASP_ERROR["HTTP_429"])
+                response.headers["Retry-After"] = str(retry_after)
+                return response
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Limit: {self.limit}/{self.per}s Store: {self.store}>"
@@ -0,0 +1,298 @@
+"""
+Feasp的服务端会话：Cookie中只保存签名后的会话ID，会话数据保存在服务端的存储中，
+提供进程内的MemorySessionStore与多进程共享的SqliteSessionStore
+"""
+
+
+import hmac
+import json
+import time
+import base64
+import hashlib
+import secrets
+import threading
+import typing as t
+
+from collections import OrderedDict
+
+
+class Session(dict):
+    """
+      Session是一个记录了是否被修改的字典，
+      只有被修改过的会话才会在响应时写回存储
+    """
+
+    def __init__(
+            self,
+            sid: t.Optional[str] = None,
+            data: t.Optional[dict] = None,
+            expires: t.Optional[float] = None
+    ) -> None:
+        super().__init__(data or {})
+        # 会话ID，新的会话在第一次保存时才会分配
+        self.sid: t.Optional[str] = sid
+        # 会话在存储中的过期时间（time.time），存储不提供时为None
+        self.expires: t.Optional[float] = expires
+        self.modified: bool = False
+
+    def __setitem__(self, key, value) -> None:
+        self.modified = True
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key) -> None:
+        self.modified = True
+        super().__delitem__(key)
+
+    def clear(self) -> None:
+        self.modified = True
+        super().clear()
+
+    def pop(self, *args) -> t.Any:
+        self.modified = True
+        return super().pop(*args)
+
+    def popitem(self) -> tuple:
+        self.modified = True
+        return super().popitem()
+
+    def setdefault(self, key, default=None) -> t.Any:
+        if key not in self:
+            self.modified = True
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs) -> None:
+        self.modified = True
+        super().update(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Sid: {self.sid} {dict.__repr__(self)}>"
+
+
+class SessionStore:
+    """
+      会话存储的接口，自定义的存储需实现load、save与delete，
+      ttl为会话过期的秒数，实现load_entry与touch后会话的过期时间才能随访问滑动
+    """
+
+    def load(self, sid: str) -> t.Optional[dict]:
+        raise NotImplementedError
+
+    def load_entry(self, sid: str) -> t.Optional[tuple[dict, t.Optional[float]]]:
+        """ 返回(会话数据, 过期时间)，默认的实现不知道过期时间 """
+        data = self.load(sid)
+        return None if data is None else (data, None)
+
+    def touch(self, sid: str, data: dict, ttl: float) -> None:
+        """ 将会话的过期时间延长至ttl秒之后，默认重新保存整个会话 """
+        self.save(sid, data, ttl)
+
+    def save(self, sid: str, data: dict, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, sid: str) -> None:
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """
+      进程内的会话存储，最多保存maxsize个会话，超出时淘汰最久未使用的会话，
+      仅适用于单进程部署
+    """
+
+    def __init__(self, maxsize: int = 10000) -> None:
+        self.maxsize: int = maxsize
+        # 会话ID -> (会话数据, 过期时间)
+        self._data: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def load(self, sid: str) -> t.Optional[dict]:
+        entry = self.load_entry(sid)
+        return None if entry is None else entry[0]
+
+    def load_entry(self, sid: str) -> t.Optional[tuple[dict, float]]:
+        with self._lock:
+            item = self._data.get(sid)
+            if item is None:
+                return None
+            if item[1] <= time.time():
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return dict(item[0]), item[1]
+
+    def touch(self, sid: str, data: dict, ttl: float) -> None:
+        with self._lock:
+            item = self._data.get(sid)
+            if item is not None:
+                self._data[sid] = (item[0], time.time() + ttl)
+
+    def save(self, sid: str, data: dict, ttl: float) -> None:
+        with self._lock:
+            self._data[sid] = (dict(data), time.time() + ttl)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Size: {len(self._data)}/{self.maxsize}>"
+
+
+class SqliteSessionStore(SessionStore):
+    """
+      基于SQLite的会话存储，会话数据以JSON保存，同一台机器上的多个进程可以共享，
+      每个线程使用各自的连接，过期的会话会在写入时被定期清理
+    """
+
+    def __init__(self, db_name: str, purge_every: int = 256) -> None:
+        import sqlite3
+
+        self.db_name: str = db_name
+        self.purge_every: int = purge_every
+        self._sqlite3 = sqlite3
+        self._local: threading.local = threading.local()
+        self._writes: int = 0
+        conn = self._get_conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS feasp_session"
+                     "(sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)")
+        conn.commit()
+
+    def _get_conn(self) -> t.Any:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._sqlite3.connect(self.db_name, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, sid: str) -> t.Optional[dict]:
+        entry = self.load_entry(sid)
+        return None if entry is None else entry[0]
+
+    def load_entry(self, sid: str) -> t.Optional[tuple[dict, float]]:
+        row = self._get_conn().execute(
+            "SELECT data, expires FROM feasp_session WHERE sid = ?", (sid,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0]), row[1]
+
+    def touch(self, sid: str, data: dict, ttl: float) -> None:
+        # 只更新过期时间，不重写会话数据
+        conn = self._get_conn()
+        with conn:
+            conn.execute("UPDATE feasp_session SET expires = ? WHERE sid = ?", (time.time() + ttl, sid))
+
+    def save(self, sid: str, data: dict, ttl: float) -> None:
+        now = time.time()
+        conn = self._get_conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO feasp_session VALUES (?, ?, ?)",
+                         (sid, json.dumps(data), now + ttl))
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                conn.execute("DELETE FROM feasp_session WHERE expires <= ?", (now,))
+
+    def delete(self, sid: str) -> None:
+        conn = self._get_conn()
+        with conn:
+            conn.execute("DELETE FROM feasp_session WHERE sid = ?", (sid,))
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Database: {self.db_name}>"
+
+
+class SessionInterface:
+    """
+      SessionInterface负责打开与保存会话，Cookie的值为`会话ID.签名`，
+      签名为HMAC-SHA256截断后的base64编码，无法伪造也无法从中读出会话数据，
+      sliding为True时过期时间随访问滑动：访问了会话的请求在剩余时间不足ttl的一半时延长存储中的过期时间并刷新Cookie，
+      因此活跃的用户在最后一次访问之后ttl秒（至多提前ttl/2）才会过期，为False时会话在最后一次修改之后ttl秒过期，
+      使用代码示例:
+        app = Feasp(__name__)
+        app.session_interface = SessionInterface("secret key", SqliteSessionStore("session.db"))
+    """
+
+    def __init__(
+            self,
+            secret_key: t.Union[str, bytes],
+            store: t.Optional[SessionStore] = None,
+            cookie_name: str = "feasp_session",
+            ttl: float = 86400,
+            sliding: bool = True
+    ) -> None:
+        if not secret_key:
+            raise ValueError("secret_key is required to sign session ids")
+        if isinstance(secret_key, str):
+            secret_key = secret_key.encode("utf-8")
+        self.secret_key: bytes = secret_key
+        self.store: SessionStore = store if store is not None else MemorySessionStore()
+        self.cookie_name: str = cookie_name
+        self.ttl: float = ttl
+        self.sliding: bool = sliding
+
+    def _sign(self, sid: str) -> str:
+        digest = hmac.new(self.secret_key, sid.encode("utf-8"), hashlib.sha256).digest()[:16]
+        return base64.urlsafe_b64encode(digest).rstrip(b'=').decode("ascii")
+
+    def get_signed_id(self, sid: str) -> str:
+        return f"{sid}.{self._sign(sid)}"
+
+    def unsign_id(self, value: str) -> t.Optional[str]:
+        """ 校验Cookie中的签名，签名无效时返回None """
+        sid, _, signature = value.rpartition('.')
+        if not sid or not hmac.compare_digest(signature.encode("utf-8"), self._sign(sid).encode("utf-8")):
+            return None
+        return sid
+
+    def open_session(self, request: t.Any) -> Session:
+        """ 根据请求Cookie中的会话ID加载会话，找不到时返回一个新的空会话 """
+        value = request.cookies.get(self.cookie_name)
+        if value:
+            sid = self.unsign_id(value)
+            if sid is not None:
+                entry = self.store.load_entry(sid)
+                if entry is not None:
+                    return Session(sid, *entry)
+        return Session()
+
+    def _set_cookie(self, session: Session, response: t.Any) -> None:
+        response.add_header(
+            "Set-Cookie",
+            f"{self.cookie_name}={self.get_signed_id(session.sid)}; "
+            f"Path=/; Max-Age={int(self.ttl)}; HttpOnly; SameSite=Lax")
+
+    def save_session(self, session: Session, response: t.Any) -> None:
+        """
+          只有被修改过的会话才会写回存储并刷新Cookie，新的会话此时才分配ID，
+          未被修改的会话在剩余时间不足ttl的一半时延长过期时间，见sliding
+        """
+        if not session.modified:
+            now = time.time()
+            if (self.sliding and session.sid is not None and session.expires is not None
+                    and session.expires - now < self.ttl / 2):
+                self.store.touch(session.sid, dict(session), self.ttl)
+                session.expires = now + self.ttl
+                self._set_cookie(session, response)
+            return
+
+        if not session:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+                response.add_header("Set-Cookie", f"{self.cookie_name}=; Path=/; Max-Age=0")
+            return
+
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(16)
+        self._set_cookie(session, response)
+        self.store.save(session.sid, dict(session), self.ttl)
+        session.expires = time.time() + self.ttl
+        session.modified = False
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Store: {self.store}>"
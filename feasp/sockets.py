@@ -0,0 +1,131 @@
+"""
+Feasp服务器的监听套接字：除TCP地址之外，还可以监听Unix域套接字或使用从父进程继承的文件描述符，
+并支持SO_REUSEPORT，使多个进程绑定同一端口，由内核在它们之间分配连接
+"""
+
+
+import os
+import stat
+import errno
+import socket
+import typing as t
+
+from socketserver import TCPServer
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer
+
+from .config import NotSupportType
+
+
+class FeaspWSGIServer(WSGIServer):
+    """
+      FeaspWSGIServer在WSGIServer的基础上支持SO_REUSEPORT与Unix域套接字，
+      Unix域套接字的连接没有客户端地址，REMOTE_ADDR为空字符串，
+      SERVER_NAME为套接字文件的路径，SERVER_PORT为空字符串
+    """
+
+    # 为True时在绑定前设置SO_REUSEPORT
+    reuse_port: bool = False
+
+    # Unix域套接字文件的权限，为None时由umask决定
+    unix_socket_mode: t.Optional[int] = None
+
+    # 服务器自己创建的Unix域套接字文件，关闭时删除
+    _unix_socket_path: t.Optional[str] = None
+
+    def server_bind(self) -> None:
+        if self.address_family != socket.AF_UNIX:
+            if self.reuse_port:
+                if not hasattr(socket, "SO_REUSEPORT"):
+                    raise NotSupportType("SO_REUSEPORT is not supported on this platform")
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            super().server_bind()
+            return
+
+        path = self.server_address
+        self._remove_stale_socket(path)
+        TCPServer.server_bind(self)
+        self._unix_socket_path = path
+        if self.unix_socket_mode is not None:
+            os.chmod(path, self.unix_socket_mode)
+        self.setup_names()
+
+    @staticmethod
+    def _remove_stale_socket(path: str) -> None:
+        """ 删除上一次运行遗留的套接字文件，仍有进程在监听时保留，之后的绑定会因地址被占用而失败 """
+        try:
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                return
+        except FileNotFoundError:
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(path)
+            except ConnectionRefusedError:
+                os.unlink(path)
+
+    def setup_names(self) -> None:
+        """ 根据已绑定的地址设置SERVER_NAME与SERVER_PORT """
+        if self.address_family == socket.AF_UNIX:
+            self.server_name, self.server_port = str(self.server_address), ""
+        else:
+            host, port = self.server_address[:2]
+            self.server_name, self.server_port = socket.getfqdn(host), port
+        self.setup_environ()
+
+    def get_request(self) -> tuple:
+        request, client_address = self.socket.accept()
+        if self.address_family == socket.AF_UNIX:
+            client_address = ("", 0)
+        return request, client_address
+
+    def server_close(self) -> None:
+        super().server_close()
+        path, self._unix_socket_path = self._unix_socket_path, None
+        if path is not None:
+            try:
+                os.unlink(path)
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+
+
+def make_server(
+        app: t.Callable,
+        handler_class: type,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        threaded: bool = False,
+        unix_socket: t.Optional[str] = None,
+        unix_socket_mode: t.Optional[int] = None,
+        fd: t.Optional[int] = None,
+        reuse_port: bool = False
+) -> FeaspWSGIServer:
+    """
+      创建监听host:port的服务器，
+      提供unix_socket时改为监听该路径的Unix域套接字，提供fd时直接使用该文件描述符上已绑定的套接字
+      （例如systemd的套接字激活传入的3），fd的优先级最高，
+      threaded为True时每个连接在单独的线程中处理
+    """
+    bases: tuple = (FeaspWSGIServer,)
+    attrs: dict = {"reuse_port": reuse_port, "unix_socket_mode": unix_socket_mode}
+    if threaded:
+        # 准入控制负责限制并发，这里只需放宽监听队列，避免突发的连接在内核中被拒绝
+        bases = (ThreadingMixIn, FeaspWSGIServer)
+        attrs.update(daemon_threads=True, request_queue_size=128)
+
+    if fd is not None:
+        sock = socket.socket(fileno=fd)
+        attrs["address_family"] = sock.family
+        server = type("FeaspWSGIServer", bases, attrs)(sock.getsockname(), handler_class, bind_and_activate=False)
+        server.socket.close()
+        server.socket = sock
+        server.setup_names()
+        server.server_activate()
+    elif unix_socket is not None:
+        attrs["address_family"] = socket.AF_UNIX
+        server = type("FeaspWSGIServer", bases, attrs)(unix_socket, handler_class)
+    else:
+        server = type("FeaspWSGIServer", bases, attrs)((host, port), handler_class)
+    server.set_app(app)
+    return server
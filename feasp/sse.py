@@ -0,0 +1,117 @@
+"""
+Feasp的服务器推送事件（Server-Sent Events）：EventHub是进程内的广播中心，
+每个事件只格式化一次，所有订阅者共享同一份文本，
+订阅者断线重连时根据Last-Event-ID补发错过的事件
+"""
+
+
+import json
+import threading
+import typing as t
+
+from collections import deque
+
+
+def format_event(
+        data: t.Any,
+        event: t.Optional[str] = None,
+        event_id: t.Optional[t.Union[int, str]] = None,
+        retry: t.Optional[int] = None
+) -> str:
+    """ 将事件格式化为text/event-stream中的一段，字典与列表以JSON发送，多行数据拆分为多个data字段 """
+    if not isinstance(data, str):
+        data = json.dumps(data, ensure_ascii=False)
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    if retry is not None:
+        lines.append(f"retry: {retry}")
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+class EventHub:
+    """
+      EventHub按发布顺序为事件分配递增的ID，并保留最近history个事件供重连的订阅者补发，
+      订阅者在没有新事件时等待，每隔heartbeat秒发送一个注释行以保持连接并及时发现断开的客户端，
+      每个订阅者占用一个线程，需配合app.run(threaded=True)使用
+      使用代码示例:
+        hub = EventHub()
+
+        @app.route("/events", methods=["GET"])
+        def events():
+            return event_stream(hub)
+
+        hub.publish({"user": "XueFeng", "text": "Hello"}, event="message")
+    """
+
+    def __init__(self, history: int = 256) -> None:
+        self.history: int = history
+        # (事件ID, 格式化后的事件)，ID是连续的，因此可以直接按下标取出某个ID之后的事件
+        self._events: deque[tuple[int, str]] = deque(maxlen=history)
+        self._condition: threading.Condition = threading.Condition()
+        self._last_id: int = 0
+        self._closed: bool = False
+
+        # 统计信息：当前的订阅者数量
+        self.subscribers: int = 0
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, data: t.Any, event: t.Optional[str] = None) -> int:
+        """ 向所有订阅者广播一个事件，返回事件ID """
+        with self._condition:
+            self._last_id += 1
+            self._events.append((self._last_id, format_event(data, event, self._last_id)))
+            self._condition.notify_all()
+            return self._last_id
+
+    def _since(self, last_id: int) -> list[str]:
+        """ 返回ID大于last_id的事件，调用时需持有锁 """
+        missed = self._last_id - last_id
+        if missed <= 0:
+            return []
+        events = self._events
+        start = max(0, len(events) - missed)
+        return [events[i][1] for i in range(start, len(events))]
+
+    def subscribe(self, last_event_id: t.Optional[int] = None, heartbeat: float = 15.0) -> t.Iterator[str]:
+        """
+          返回产生事件文本的生成器，last_event_id为客户端收到的最后一个事件的ID，
+          为None时只接收订阅之后发布的事件，EventHub关闭后生成器结束
+        """
+        with self._condition:
+            last_id = self._last_id
+            if last_event_id is not None and 0 <= last_event_id < last_id:
+                last_id = last_event_id
+            self.subscribers += 1
+        try:
+            while True:
+                with self._condition:
+                    if self._last_id == last_id and not self._closed:
+                        self._condition.wait(heartbeat)
+                    pending = self._since(last_id)
+                    last_id = self._last_id
+                    closed = self._closed
+                if pending:
+                    yield "".join(pending)
+                elif closed:
+                    return
+                else:
+                    yield ": keep-alive\n\n"
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+    def close(self) -> None:
+        """ 结束所有订阅者的事件流 """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Last-ID: {self._last_id} Subscribers: {self.subscribers}>"
@@ -0,0 +1,260 @@
+"""
+Feasp的静态文件：启动时为挂载的静态目录建立清单，
+记录每个文件的大小、修改时间、MIME类型与内容哈希，请求静态文件时无需再访问文件系统查找，
+后台线程定期检查目录的变化并刷新清单
+"""
+
+
+import os
+import time
+import hashlib
+import mimetypes
+import threading
+import typing as t
+
+
+# 需要在Content-Type中声明字符集的文本类型
+TEXT_MIMETYPES: frozenset = frozenset({
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+})
+
+
+# 带有内容哈希的URL永远不会指向不同的内容，因此可以被客户端永久缓存
+IMMUTABLE_CACHE_CONTROL: str = "public, max-age=31536000, immutable"
+
+
+def is_text_mimetype(mimetype: str) -> bool:
+    return mimetype.startswith("text/") or mimetype in TEXT_MIMETYPES
+
+
+def fingerprint_path(url_path: str, digest: str) -> str:
+    """ 将内容哈希插入扩展名之前，例如 /static/style.css -> /static/style.3f9a1c2b.css """
+    head, slash, filename = url_path.rpartition('/')
+    stem, dot, ext = filename.rpartition('.')
+    if not stem:
+        return f"{url_path}.{digest}"
+    return f"{head}{slash}{stem}.{digest}.{ext}"
+
+
+class StaticFile:
+    """
+      StaticFile是清单中的一项，content为缓存在内存中的文件内容，
+      小于StaticManifest.max_cache_file的文件会被缓存，
+      fingerprinted_path为带有内容哈希的URL，
+      在内存中生成的文件（例如打包后的CSS/JS）的filepath为None
+    """
+
+    __slots__ = ("url_path", "filepath", "size", "mtime", "mimetype", "content", "digest", "fingerprinted_path")
+
+    def __init__(self, url_path: str, filepath: t.Optional[str], size: int, mtime: float, mimetype: str) -> None:
+        self.url_path: str = url_path
+        self.filepath: t.Optional[str] = filepath
+        self.size: int = size
+        self.mtime: float = mtime
+        self.mimetype: str = mimetype
+        self.content: t.Optional[bytes] = None
+        self.digest: t.Optional[str] = None
+        self.fingerprinted_path: t.Optional[str] = None
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.url_path}: {self.mimetype} {self.size}>"
+
+
+class StaticManifest:
+    """
+      StaticManifest管理所有的静态挂载点（名称 -> (URL前缀, 目录)），
+      例如默认的挂载点 "static" -> ("/static", "<用户程序包>/static")，
+      路径不以任何挂载前缀开头的请求会直接跳过静态文件的处理，
+      fingerprint为True时，清单建立时会计算每个文件的内容哈希，
+      url_for返回带有哈希的URL，这样的URL可以被客户端永久缓存
+    """
+
+    def __init__(
+            self,
+            max_cache_file: int = 1024 * 1024,
+            chunk_size: int = 64 * 1024,
+            fingerprint: bool = True
+    ) -> None:
+        self.mounts: dict[str, tuple[str, str]] = {}
+        # 直接映射到某个静态文件的路径，例如 /favicon.ico
+        self.aliases: dict[str, str] = {}
+        # 供str.startswith快速判断是否为静态请求
+        self.prefixes: tuple[str, ...] = ()
+        self.files: dict[str, StaticFile] = {}
+        # 在内存中生成的文件，刷新清单时保留
+        self.virtual: dict[str, StaticFile] = {}
+        self.max_cache_file: int = max_cache_file
+        self.chunk_size: int = chunk_size
+        self.fingerprint: bool = fingerprint
+
+        self._lock: threading.Lock = threading.Lock()
+        self._watcher: t.Optional[threading.Thread] = None
+        self._signature: t.Optional[tuple] = None
+        # 清单刷新之后调用的函数，例如在源文件修改后重新打包
+        self._listeners: list[t.Callable[[], None]] = []
+
+    def mount(self, name: str, url_path: str, directory: str) -> None:
+        """ 将directory挂载到url_path，name用于url_for(name, filename=...) """
+        url_path = '/' + url_path.strip('/')
+        self.mounts[name] = (url_path, os.path.abspath(directory))
+        self.refresh()
+
+    def alias(self, path: str, url_path: str) -> None:
+        """ 将path作为静态文件url_path的别名，例如 alias("/favicon.ico", "/static/favicon.ico") """
+        self.aliases[path] = url_path
+        self.refresh()
+
+    def _scan(self) -> list[tuple[str, str, os.stat_result]]:
+        entries = []
+        for url_prefix, directory in self.mounts.values():
+            for dirpath, _, filenames in os.walk(directory):
+                for filename in filenames:
+                    filepath = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(filepath)
+                    except OSError:
+                        continue
+                    rel_path = os.path.relpath(filepath, directory).replace(os.sep, '/')
+                    entries.append((f"{url_prefix}/{rel_path}", filepath, stat))
+        return entries
+
+    def add_virtual(self, url_path: str, content: bytes, mimetype: str) -> StaticFile:
+        """ 将在内存中生成的内容作为url_path处的静态文件，再次添加同一url_path时替换旧的内容 """
+        entry = StaticFile(url_path, None, len(content), time.time(), mimetype)
+        entry.content = content
+        if self.fingerprint:
+            self._set_digest(entry, hashlib.blake2b(content, digest_size=4).hexdigest())
+        with self._lock:
+            files = dict(self.files)
+            old = self.virtual.get(url_path)
+            if old is not None and old.fingerprinted_path is not None:
+                files.pop(old.fingerprinted_path, None)
+            self.virtual[url_path] = entry
+            files[url_path] = entry
+            if entry.fingerprinted_path is not None:
+                files[entry.fingerprinted_path] = entry
+            self.files = files
+        return entry
+
+    def add_listener(self, listener: t.Callable[[], None]) -> None:
+        """ listener会在每次刷新清单之后被调用 """
+        self._listeners.append(listener)
+
+    def refresh(self, entries: t.Optional[list] = None) -> None:
+        """ 重新扫描所有挂载的目录并原子地替换清单，未修改的文件保留已缓存的内容 """
+        if entries is None:
+            entries = self._scan()
+        with self._lock:
+            old_files = self.files
+            files = {}
+            for url_path, filepath, stat in entries:
+                old = old_files.get(url_path)
+                if old is not None and old.mtime == stat.st_mtime and old.size == stat.st_size:
+                    files[url_path] = old
+                    continue
+                mimetype = mimetypes.guess_type(filepath)[0] or "application/octet-stream"
+                entry = StaticFile(url_path, filepath, stat.st_size, stat.st_mtime, mimetype)
+                if self.fingerprint:
+                    try:
+                        self._hash_file(entry)
+                    except OSError:
+                        continue
+                files[url_path] = entry
+            files.update(self.virtual)
+            for entry in list(files.values()):
+                if entry.fingerprinted_path is not None:
+                    files[entry.fingerprinted_path] = entry
+            for path, url_path in self.aliases.items():
+                if url_path in files:
+                    files[path] = files[url_path]
+
+            self.files = files
+            self.prefixes = tuple(f"{url_prefix}/" for url_prefix, _ in self.mounts.values()) + \
+                tuple(self.aliases)
+            self._signature = self._get_signature(entries)
+        for listener in self._listeners:
+            listener()
+
+    def _set_digest(self, entry: StaticFile, digest: str) -> None:
+        entry.digest = digest
+        entry.fingerprinted_path = fingerprint_path(entry.url_path, digest)
+
+    def _hash_file(self, entry: StaticFile) -> None:
+        """ 计算文件的内容哈希，顺便缓存小文件的内容 """
+        digest = hashlib.blake2b(digest_size=4)
+        with open(entry.filepath, "rb") as fp:
+            if entry.size <= self.max_cache_file:
+                entry.content = fp.read()
+                digest.update(entry.content)
+            else:
+                for chunk in iter(lambda: fp.read(self.chunk_size), b''):
+                    digest.update(chunk)
+        self._set_digest(entry, digest.hexdigest())
+
+    @staticmethod
+    def _get_signature(entries: list) -> tuple:
+        return tuple((url_path, stat.st_mtime, stat.st_size) for url_path, _, stat in entries)
+
+    def is_static(self, path: str) -> bool:
+        return path.startswith(self.prefixes)
+
+    def lookup(self, path: str) -> t.Optional[StaticFile]:
+        return self.files.get(path)
+
+    def read(self, entry: StaticFile) -> t.Union[bytes, t.Iterator[bytes]]:
+        """
+          返回静态文件的内容，小文件在第一次读取后缓存在内存中，
+          大文件按chunk_size分块读取，避免将整个文件读入内存
+        """
+        if entry.content is not None:
+            return entry.content
+        if entry.size <= self.max_cache_file:
+            with open(entry.filepath, "rb") as fp:
+                content = fp.read()
+            entry.content = content
+            return content
+        return self._iter_file(entry.filepath)
+
+    def _iter_file(self, filepath: str) -> t.Iterator[bytes]:
+        with open(filepath, "rb") as fp:
+            while True:
+                chunk = fp.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def is_immutable(self, path: str, entry: StaticFile) -> bool:
+        """ 请求的路径是否为带有内容哈希的URL """
+        return path == entry.fingerprinted_path
+
+    def url_for(self, name: str, filename: str) -> t.Optional[str]:
+        """ 构建挂载点name下filename的URL，开启fingerprint时返回带有内容哈希的URL，挂载点不存在时返回None """
+        mount = self.mounts.get(name)
+        if mount is None:
+            return None
+        url_path = f"{mount[0]}/{filename.lstrip('/')}"
+        entry = self.files.get(url_path)
+        if entry is not None and entry.fingerprinted_path is not None:
+            return entry.fingerprinted_path
+        return url_path
+
+    def start_watcher(self, interval: float = 1.0) -> None:
+        """ 启动后台线程，每隔interval秒检查挂载的目录，有变化时刷新清单 """
+        if self._watcher is not None:
+            return
+
+        def watch() -> None:
+            while True:
+                time.sleep(interval)
+                entries = self._scan()
+                if self._get_signature(entries) != self._signature:
+                    self.refresh(entries)
+
+        self._watcher = threading.Thread(target=watch, name="feasp-static-watcher", daemon=True)
+        self._watcher.start()
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Mounts: {self.mounts} Files: {len(self.files)}>"
@@ -0,0 +1,782 @@
+"""
+Feasp的模板引擎：将HTML模板编译为Python生成器函数，
+支持变量、嵌套的If/For控制语句、Extends/Block模板继承以及Include，
+编译后的模板按名称缓存，公共的基础布局在每个进程中只会解析一次
+"""
+
+
+import os
+import re
+import ast
+import html
+import marshal
+import hashlib
+import time
+import builtins
+import threading
+import typing as t
+import importlib.util
+
+from functools import lru_cache
+from collections import OrderedDict
+
+from .config import FeaspNotFound
+from .config import TemplateSyntaxError
+
+
+# 模板编译结果的版本，生成的代码改变时需要增加它以使磁盘缓存失效
+_CODE_VERSION: int = 5
+
+# 匹配模板中的变量{{ }}、语句{% %}以及注释{# #}
+_TOKEN_RE = re.compile("({{.*?}}|{%.*?%}|{#.*?#})", re.DOTALL)
+
+
+class Markup(str):
+    """
+      Markup标记一个无需转义的安全字符串，
+      自动转义开启时，Markup类型以及实现了__html__方法的值会被原样输出
+    """
+
+    __slots__ = ()
+
+    def __html__(self) -> "Markup":
+        return self
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({super().__repr__()})"
+
+
+_html_escape = html.escape
+
+
+def escape(value: t.Any) -> Markup:
+    """ 转义HTML中的特殊字符并将结果标记为安全字符串 """
+    return Markup(_escape_str(value))
+
+
+def _escape_str(value: t.Any) -> str:
+    """
+      模板中自动转义的热点路径，返回普通字符串以避免额外的对象创建：
+      str使用C实现的str.replace完成转义，数字无需转义，安全字符串原样返回
+    """
+    cls = type(value)
+    if cls is str:
+        return _html_escape(value)
+    if cls is Markup:
+        return value
+    if cls is int or cls is float:
+        return str(value)
+    html_method = getattr(value, "__html__", None)
+    if html_method is not None:
+        return html_method()
+    return _html_escape(str(value))
+
+
+def _to_str(value: t.Any) -> str:
+    return value if type(value) is str else str(value)
+
+
+def _url_for(*args, **kwargs) -> str:
+    """ 模板中可用的url_for函数，延迟导入以避免循环引用 """
+    from .feasp import url_for
+    return url_for(*args, **kwargs)
+
+
+def _bundle(name: str) -> Markup:
+    """ 模板中可用的bundle函数，返回引用打包后文件的<link>或<script>标签 """
+    from .feasp import bundle
+    return bundle(name)
+
+
+# 所有模板中默认可用的全局变量
+DEFAULT_GLOBALS: dict[str, t.Any] = {
+    "url_for": _url_for,
+    "bundle": _bundle,
+    "Markup": Markup,
+}
+
+
+class _Parser:
+    """
+      _Parser将模板文本解析为节点树，节点为元组：
+        ("text", str), ("var", expr), ("if", [(test, body), ...], else_body),
+        ("for", target, iter, body), ("block", name), ("include", expr),
+        ("cache", key, ttl, body)
+      Block的内容会被单独收集至self.blocks，以便编译为独立的函数
+    """
+
+    def __init__(self, text: str, name: str) -> None:
+        self.tokens: list[str] = _TOKEN_RE.split(text)
+        self.name: str = name
+        self.pos: int = 0
+        self.lineno: int = 1
+        self.parent: t.Optional[str] = None
+        self.blocks: dict[str, list] = {}
+
+    def parse(self) -> tuple[list, t.Optional[str], dict[str, list]]:
+        body, end, _ = self._parse_body(())
+        if end is not None:
+            self._fail(f"unexpected tag `{end}`")
+        return body, self.parent, self.blocks
+
+    def _fail(self, message: str) -> t.NoReturn:
+        raise TemplateSyntaxError(f"{message} ({self.name}, line {self.lineno})")
+
+    def _parse_expr(self, source: str) -> ast.expr:
+        try:
+            return ast.parse(source.strip(), mode="eval").body
+        except SyntaxError:
+            self._fail(f"invalid expression `{source.strip()}`")
+
+    def _parse_body(self, end_tags: tuple[str, ...]) -> tuple[list, t.Optional[str], str]:
+        """
+          解析代码段直至遇到end_tags中的任意一个结束语句，
+          返回解析的节点、遇到的结束语句及其剩余部分
+        """
+        body = []
+        while self.pos < len(self.tokens):
+            token = self.tokens[self.pos]
+            is_tag = self.pos % 2 == 1   # re.split保证奇数位置为匹配的代码段
+            self.pos += 1
+
+            if not is_tag:
+                if token:
+                    body.append(("text", token))
+            elif token.startswith("{#"):
+                pass
+            elif token.startswith("{{"):
+                body.append(("var", self._parse_expr(token[2:-2])))
+            else:
+                content = token[2:-2].strip()
+                keyword, _, rest = content.partition(" ")
+                keyword = keyword.lower()
+                rest = rest.strip()
+                if keyword in end_tags:
+                    self.lineno += token.count("\n")
+                    return body, keyword, rest
+                body.append(self._parse_statement(keyword, rest))
+            self.lineno += token.count("\n")
+
+        if end_tags:
+            self._fail(f"missing `{end_tags[-1]}`")
+        return body, None, ''
+
+    def _parse_statement(self, keyword: str, rest: str) -> tuple:
+        if keyword == "if":
+            branches, else_body = [], None
+            test = self._parse_expr(rest.rstrip(':'))
+            while True:
+                body, end, end_rest = self._parse_body(("elif", "else", "endif"))
+                branches.append((test, body))
+                if end == "elif":
+                    test = self._parse_expr(end_rest.rstrip(':'))
+                elif end == "else":
+                    else_body, _, _ = self._parse_body(("endif",))
+                    break
+                else:
+                    break
+            return "if", branches, else_body
+
+        if keyword == "for":
+            try:
+                loop = ast.parse(f"for {rest.rstrip(':')}:\n pass").body[0]
+            except SyntaxError:
+                self._fail(f"invalid for statement `{rest}`")
+            body, _, _ = self._parse_body(("endfor",))
+            return "for", loop.target, loop.iter, body
+
+        if keyword == "block":
+            if not rest.isidentifier():
+                self._fail(f"invalid block name `{rest}`")
+            if rest in self.blocks:
+                self._fail(f"block `{rest}` defined twice")
+            self.blocks[rest] = []   # 先占位，以检测嵌套定义中的重名
+            body, _, _ = self._parse_body(("endblock",))
+            self.blocks[rest] = body
+            return "block", rest
+
+        if keyword == "extends":
+            try:
+                self.parent = ast.literal_eval(rest)
+            except (ValueError, SyntaxError):
+                self._fail(f"extends needs a string literal, got `{rest}`")
+            return "text", ''
+
+        if keyword == "include":
+            return "include", self._parse_expr(rest)
+
+        if keyword == "cache":
+            # {% Cache key ttl %}，最后一部分为过期秒数，省略时永不过期，
+            # 键总是作为表达式求值，字面量的键需要加引号，例如{% Cache "nav" %}
+            key_src, ttl = rest, None
+            parts = rest.rsplit(None, 1)
+            if len(parts) == 2:
+                try:
+                    ast.parse(parts[0], mode="eval")
+                    key_src, ttl = parts[0], ast.parse(parts[1], mode="eval").body
+                except SyntaxError:
+                    key_src, ttl = rest, None
+            key = self._parse_expr(key_src)
+            body, _, _ = self._parse_body(("endcache",))
+            return "cache", key, ttl, body
+
+        self._fail(f"unknown tag `{keyword}`")
+
+
+class _NameRewriter(ast.NodeTransformer):
+    """
+      将表达式中的变量名改写为生成函数中的局部变量：
+      循环变量改写为l_name，上下文变量改写为c_name并记录下来
+    """
+
+    def __init__(self, local_names: t.AbstractSet[str], context_names: set[str]) -> None:
+        self.local_names = local_names
+        self.context_names = context_names
+
+    def visit_Name(self, node: ast.Name) -> ast.Name:
+        if node.id in self.local_names:
+            node.id = "l_" + node.id
+        else:
+            self.context_names.add(node.id)
+            node.id = "c_" + node.id
+        return node
+
+    def visit_Lambda(self, node: ast.Lambda) -> ast.Lambda:
+        # 默认值在外层作用域中求值，参数在lambda的函数体中是局部变量
+        args = node.args
+        args.defaults = [self.visit(default) for default in args.defaults]
+        args.kw_defaults = [default if default is None else self.visit(default) for default in args.kw_defaults]
+        params = [*args.posonlyargs, *args.args, *args.kwonlyargs, *filter(None, (args.vararg, args.kwarg))]
+        inner = _NameRewriter(self.local_names | {param.arg for param in params}, self.context_names)
+        for param in params:
+            param.arg = "l_" + param.arg
+        node.body = inner.visit(node.body)
+        return node
+
+
+def _stored_names(node: ast.AST) -> set[str]:
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+
+
+class _CodeGenerator:
+    """
+      _CodeGenerator将节点树生成为Python源码，每个模板生成一个root函数，
+      每个Block生成一个block_<name>函数，它们都是产生字符串片段的生成器
+    """
+
+    def __init__(self, autoescape: bool = True, namespace: str = "<template>") -> None:
+        self.autoescape: bool = autoescape
+        # 片段缓存键的前缀，见compile_template
+        self.namespace: str = namespace
+        self.lines: list[str] = []
+        self._body: list[str] = []
+        self._context_names: set[str] = set()
+        self._fragment_count: int = 0
+
+    def generate(self, nodes: list, parent: t.Optional[str], blocks: dict[str, list]) -> str:
+        self._function("root", nodes)
+        for name, body in blocks.items():
+            self._function(f"block_{name}", body)
+        self.lines.append(f"parent = {parent!r}")
+        self.lines.append("blocks = {" + ", ".join(f"{n!r}: block_{n}" for n in blocks) + "}")
+        return "\n".join(self.lines) + "\n"
+
+    def _function(self, func_name: str, nodes: list) -> None:
+        self._body, self._context_names = [], set()
+        self._visit_nodes(nodes, 1, frozenset())
+        self.lines.append(f"def {func_name}(ctx, blocks, loader):")
+        self.lines.append("    resolve = loader.resolve")
+        self.lines.append("    to_str = loader.to_str")
+        # 上下文变量在函数开始时只查找一次，避免在循环中重复查找
+        for name in sorted(self._context_names):
+            self.lines.append(f"    c_{name} = resolve(ctx, {name!r})")
+        self.lines.append("    if 0: yield None")
+        self.lines.extend(self._body)
+
+    def _write(self, line: str, depth: int) -> None:
+        self._body.append("    " * depth + line)
+
+    def _expr(self, node: ast.expr, local_names: t.AbstractSet[str]) -> str:
+        local_names = local_names | _stored_names(node)
+        node = _NameRewriter(local_names, self._context_names).visit(node)
+        return ast.unparse(node)
+
+    def _visit_nodes(self, nodes: list, depth: int, local_names: frozenset) -> None:
+        if not nodes:
+            self._write("pass", depth)
+            return
+
+        for node in nodes:
+            kind = node[0]
+            if kind == "text":
+                if node[1]:
+                    self._write(f"yield {node[1]!r}", depth)
+                else:
+                    self._write("pass", depth)
+            elif kind == "var":
+                if isinstance(node[1], ast.Constant):
+                    # 常量在编译时就完成转换与转义，渲染时无需再处理
+                    value = _escape_str(node[1].value) if self.autoescape else _to_str(node[1].value)
+                    self._write(f"yield {value!r}", depth)
+                else:
+                    self._write(f"yield to_str({self._expr(node[1], local_names)})", depth)
+            elif kind == "if":
+                branches, else_body = node[1], node[2]
+                for i, (test, body) in enumerate(branches):
+                    keyword = "if" if i == 0 else "elif"
+                    self._write(f"{keyword} {self._expr(test, local_names)}:", depth)
+                    self._visit_nodes(body, depth + 1, local_names)
+                if else_body is not None:
+                    self._write("else:", depth)
+                    self._visit_nodes(else_body, depth + 1, local_names)
+            elif kind == "for":
+                target, iter_, body = node[1], node[2], node[3]
+                iter_src = self._expr(iter_, local_names)
+                inner_names = local_names | _stored_names(target)
+                target_src = self._expr(target, inner_names)
+                self._write(f"for {target_src} in {iter_src}:", depth)
+                self._visit_nodes(body, depth + 1, inner_names)
+            elif kind == "block":
+                self._write(f"yield from blocks[{node[1]!r}](ctx, blocks, loader)", depth)
+            elif kind == "include":
+                # 被包含的模板可以使用当前的循环变量，它们覆盖上下文中的同名变量
+                ctx_src = "ctx"
+                if local_names:
+                    ctx_src = "{**ctx, " + ", ".join(f"{n!r}: l_{n}" for n in sorted(local_names)) + "}"
+                self._write(f"yield from loader.include({self._expr(node[1], local_names)}, {ctx_src})", depth)
+            elif kind == "cache":
+                # 片段编译为闭包，缓存未命中时才会执行
+                key, ttl, body = node[1], node[2], node[3]
+                func_name = f"fragment_{self._fragment_count}"
+                self._fragment_count += 1
+                self._write(f"def {func_name}():", depth)
+                self._write("if 0: yield None", depth + 1)
+                self._visit_nodes(body, depth + 1, local_names)
+                ttl_src = "None" if ttl is None else self._expr(ttl, local_names)
+                key_src = self._expr(key, local_names)
+                self._write(f"yield from loader.cached_fragment({self.namespace!r}, {key_src}, {ttl_src}, {func_name})",
+                            depth)
+
+
+def compile_template(text: str, name: str = "<template>", autoescape: bool = True) -> t.Any:
+    """
+      将模板文本编译为Python代码对象
+      :raise TemplateSyntaxError
+    """
+    nodes, parent, blocks = _Parser(text, name).parse()
+    # 片段缓存键以模板名称与内容的哈希为前缀，不同模板（包括同名的模板字符串）中的同名键互不覆盖
+    namespace = f"{name}:{hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]}"
+    source = _CodeGenerator(autoescape, namespace).generate(nodes, parent, blocks)
+    return compile(source, name, "exec")
+
+
+class CompiledTemplate:
+    """
+      CompiledTemplate保存编译后的模板：
+      root为渲染整个模板的生成器函数，blocks为模板中定义的Block，parent为继承的父模板名称
+    """
+
+    def __init__(self, name: str, code: t.Any) -> None:
+        self.name: str = name
+        self.code: t.Any = code
+        namespace: dict = {}
+        exec(code, namespace)
+        self.root: t.Callable = namespace["root"]
+        self.blocks: dict[str, t.Callable] = namespace["blocks"]
+        self.parent: t.Optional[str] = namespace["parent"]
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Name: {self.name}>"
+
+
+class BytecodeCache:
+    """
+      BytecodeCache将编译后的模板代码对象保存在directory目录中，
+      文件名由模板名称与内容的哈希决定，模板内容改变后会自然地使用新的缓存文件，
+      因此多个进程可以共享同一个缓存目录，新进程直接加载代码对象而无需解析HTML
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory: str = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def get_key(name: str, text: str, autoescape: bool = True) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{_CODE_VERSION}:{int(autoescape)}:{name}:".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _get_path(self, name: str, text: str, autoescape: bool) -> str:
+        return os.path.join(self.directory, self.get_key(name, text, autoescape) + ".cache")
+
+    def load(self, name: str, text: str, autoescape: bool = True) -> t.Any:
+        """ 读取缓存的代码对象，缓存不存在或不是当前Python版本生成的时返回None """
+        try:
+            with open(self._get_path(name, text, autoescape), "rb") as fp:
+                data = fp.read()
+        except OSError:
+            return None
+        magic = importlib.util.MAGIC_NUMBER
+        if data[:len(magic)] != magic:
+            return None
+        try:
+            return marshal.loads(data[len(magic):])
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def dump(self, name: str, text: str, code: t.Any, autoescape: bool = True) -> None:
+        """ 先写入临时文件再替换，避免其它进程读到不完整的缓存 """
+        path = self._get_path(name, text, autoescape)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as fp:
+            fp.write(importlib.util.MAGIC_NUMBER + marshal.dumps(code))
+        os.replace(tmp_path, path)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Directory: {self.directory}>"
+
+
+class FragmentCache:
+    """
+      模板片段缓存的后端接口，自定义的后端（例如多个进程共享的缓存）需实现get与set，
+      ttl为过期的秒数，None表示永不过期
+    """
+
+    def get(self, key: str) -> t.Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: t.Optional[float]) -> None:
+        raise NotImplementedError
+
+
+class LRUFragmentCache(FragmentCache):
+    """
+      进程内的LRU片段缓存，最多保存maxsize个片段，
+      传入backend时作为其前端：本地未命中时查询backend，写入时同时写入backend
+    """
+
+    def __init__(self, maxsize: int = 512, backend: t.Optional[FragmentCache] = None) -> None:
+        self.maxsize: int = maxsize
+        self.backend: t.Optional[FragmentCache] = backend
+        # 键 -> (值, 过期时间)
+        self._data: OrderedDict[str, tuple[str, t.Optional[float]]] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self, key: str) -> t.Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                if item[1] is None or item[1] > time.time():
+                    self._data.move_to_end(key)
+                    return item[0]
+                del self._data[key]
+        if self.backend is not None:
+            # 本地缓存不知道后端中剩余的过期时间，因此只在本地保存一小段时间
+            value = self.backend.get(key)
+            if value is not None:
+                self._store(key, value, 1.0)
+            return value
+        return None
+
+    def set(self, key: str, value: str, ttl: t.Optional[float]) -> None:
+        self._store(key, value, ttl)
+        if self.backend is not None:
+            self.backend.set(key, value, ttl)
+
+    def _store(self, key: str, value: str, ttl: t.Optional[float]) -> None:
+        expires = None if ttl is None else time.time() + ttl
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Size: {len(self._data)}/{self.maxsize}>"
+
+
+class SqliteFragmentCache(FragmentCache):
+    """
+      基于SQLite的片段缓存，同一台机器上的多个进程可以共享同一个数据库文件，
+      每个线程使用各自的连接，过期的片段会在写入时被定期清理
+    """
+
+    def __init__(self, db_name: str, purge_every: int = 256) -> None:
+        import sqlite3
+
+        self.db_name: str = db_name
+        self.purge_every: int = purge_every
+        self._sqlite3 = sqlite3
+        self._local: threading.local = threading.local()
+        self._writes: int = 0
+        conn = self._get_conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS feasp_fragment"
+                     "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)")
+        conn.commit()
+
+    def _get_conn(self) -> t.Any:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._sqlite3.connect(self.db_name, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> t.Optional[str]:
+        row = self._get_conn().execute(
+            "SELECT value, expires FROM feasp_fragment WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ttl: t.Optional[float]) -> None:
+        now = time.time()
+        expires = None if ttl is None else now + ttl
+        conn = self._get_conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO feasp_fragment VALUES (?, ?, ?)", (key, value, expires))
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                conn.execute("DELETE FROM feasp_fragment WHERE expires <= ?", (now,))
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Database: {self.db_name}>"
+
+
+@lru_cache(maxsize=128)
+def _template_from_string(text: str, autoescape: bool) -> CompiledTemplate:
+    return CompiledTemplate("<template>", compile_template(text, autoescape=autoescape))
+
+
+class TemplateLoader:
+    """
+      TemplateLoader从searchpath目录加载并缓存编译后的模板，
+      Extends与Include引用的模板也经由它加载，因此共享的基础布局只会被编译一次，
+      auto_reload为True时，会在模板文件修改后重新编译，
+      传入bytecode_cache时，编译结果会被持久化至磁盘并在各个进程之间共享，
+      autoescape为True时，模板变量的值会进行HTML转义，Markup类型的值除外，
+      fragment_cache保存{% Cache %}语句渲染的片段，默认为进程内的LRU缓存，
+      多进程部署时可替换为LRUFragmentCache(backend=SqliteFragmentCache("cache.db"))
+    """
+
+    def __init__(
+            self,
+            searchpath: t.Optional[str] = None,
+            auto_reload: bool = True,
+            globals: t.Optional[dict] = None,
+            bytecode_cache: t.Optional[BytecodeCache] = None,
+            autoescape: bool = True,
+            fragment_cache: t.Optional[FragmentCache] = None
+    ) -> None:
+        self.searchpath: t.Optional[str] = searchpath
+        self.auto_reload: bool = auto_reload
+        self.bytecode_cache: t.Optional[BytecodeCache] = bytecode_cache
+        self.autoescape: bool = autoescape
+        # 生成的模板函数通过loader.to_str将变量的值转换为字符串
+        self.to_str: t.Callable[[t.Any], str] = _escape_str if autoescape else _to_str
+        self.fragment_cache: FragmentCache = fragment_cache if fragment_cache is not None else LRUFragmentCache()
+        self.globals: dict[str, t.Any] = dict(DEFAULT_GLOBALS)
+        if globals is not None:
+            self.globals.update(globals)
+
+        # 模板名称 -> (修改时间, 编译后的模板)
+        self._cache: dict[str, tuple[float, CompiledTemplate]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def get_template(self, name: str) -> CompiledTemplate:
+        """
+          根据相对于searchpath的名称获取编译后的模板
+          :raise FeaspNotFound
+        """
+        name = name.lstrip('/')
+        cached = self._cache.get(name)
+        if cached is not None and not self.auto_reload:
+            return cached[1]
+
+        if self.searchpath is None:
+            raise FeaspNotFound(f"not found template {name}")
+        filepath = os.path.join(self.searchpath, name)
+        try:
+            mtime = os.stat(filepath).st_mtime
+        except OSError:
+            raise FeaspNotFound(f"not found template {name}")
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            with open(filepath, 'r', encoding="utf-8") as fp:
+                text = fp.read()
+            template = CompiledTemplate(name, self._compile(name, text))
+            self._cache[name] = (mtime, template)
+        return template
+
+    def _compile(self, name: str, text: str) -> t.Any:
+        if self.bytecode_cache is None:
+            return compile_template(text, name, self.autoescape)
+        code = self.bytecode_cache.load(name, text, self.autoescape)
+        if code is None:
+            code = compile_template(text, name, self.autoescape)
+            self.bytecode_cache.dump(name, text, code, self.autoescape)
+        return code
+
+    def list_templates(self) -> list[str]:
+        """ 列出searchpath目录下所有模板的名称 """
+        names = []
+        if self.searchpath is None or not os.path.isdir(self.searchpath):
+            return names
+        for dirpath, _, filenames in os.walk(self.searchpath):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                names.append(os.path.relpath(path, self.searchpath).replace(os.sep, '/'))
+        return sorted(names)
+
+    def precompile(self) -> list[str]:
+        """
+          编译searchpath目录下的所有模板并放入缓存，返回编译的模板名称，
+          在启动时调用以避免第一次请求时读取并解析模板带来的延迟
+          :raise TemplateSyntaxError
+        """
+        names = self.list_templates()
+        for name in names:
+            self.get_template(name)
+        return names
+
+    def from_string(self, text: str) -> CompiledTemplate:
+        """ 编译模板字符串，相同的字符串只会编译一次 """
+        return _template_from_string(text, self.autoescape)
+
+    def resolve(self, context: dict, name: str) -> t.Any:
+        """ 依次从上下文、全局变量、内置函数中查找变量，找不到时返回None """
+        if name in context:
+            return context[name]
+        if name in self.globals:
+            return self.globals[name]
+        return getattr(builtins, name, None)
+
+    def generate(self, template: CompiledTemplate, context: t.Optional[dict]) -> t.Iterator[str]:
+        """
+          渲染模板并逐个产生字符串片段，
+          沿着继承链向上合并Block，子模板中的Block覆盖父模板中的同名Block
+        """
+        if context is None:
+            context = {}
+        blocks: dict[str, t.Callable] = {}
+        seen = set()
+        while True:
+            seen.add(template.name)
+            for block_name, block_func in template.blocks.items():
+                blocks.setdefault(block_name, block_func)
+            if template.parent is None:
+                break
+            if template.parent in seen:
+                raise TemplateSyntaxError(f"circular extends in {template.name}")
+            template = self.get_template(template.parent)
+        return template.root(context, blocks, self)
+
+    def include(self, name: str, context: dict) -> t.Iterator[str]:
+        return self.generate(self.get_template(name), context)
+
+    def cached_fragment(self, namespace: str, key: t.Any, ttl: t.Optional[float], func: t.Callable) -> t.Iterable[str]:
+        """ 返回模板中键为key的缓存片段，未命中时调用func渲染片段并放入缓存，namespace区分不同的模板 """
+        key = f"{namespace}:{key}"
+        value = self.fragment_cache.get(key)
+        if value is None:
+            value = "".join(func())
+            self.fragment_cache.set(key, value, ttl)
+        return value,
+
+    def render(self, name: str, context: t.Optional[dict] = None) -> str:
+        return "".join(self.generate(self.get_template(name), context))
+
+    def stream(
+            self,
+            name: t.Union[str, CompiledTemplate],
+            context: t.Optional[dict] = None,
+            chunk_size: int = 8192
+    ) -> t.Iterator[str]:
+        """
+          边渲染边产生字符串块，每块至少chunk_size个字符（最后一块除外），
+          因此内存的占用受块大小限制，而不是整个页面的大小，
+          name也可以是已经通过get_template取得的模板，生成器在迭代时才会执行，提前取得模板可以更早地发现错误
+        """
+        template = self.get_template(name) if isinstance(name, str) else name
+        buffer, size = [], 0
+        for piece in self.generate(template, context):
+            buffer.append(piece)
+            size += len(piece)
+            if size >= chunk_size:
+                yield "".join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Path: {self.searchpath}>"
+
+
+_default_loader: TemplateLoader = TemplateLoader()
+
+
+class FeaspTemplate:
+    """
+      Template是一个渲染类，将HTML模板编译后与上下文变量结合进行渲染，
+      当前，支持定义变量、url_for函数、嵌套的If与For语句、模板继承与包含：
+        1.定义变量的占位符为: {{}},
+        变量在花括号内定义，例如 {{ name }}、{{ user.name }}、{{ name_list[0] }}
+        2.定义url_for函数: {{ url_for('static', filename='head.jpg') }}
+        3.定义判断语句（支持Elif、Else）:
+            {% If name_list %}
+                {{ name_list[0] }}
+            {% Else %}
+                empty
+            {% Endif %}
+        4.定义循环语句（支持相互嵌套）:
+            {% For name in name_list %}
+                {% If name %}{{ name }}{% Endif %}
+            {% Endfor %}
+        5.定义注释:
+            {# 这是一个注释 #}
+        6.缓存很少变化的片段（键为表达式，字面量的键需要加引号，过期秒数可省略）:
+            {% Cache "nav" 300 %}...{% Endcache %}
+            {% Cache user.id 60 %}...{% Endcache %}
+        7.模板继承与包含（需要通过TemplateLoader加载，例如render_template）:
+            {% Extends "base.html" %}
+            {% Block content %}...{% Endblock %}
+            {% Include "nav.html" %}
+      注意：语句的关键字不区分大小写，模板中未定义的变量将被渲染为None，
+      变量的值默认会进行HTML转义，不需要转义的值可以用Markup标记
+    """
+
+    def __init__(self, text: str, context: t.Optional[dict] = None, loader: t.Optional[TemplateLoader] = None) -> None:
+        # self.text指向内存中的HTML字符串
+        self.text: str = text
+
+        # self.context指向内存中用户传入的上下文变量
+        self.context: dict = context if context is not None else {}
+
+        # self.loader用于加载Extends与Include引用的模板
+        self.loader: TemplateLoader = loader if loader is not None else _default_loader
+
+        # 编译后的模板，相同的模板字符串只会编译一次
+        self.template: CompiledTemplate = self.loader.from_string(text)
+
+    def generate(self) -> t.Iterator[str]:
+        """ 逐个产生渲染后的字符串片段 """
+        return self.loader.generate(self.template, self.context)
+
+    def render(self) -> str:
+        return "".join(self.generate())
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Ctx: {self.context}>"
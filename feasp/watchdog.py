@@ -0,0 +1,79 @@
+"""
+Feasp的慢请求看门狗：记录每个正在执行的视图函数所在的线程，
+后台线程定期检查，执行时间超过阈值的请求会输出其线程当前的调用栈，便于定位卡住的位置
+"""
+
+
+import sys
+import time
+import itertools
+import threading
+import traceback
+import typing as t
+
+
+class Watchdog:
+    """
+      Watchdog每隔interval秒检查一次正在执行的视图函数，
+      执行时间超过slow_threshold秒的请求通过sys._current_frames取得其线程的调用栈并写入stream，
+      每个请求只报告一次
+      使用代码示例:
+        app.watchdog = Watchdog(slow_threshold=2.0)
+    """
+
+    def __init__(self, slow_threshold: float = 5.0, interval: float = 1.0, stream: t.Optional[t.TextIO] = None) -> None:
+        self.slow_threshold: float = slow_threshold
+        self.interval: float = interval
+        self.stream: t.Optional[t.TextIO] = stream
+
+        # 请求编号 -> (线程ID, 端点, 开始时间)
+        self._active: dict[int, tuple[int, str, float]] = {}
+        self._reported: set[int] = set()
+        self._counter: t.Iterator[int] = itertools.count()
+
+        # 统计信息：被报告的慢请求数量
+        self.slow_requests: int = 0
+
+        self._thread: threading.Thread = threading.Thread(target=self._run, name="feasp-watchdog", daemon=True)
+        self._thread.start()
+
+    def begin(self, endpoint: str) -> int:
+        """ 在执行视图函数的线程中调用，返回end所需的请求编号 """
+        token = next(self._counter)
+        self._active[token] = (threading.get_ident(), endpoint, time.monotonic())
+        return token
+
+    def end(self, token: int) -> None:
+        self._active.pop(token, None)
+
+    def check(self) -> int:
+        """ 报告所有尚未报告的慢请求，返回本次报告的数量 """
+        now = time.monotonic()
+        active = dict(self._active)
+        self._reported.intersection_update(active)
+        frames = None
+        reported = 0
+        for token, (ident, endpoint, start) in active.items():
+            elapsed = now - start
+            if elapsed < self.slow_threshold or token in self._reported:
+                continue
+            if frames is None:
+                frames = sys._current_frames()
+            frame = frames.get(ident)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            stream = self.stream or sys.stderr
+            stream.write(f"Slow request: endpoint {endpoint} has been running for {elapsed:.3f}s "
+                         f"in thread {ident}\n{stack}")
+            stream.flush()
+            self._reported.add(token)
+            reported += 1
+        self.slow_requests += reported
+        return reported
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            self.check()
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Threshold: {self.slow_threshold}s Active: {len(self._active)}>"
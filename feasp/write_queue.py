@@ -0,0 +1,231 @@
+"""
+SQLite的写后队列：每个数据库文件只有一个写线程，
+多个请求线程提交的写操作被合并为一次事务提交（group commit），
+从而避免每个请求各自加锁、各自fsync
+"""
+
+
+import os
+import sys
+import time
+import queue
+import atexit
+import sqlite3
+import threading
+import traceback
+import typing as t
+
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class WriteBehindQueue:
+    """
+      WriteBehindQueue接收来自多个线程的写操作，由唯一的写线程批量执行，
+      一批最多batch_size个写操作，第一个写操作最多等待max_latency秒以凑成一批，
+      每个写操作在各自的SAVEPOINT中执行，某个写操作失败不会影响同一批中的其它写操作，
+      submit返回一个Future，需要确认写入结果的调用者可以等待它
+      使用代码示例:
+        queue = write_behind("feasp.db")
+        queue.submit("INSERT INTO UserLogin VALUES (?, ?)", (username, password))
+        queue.submit("INSERT INTO Audit VALUES (?)", (username,)).result(timeout=1)
+    """
+
+    def __init__(
+            self,
+            db_name: str,
+            batch_size: int = 256,
+            max_latency: float = 0.005,
+            maxsize: int = 10000
+    ) -> None:
+        self.db_name: str = db_name
+        self.batch_size: int = batch_size
+        self.max_latency: float = max_latency
+
+        # 写操作队列，队列已满时submit会阻塞以形成背压
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._closed: bool = False
+        # 保证检查_closed与放入队列是原子的，关闭后放入的结束标记之后不会再有写操作
+        self._lock: threading.Lock = threading.Lock()
+        # 写线程因意外的异常退出时记录该异常，之后的写操作立即失败
+        self._error: t.Optional[BaseException] = None
+
+        # 统计信息：已提交的事务数量与已执行的写操作数量
+        self.commits: int = 0
+        self.writes: int = 0
+
+        self._thread: threading.Thread = threading.Thread(
+            target=self._run, name=f"feasp-writer-{os.path.basename(db_name)}", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql: str, params: t.Sequence = ()) -> Future:
+        """ 提交一个写操作，Future的结果为插入行的lastrowid """
+        return self._put(sql, params, False)
+
+    def submit_many(self, sql: str, seq_of_params: t.Iterable[t.Sequence]) -> Future:
+        """ 提交一个executemany写操作，Future的结果为影响的行数 """
+        return self._put(sql, list(seq_of_params), True)
+
+    def _put(self, sql: str, params: t.Any, many: bool) -> Future:
+        future = Future()
+        # 队列已满时持有锁阻塞，写线程不需要这把锁，因此仍会继续消费队列
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"write queue of {self.db_name} is closed")
+            if self._error is not None:
+                raise RuntimeError(f"writer of {self.db_name} failed: {self._error!r}") from self._error
+            self._queue.put((sql, params, many, future))
+        return future
+
+    def flush(self, timeout: t.Optional[float] = None) -> bool:
+        """ 等待此前提交的所有写操作完成，超时返回False """
+        future = self._put("SELECT 1", (), False)
+        try:
+            future.result(timeout)
+        except FutureTimeoutError:
+            return False
+        return True
+
+    def close(self, timeout: t.Optional[float] = None) -> None:
+        """ 停止接收写操作，等待队列中剩余的写操作完成后结束写线程 """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._error is None:
+                self._queue.put(None)
+        self._thread.join(timeout)
+
+    @property
+    def pending(self) -> int:
+        """ 队列中等待写入的操作数量 """
+        return self._queue.qsize()
+
+    def _next_batch(self) -> tuple[list, bool]:
+        item = self._queue.get()
+        if item is None:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        batch = []
+        try:
+            conn = sqlite3.connect(self.db_name, timeout=30, isolation_level=None)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                cursor = conn.cursor()
+                stop = False
+                while not stop:
+                    batch, stop = self._next_batch()
+                    if batch:
+                        self._write_batch(conn, cursor, batch)
+                    batch = []
+            finally:
+                conn.close()
+        except BaseException as e:
+            self._fail(batch, e)
+
+    def _fail(self, batch: list, error: BaseException) -> None:
+        """ 写线程即将退出：当前批次与队列中所有的写操作以error失败，之后的submit立即抛出异常 """
+        sys.stderr.write(f"Writer of {self.db_name} failed:\n{traceback.format_exc()}")
+        self._error = error
+        self._fail_items(batch, error)
+        # 先不加锁地清空队列，使持有锁并阻塞在已满队列上的提交者得以返回，
+        # 再在锁中清空一次，此后的提交者都会看到_error
+        self._drain(error)
+        with self._lock:
+            self._drain(error)
+
+    def _drain(self, error: BaseException) -> None:
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self._fail_items([item], error)
+
+    @staticmethod
+    def _fail_items(items: list, error: BaseException) -> None:
+        for item in items:
+            if item is not None and not item[3].done():
+                item[3].set_exception(error)
+
+    def _write_batch(self, conn: sqlite3.Connection, cursor: sqlite3.Cursor, batch: list) -> None:
+        results = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for sql, params, many, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                cursor.execute("SAVEPOINT feasp_write")
+                try:
+                    if many:
+                        cursor.executemany(sql, params)
+                        result = cursor.rowcount
+                    else:
+                        cursor.execute(sql, params)
+                        result = cursor.lastrowid
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO feasp_write")
+                    future.set_exception(e)
+                else:
+                    results.append((future, result))
+                cursor.execute("RELEASE feasp_write")
+            cursor.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # 事务提交之后才通知调用者，保证结果已经持久化
+        self.commits += 1
+        self.writes += len(results)
+        for future, result in results:
+            future.set_result(result)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} Database: {self.db_name} Pending: {self.pending}>"
+
+
+_queues: dict[str, WriteBehindQueue] = {}
+_queues_lock: threading.Lock = threading.Lock()
+
+
+def get_write_queue(db_name: str, **options: t.Any) -> WriteBehindQueue:
+    """
+      返回db_name对应的写后队列，同一个数据库文件在进程中只有一个写线程，
+      options只在第一次创建队列时生效
+    """
+    key = db_name if db_name == ":memory:" else os.path.abspath(db_name)
+    write_queue = _queues.get(key)
+    if write_queue is None:
+        with _queues_lock:
+            write_queue = _queues.get(key)
+            if write_queue is None:
+                write_queue = WriteBehindQueue(db_name, **options)
+                _queues[key] = write_queue
+    return write_queue
+
+
+@atexit.register
+def close_all() -> None:
+    """ 进程退出时写完所有队列中剩余的写操作 """
+    with _queues_lock:
+        queues = list(_queues.values())
+        _queues.clear()
+    for write_queue in queues:
+        write_queue.close()
@@ -1,3 +1,4 @@
+import os
 import unittest
 
 from feasp.feasp import Feasp, Request, Response, FeaspTemplate
@@ -53,6 +54,47 @@ class TestBasic(unittest.TestCase):
         self.assertEqual(request.platform, "Windows")
         self.assertEqual(request.user_agent, environ["HTTP_USER_AGENT"])
 
+    def test_request_body(self):
+        import io
+        import json
+
+        def make_environ(body, content_type):
+            return {"REQUEST_METHOD": "POST", "PATH_INFO": "/", "CONTENT_TYPE": content_type,
+                    "wsgi.input": io.BytesIO(body), "CONTENT_LENGTH": str(len(body))}
+
+        environ = make_environ(b"username=XueFeng&password=123", "application/x-www-form-urlencoded")
+        request = Request(environ)
+        # 请求体在第一次访问时才会被读取
+        self.assertEqual(0, environ["wsgi.input"].tell())
+        self.assertEqual({"username": "XueFeng", "password": "123"}, request.form)
+        self.assertIsNone(request.json)
+
+        request = Request(make_environ(b'{"name": "XueFeng"}', "application/json; charset=utf-8"))
+        self.assertEqual({"name": "XueFeng"}, request.json)
+        self.assertEqual({}, request.form)
+
+        items = [{"id": i, "text": "é" * i} for i in range(100)]
+        request = Request(make_environ(json.dumps(items).encode(), "application/json"))
+        self.assertEqual(items, list(request.iter_json_items(chunk_size=16)))
+
+        from feasp.feasp import request as current_request
+        app = Feasp(__name__)
+
+        @app.route("/api", methods=["POST"])
+        def api():
+            return {"count": len(current_request.json)}
+
+        statuses = []
+        for body in (b"[1, 2]", b"[1, 2", b"[" + b"1," * 100 + b"1]"):
+            environ = make_environ(body, "application/json")
+            environ["PATH_INFO"] = "/api"
+            Request.max_json_size = 100
+            try:
+                b"".join(app.wsgi_apl(environ, lambda status, headers: statuses.append(status)))
+            finally:
+                Request.max_json_size = 16 * 1024 * 1024
+        self.assertEqual(["200 OK", "400 BAD REQUEST", "413 REQUEST ENTITY TOO LARGE"], statuses)
+
     def test_response(self):
         response = Response("<h1>Hello World</h1>", "text/html", 200)
         self.assertIn("Hello World", response.body)
@@ -64,6 +106,79 @@ class TestBasic(unittest.TestCase):
              "Set-Cookie": "name=XueFeng "},
             response.headers)
 
+    def test_stream_response(self):
+        response = Response((s for s in ["<h1>", "Hello World", "</h1>"]), "text/html", 200)
+        body = response({}, lambda status, headers: None)
+        self.assertEqual([b"<h1>", b"Hello World", b"</h1>"], list(body))
+
+    def test_conditional_get(self):
+        import io
+
+        app = Feasp(__name__)
+        app.auto_etag = True
+        calls = []
+
+        @app.route("/page", methods=["GET"])
+        def page():
+            return "<h1>Hello World</h1>"
+
+        @app.route("/news", methods=["GET"], etag=lambda: 7)
+        def news():
+            calls.append(1)
+            return {"news": []}
+
+        def get(path, if_none_match=None):
+            environ = {"REQUEST_METHOD": "GET", "PATH_INFO": path, "HTTP_HOST": "127.0.0.1:8000",
+                       "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(b""), "CONTENT_LENGTH": ""}
+            if if_none_match is not None:
+                environ["HTTP_IF_NONE_MATCH"] = if_none_match
+            result = {}
+
+            def start_response(status, headers):
+                result["status"], result["headers"] = status, dict(headers)
+
+            result["body"] = b"".join(app.wsgi_apl(environ, start_response))
+            return result
+
+        first = get("/page")
+        etag = first["headers"]["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+        second = get("/page", etag)
+        self.assertEqual("304 NOT MODIFIED", second["status"])
+        self.assertEqual(b"", second["body"])
+        self.assertNotIn("Content-Type", second["headers"])
+
+        # 版本号未变化时视图函数不会被执行
+        etag = get("/news")["headers"]["ETag"]
+        self.assertEqual("304 NOT MODIFIED", get("/news", f'"other", {etag}')["status"])
+        self.assertEqual(1, len(calls))
+
+    def test_freeze(self):
+        import gc
+        import tempfile
+        from feasp.feasp import render_template, url_for
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.mkdir(os.path.join(tmpdir, "templates"))
+            with open(os.path.join(tmpdir, "templates", "index.html"), "w", encoding="utf-8") as fp:
+                fp.write("<h1>{{ name }}</h1>")
+            app = Feasp(os.path.join(tmpdir, "app.py"))
+
+            @app.route("/", methods=["GET"])
+            def index():
+                return render_template("index.html", name="XueFeng")
+
+            try:
+                self.assertIs(app, app.freeze())
+            finally:
+                gc.unfreeze()
+            self.assertFalse(app.template_loader.auto_reload)
+            self.assertIn("index.html", app.template_loader._cache)
+            self.assertEqual("/", url_for("index"))
+            self.assertEqual("<h1>XueFeng</h1>", render_template("index.html", name="XueFeng"))
+            with self.assertRaises(RuntimeError):
+                app.route("/late", methods=["GET"])(lambda: "late")
+
     def test_template(self):
         plain_html = """ 
             <!DOCTYPE html><html lang="en"><head><meta charset="UTF-8"><link rel="icon" href="/favicon.ico">
@@ -104,3 +219,29 @@ class TestBasic(unittest.TestCase):
         <h2>Hello XueXue</h2><h2>Hello XueFeng</h2></ol></body></html> """
         t = FeaspTemplate(for_html, {"name": "Three", "name_list": ["XueLian", "XueXue", "XueFeng"]})
         self.assertEqual(correct_html, t.render())
+
+
+class TestColdStart(unittest.TestCase):
+
+    # import feasp的耗时预算（秒），见README中的“冷启动”
+    IMPORT_TIME_BUDGET = 0.08
+
+    def test_import_time(self):
+        import subprocess
+        import sys
+
+        code = ("import sys, time\n"
+                "start = time.perf_counter()\n"
+                "import feasp\n"
+                "elapsed = time.perf_counter() - start\n"
+                "lazy = ['sqlite3', 'csv', 'traceback', 'feasp.template', 'feasp.sessions', 'feasp.sse']\n"
+                "print(elapsed, *[m for m in lazy if m in sys.modules])")
+        timings = []
+        for _ in range(3):
+            output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                    check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            elapsed, *loaded = output.stdout.split()
+            # 这些模块只应在第一次使用时导入
+            self.assertEqual([], loaded)
+            timings.append(float(elapsed))
+        self.assertLess(min(timings), self.IMPORT_TIME_BUDGET)
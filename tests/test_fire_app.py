@@ -70,6 +70,10 @@ class TestActualApp(unittest.TestCase):
         self.assertIn("Hello XueXue", res.text)
         self.assertIn("Hello XueFeng", res.text)
 
+    def test_stream_list(self):
+        res = requests.get("http://127.0.0.1:8000/stream_list")
+        self.assertIn("Hello XueFeng9999", res.text)
+
     def test_make_resp(self):
         res = requests.get("http://127.0.0.1:8000/make_resp")
         self.assertIn("Hello MakeResponse", res.text)
@@ -85,3 +89,8 @@ class TestActualApp(unittest.TestCase):
     def test_if_and_for(self):
         res = requests.get("http://127.0.0.1:8000/if_and_for")
         self.assertIn("Hello XueFeng", res.text)
+
+    def test_extends(self):
+        res = requests.get("http://127.0.0.1:8000/extends")
+        self.assertIn("<title>Extends</title>", res.text)
+        self.assertIn("Hello XueFeng, I love you", res.text)
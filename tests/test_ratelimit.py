@@ -0,0 +1,135 @@
+import io
+import os
+import time
+import tempfile
+import unittest
+
+from feasp.feasp import Feasp
+from feasp.ratelimit import RateLimit, MemoryBucketStore, SqliteBucketStore
+
+
+def call(app, path, cookie=None, remote_addr="127.0.0.1"):
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "REMOTE_ADDR": remote_addr,
+        "HTTP_HOST": "127.0.0.1:8000",
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(b""),
+        "CONTENT_LENGTH": "",
+    }
+    if cookie is not None:
+        environ["HTTP_COOKIE"] = cookie
+    result = {}
+
+    def start_response(status, headers):
+        result["status"], result["headers"] = status, dict(headers)
+
+    result["body"] = b"".join(app.wsgi_apl(environ, start_response))
+    return result
+
+
+class TestBucketStore(unittest.TestCase):
+
+    def check_store(self, store):
+        # 容量为2，每秒补充20个令牌
+        self.assertEqual([True, True, False], [store.take("a", 20, 2)[0] for _ in range(3)])
+        self.assertTrue(store.take("b", 20, 2)[0])
+        time.sleep(0.06)
+        self.assertTrue(store.take("a", 20, 2)[0])
+
+    def test_memory(self):
+        store = MemoryBucketStore(maxsize=2)
+        self.check_store(store)
+        store.take("c", 20, 2)
+        self.assertEqual(2, len(store))
+        # 已重新装满的桶会被清理
+        time.sleep(0.15)
+        store.take("d", 20, 2)
+        self.assertEqual(1, len(store))
+
+    def test_sqlite(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_name = os.path.join(tmpdir, "ratelimit.db")
+            store = SqliteBucketStore(db_name, purge_every=1)
+            self.check_store(store)
+            # 另一个进程中的存储看到同一份限额
+            other = SqliteBucketStore(db_name)
+            self.assertFalse(other.take("a", 0.001, 2)[0])
+            time.sleep(0.15)
+            store.take("c", 20, 2)
+            # b已重新装满并被清理，a由另一个存储以很低的速率写入，尚未装满
+            self.assertEqual(["a", "c"], [row[0] for row in store._get_conn().execute(
+                "SELECT key FROM feasp_rate_limit ORDER BY key")])
+
+
+class TestRateLimit(unittest.TestCase):
+
+    def test_global_policy(self):
+        app = Feasp(__file__)
+        app.rate_limit = RateLimit(2, per=60)
+
+        @app.route("/", methods=["GET"])
+        def index():
+            return "ok"
+
+        # 404的探测不消耗限额
+        self.assertEqual("404 NOT FOUND", call(app, "/missing")["status"])
+        statuses = [call(app, "/")["status"] for _ in range(3)]
+        self.assertEqual(["200 OK", "200 OK", "429 TOO MANY REQUESTS"], statuses)
+        self.assertEqual("30", call(app, "/")["headers"]["Retry-After"])
+        # 不同的IP使用各自的桶
+        self.assertEqual("200 OK", call(app, "/", remote_addr="10.0.0.2")["status"])
+        self.assertEqual(2, app.rate_limit.rejected)
+
+    def test_invalid(self):
+        for args, kwargs in [((0,), {}), ((-1,), {}), ((10,), {"per": 0}), ((10,), {"per": -60}), ((10,), {"burst": 0})]:
+            with self.assertRaises(ValueError):
+                RateLimit(*args, **kwargs)
+
+    def test_store_error(self):
+        import contextlib
+
+        class BrokenStore(MemoryBucketStore):
+            def take(self, key, rate, capacity, cost=1.0):
+                raise RuntimeError("database is locked")
+
+        app = Feasp(__file__)
+        app.rate_limit = RateLimit(1, per=60, store=BrokenStore())
+
+        @app.route("/", methods=["GET"])
+        def index():
+            return "ok"
+
+        # 存储出错时放行请求并输出警告
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            self.assertEqual(["200 OK"] * 2, [call(app, "/")["status"] for _ in range(2)])
+        self.assertIn("database is locked", stderr.getvalue())
+        self.assertEqual((2, 0), (app.rate_limit.errors, app.rate_limit.rejected))
+
+    def test_decorator(self):
+        app = Feasp(__file__)
+
+        @app.route("/login", methods=["GET"])
+        @RateLimit(1, per=60, key="cookie:token")
+        def login():
+            return "ok"
+
+        @app.route("/other", methods=["GET"])
+        def other():
+            return "ok"
+
+        self.assertEqual("200 OK", call(app, "/login", "token=a")["status"])
+        result = call(app, "/login", "token=a")
+        self.assertEqual("429 TOO MANY REQUESTS", result["status"])
+        self.assertEqual("60", result["headers"]["Retry-After"])
+        self.assertEqual("200 OK", call(app, "/login", "token=b")["status"])
+        # 没有Cookie的请求按IP限流
+        self.assertEqual("200 OK", call(app, "/login")["status"])
+        self.assertEqual("429 TOO MANY REQUESTS", call(app, "/login")["status"])
+        self.assertEqual("200 OK", call(app, "/other")["status"])
+
+        app.rate_limit = RateLimit(1, per=60, key=lambda request: None)
+        self.assertEqual(["200 OK"] * 2, [call(app, "/other")["status"] for _ in range(2)])
+
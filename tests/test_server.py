@@ -0,0 +1,537 @@
+import io
+import os
+import json
+import stat
+import time
+import socket
+import tempfile
+import threading
+import unittest
+import socketserver
+import urllib.error
+import urllib.request
+
+from wsgiref.simple_server import make_server, WSGIServer
+
+from feasp.access_log import AccessLogger, AccessLogHandler
+
+
+def hello_app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"hello"]
+
+
+def call(app, path):
+    """ 不经过服务器直接以GET请求调用app """
+    environ = {"REQUEST_METHOD": "GET", "PATH_INFO": path, "HTTP_HOST": "127.0.0.1:8000",
+               "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(b""), "CONTENT_LENGTH": ""}
+    result = {}
+
+    def start_response(status, headers):
+        result["status"] = status
+
+    result["body"] = b"".join(app.wsgi_apl(environ, start_response)).decode()
+    return result
+
+
+class TestAccessLog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "access.log")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_handler(self):
+        logger = AccessLogger(self.path, fmt="json")
+        handler_class = type("Handler", (AccessLogHandler,), {"access_logger": logger})
+        server = make_server("127.0.0.1", 0, hello_app, WSGIServer, handler_class)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            request = urllib.request.Request(f"http://127.0.0.1:{server.server_port}/index?a=1",
+                                             headers={"User-Agent": "feasp-test"})
+            with urllib.request.urlopen(request) as response:
+                self.assertEqual(b"hello", response.read())
+        finally:
+            server.shutdown()
+            server.server_close()
+        logger.close()
+        with open(self.path, encoding="utf-8") as fp:
+            record = json.loads(fp.readline())
+        self.assertEqual("GET /index?a=1 HTTP/1.1", record["request"])
+        self.assertEqual(200, record["status"])
+        self.assertEqual(5, record["size"])
+        self.assertEqual("feasp-test", record["user_agent"])
+
+    def test_rotate_and_sample(self):
+        logger = AccessLogger(self.path, max_bytes=200, backup_count=2, sample_rate=0.0)
+        for _ in range(10):
+            logger.log("127.0.0.1", "GET / HTTP/1.1", 200, 5)
+        # 采样率为0时只记录5xx
+        for _ in range(10):
+            logger.log("127.0.0.1", "GET /error HTTP/1.1", 500, 5)
+            logger.flush()
+        logger.close()
+        self.assertEqual(10, logger.written)
+        self.assertTrue(os.path.exists(self.path + ".1"))
+        self.assertTrue(os.path.exists(self.path + ".2"))
+        self.assertFalse(os.path.exists(self.path + ".3"))
+        with open(self.path + ".1", encoding="utf-8") as fp:
+            self.assertIn('"GET /error HTTP/1.1" 500 5 "-" "-"', fp.read())
+
+
+class TestListen(unittest.TestCase):
+
+    def serve(self, port=0, **options):
+        from feasp.sockets import make_server as make_feasp_server
+
+        def app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [f"{environ['REMOTE_ADDR']}|{environ['SERVER_PORT']}".encode()]
+
+        server = make_feasp_server(app, AccessLogHandler, "127.0.0.1", port, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def get(self, sock):
+        with sock:
+            sock.sendall(b"GET / HTTP/1.0\r\nHost: localhost\r\n\r\n")
+            data = b""
+            while chunk := sock.recv(4096):
+                data += chunk
+        return data.split(b"\r\n\r\n", 1)[1]
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "requires Unix domain sockets")
+    def test_unix_socket(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "feasp.sock")
+            # 上一次运行遗留的套接字文件会被删除
+            socket.socket(socket.AF_UNIX).bind(path)
+            server = self.serve(unix_socket=path, unix_socket_mode=0o600)
+            self.assertEqual(0o600, stat.S_IMODE(os.stat(path).st_mode))
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(path)
+            self.assertEqual(b"|", self.get(sock))
+            server.shutdown()
+            server.server_close()
+            self.assertFalse(os.path.exists(path))
+
+    def test_inherited_fd(self):
+        listener = socket.create_server(("127.0.0.1", 0))
+        port = listener.getsockname()[1]
+        self.serve(fd=listener.detach())
+        self.assertEqual(f"127.0.0.1|{port}".encode(), self.get(socket.create_connection(("127.0.0.1", port))))
+
+    @unittest.skipUnless(hasattr(socket, "SO_REUSEPORT"), "requires SO_REUSEPORT")
+    def test_reuse_port(self):
+        first = self.serve(reuse_port=True)
+        port = first.server_address[1]
+        # 两个服务器可以绑定同一端口
+        second = self.serve(port, reuse_port=True, threaded=True)
+        self.assertEqual(port, second.server_address[1])
+        self.assertEqual(f"127.0.0.1|{port}".encode(), self.get(socket.create_connection(("127.0.0.1", port))))
+
+
+class TestAdmissionControl(unittest.TestCase):
+
+    def test_shed(self):
+        from feasp.feasp import Feasp
+        from feasp.admission import AdmissionControl
+
+        app = Feasp(__file__)
+        started, finish = threading.Event(), threading.Event()
+
+        @app.route("/slow", methods=["GET"])
+        def slow():
+            started.set()
+            finish.wait(5)
+            return "done"
+
+        @app.route("/health", methods=["GET"])
+        def health():
+            return "ok"
+
+        app.admission_control = AdmissionControl(max_concurrency=1, max_queue=0)
+        server = make_server("127.0.0.1", 0, app.wsgi_apl, type(
+            "Server", (socketserver.ThreadingMixIn, WSGIServer), {"daemon_threads": True}), AccessLogHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+        try:
+            slow_thread = threading.Thread(target=lambda: urllib.request.urlopen(base + "/slow").read())
+            slow_thread.start()
+            self.assertTrue(started.wait(5))
+            # 普通通道已满且不允许排队：立即返回503
+            with self.assertRaises(urllib.error.HTTPError) as cm:
+                urllib.request.urlopen(base + "/slow")
+            self.assertEqual(503, cm.exception.code)
+            self.assertEqual("1", cm.exception.headers["Retry-After"])
+            # 健康检查走优先通道
+            with urllib.request.urlopen(base + "/health") as response:
+                self.assertEqual(b"ok", response.read())
+            finish.set()
+            slow_thread.join(5)
+            # 服务器在正文发送完毕后调用close交还名额
+            for _ in range(100):
+                if app.admission_control.in_flight == 0:
+                    break
+                time.sleep(0.01)
+        finally:
+            finish.set()
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(0, app.admission_control.in_flight)
+        self.assertEqual(1, app.admission_control.shed)
+
+
+class TestDeadline(unittest.TestCase):
+
+    def test_timeout_and_watchdog(self):
+        from feasp.feasp import Feasp, remaining_time
+        from feasp.watchdog import Watchdog
+
+        app = Feasp(__file__)
+        release = threading.Event()
+        stream = io.StringIO()
+        app.watchdog = Watchdog(slow_threshold=0.05, interval=60, stream=stream)
+
+        @app.route("/stuck", methods=["GET"], timeout=0.1)
+        def stuck():
+            release.wait(5)
+            return "late"
+
+        @app.route("/fast", methods=["GET"], timeout=5)
+        def fast():
+            return f"{remaining_time() > 4}"
+
+        @app.route("/broken", methods=["GET"])
+        def broken():
+            raise ValueError("broken view")
+
+        start = time.monotonic()
+        self.assertTrue(call(app, "/stuck")["status"].startswith("504"))
+        self.assertLess(time.monotonic() - start, 1)
+        # 看门狗输出仍在执行的视图的调用栈
+        self.assertEqual(1, app.watchdog.check())
+        self.assertIn("in stuck", stream.getvalue())
+
+        # 超时后仍在执行的视图达到上限时直接拒绝，不再占用新的线程
+        app.max_abandoned_views = 1
+        self.assertTrue(call(app, "/fast")["status"].startswith("504"))
+        release.set()
+        for _ in range(100):
+            if app._abandoned_views == 0:
+                break
+            time.sleep(0.01)
+        self.assertEqual(0, app._abandoned_views)
+
+        self.assertEqual("True", call(app, "/fast")["body"])
+
+        app.log_exception = lambda exc_info: errors.append(exc_info[1])
+        errors = []
+        self.assertTrue(call(app, "/broken")["status"].startswith("500"))
+        self.assertEqual("broken view", str(errors[0]))
+
+
+class TestMemoryProfiler(unittest.TestCase):
+
+    def test_profile(self):
+        from feasp.feasp import Feasp
+        from feasp.memory import MemoryProfiler
+
+        app = Feasp(__file__)
+        cache = []
+
+        @app.route("/leak", methods=["GET"])
+        def leak():
+            cache.append(bytearray(256 * 1024))
+            temporary = bytearray(1024 * 1024)
+            return str(len(temporary))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dump_path = os.path.join(tmpdir, "memory.json")
+            app.memory_profiler = MemoryProfiler(sample_rate=1.0, dump_path=dump_path, dump_interval=60)
+            app.add_memory_endpoint("/_debug/memory")
+            for _ in range(2):
+                self.assertEqual("200 OK", call(app, "/leak")["status"])
+
+            stats = json.loads(call(app, "/_debug/memory")["body"])["endpoints"]["leak"]
+            self.assertEqual(2, stats["samples"])
+            # 临时分配只计入峰值，缓存的分配在视图返回后仍未释放
+            self.assertGreaterEqual(stats["peak_max"], 1024 * 1024)
+            self.assertGreaterEqual(stats["retained_avg"], 256 * 1024)
+            self.assertLess(stats["retained_avg"], 1024 * 1024)
+            self.assertIn(f"{__file__}:", stats["top_sites"][0]["site"])
+
+            app.memory_profiler.dump()
+            with open(dump_path, encoding="utf-8") as fp:
+                self.assertEqual(3, json.load(fp)["samples"])
+
+        # 采样率为0时不跟踪
+        app.memory_profiler = MemoryProfiler(sample_rate=0.0)
+        call(app, "/leak")
+        self.assertEqual(0, app.memory_profiler.samples)
+
+
+class TestBackground(unittest.TestCase):
+
+    def test_after_response(self):
+        from feasp.feasp import Feasp
+
+        app = Feasp(__file__)
+        done = []
+
+        @app.route("/signup", methods=["POST"])
+        def signup():
+            app.background(done.append, "mail")
+            return "ok"
+
+        environ = {"REQUEST_METHOD": "POST", "PATH_INFO": "/signup", "HTTP_HOST": "127.0.0.1:8000",
+                   "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(b""), "CONTENT_LENGTH": ""}
+        body = app.wsgi_apl(environ, lambda status, headers: None)
+        self.assertEqual(b"ok", b"".join(body))
+        # 服务器调用close（正文发送完毕）之前任务不会执行
+        time.sleep(0.05)
+        self.assertEqual([], done)
+        body.close()
+        self.assertTrue(app.background_queue.drain(5))
+        self.assertEqual(["mail"], done)
+        self.assertEqual(1, app.background_queue.completed)
+
+    def test_outside_request(self):
+        from feasp.feasp import Feasp
+
+        app = Feasp(__file__)
+        done = []
+        # 不在请求中提交的任务立即进入线程池
+        app.background(done.append, "startup")
+        self.assertTrue(app.background_queue.drain(5))
+        self.assertEqual(["startup"], done)
+
+    def test_bounded_queue(self):
+        from contextlib import redirect_stderr
+        from feasp.background import BackgroundQueue
+        from feasp.config import BackgroundQueueFull
+
+        queue = BackgroundQueue(max_workers=1, max_queue=1)
+        release, threads = threading.Event(), []
+        queue.submit(release.wait, 5)
+        # 队列已满：立即拒绝，任务不会在提交线程中执行
+        with self.assertRaises(BackgroundQueueFull):
+            queue.submit(lambda: threads.append(threading.current_thread()))
+        self.assertEqual((1, 1, []), (queue.pending, queue.rejected, threads))
+
+        # 设置了submit_timeout时等待空位
+        queue.submit_timeout = 5
+        threading.Timer(0.05, release.set).start()
+        queue.submit(lambda: threads.append(threading.current_thread())).result(5)
+        self.assertTrue(queue.drain(5))
+        self.assertNotEqual(threading.current_thread(), threads[0])
+
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            queue.submit(lambda: 1 / 0)
+            self.assertTrue(queue.shutdown(5))
+        self.assertIn("ZeroDivisionError", stderr.getvalue())
+        self.assertEqual((2, 1, 1), (queue.completed, queue.failed, queue.max_pending))
+        # 关闭后提交的任务被拒绝
+        with self.assertRaises(RuntimeError):
+            queue.submit(threads.append, None)
+        self.assertEqual(1, len(threads))
+
+    def test_process_pool(self):
+        from concurrent.futures import ProcessPoolExecutor
+        from feasp.background import BackgroundQueue
+
+        with ProcessPoolExecutor(1) as executor:
+            queue = BackgroundQueue(executor=executor)
+            # 在另一个进程中执行CPU密集的任务
+            self.assertNotEqual(os.getpid(), queue.submit(os.getpid).result(30))
+            self.assertTrue(queue.shutdown(30))
+        self.assertEqual(1, queue.completed)
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_batch(self):
+        from feasp.feasp import Feasp, request
+
+        app = Feasp(__file__)
+        app.add_batch_endpoint("/batch")
+        counter = []
+
+        @app.route("/api/user", methods=["GET"])
+        def user():
+            return {"query": request.url_args, "cookie": request.cookies.get("token")}
+
+        @app.route("/api/incr", methods=["POST"])
+        def incr():
+            counter.append(json.loads(request.data)["n"])
+            return {"count": sum(counter)}
+
+        @app.route("/api/count", methods=["GET"])
+        def count():
+            return str(sum(counter))
+
+        items = [
+            {"method": "GET", "path": "/api/user?id=1"},
+            {"method": "GET", "path": "/api/count"},
+            {"method": "POST", "path": "/api/incr", "body": {"n": 2}},
+            {"method": "GET", "path": "/api/count"},
+            {"method": "GET", "path": "/missing"},
+            {"method": "POST", "path": "/batch", "body": []},
+        ]
+        body = json.dumps(items).encode()
+        environ = {"REQUEST_METHOD": "POST", "PATH_INFO": "/batch", "HTTP_HOST": "127.0.0.1:8000",
+                   "HTTP_COOKIE": "token=abc", "wsgi.url_scheme": "http",
+                   "wsgi.input": io.BytesIO(body), "CONTENT_LENGTH": str(len(body))}
+        statuses = []
+        result = json.loads(b"".join(app.wsgi_apl(environ, lambda s, h: statuses.append(s))))
+        self.assertEqual("200 OK", statuses[0])
+        self.assertEqual({"query": "id=1", "cookie": "abc"}, result[0]["body"])
+        # 写操作之前与之后的读操作分别看到写入前后的结果
+        self.assertEqual(["0", {"count": 2}, "2"], [r["body"] for r in result[1:4]])
+        self.assertEqual([404, 400], [r["status"] for r in result[4:]])
+
+        environ["wsgi.input"], environ["CONTENT_LENGTH"] = io.BytesIO(b"{}"), "2"
+        b"".join(app.wsgi_apl(environ, lambda s, h: statuses.append(s)))
+        self.assertTrue(statuses[1].startswith("400"))
+
+    def test_batch_session(self):
+        from feasp.feasp import Feasp, session
+        from feasp.sessions import SessionInterface, MemorySessionStore
+
+        app = Feasp(__file__)
+        store = MemorySessionStore()
+        app.session_interface = SessionInterface("secret key", store)
+        app.add_batch_endpoint("/batch")
+
+        @app.route("/login", methods=["POST"])
+        def login():
+            session["user"] = "XueFeng"
+            return "ok"
+
+        @app.route("/whoami", methods=["GET"])
+        def whoami():
+            return str(session.get("user"))
+
+        items = [{"method": "POST", "path": "/login"}, {"method": "GET", "path": "/whoami"},
+                 {"method": "GET", "path": "/whoami"}]
+        body = json.dumps(items).encode()
+        environ = {"REQUEST_METHOD": "POST", "PATH_INFO": "/batch", "HTTP_HOST": "127.0.0.1:8000",
+                   "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(body), "CONTENT_LENGTH": str(len(body))}
+        headers = []
+        result = json.loads(b"".join(app.wsgi_apl(environ, lambda s, h: headers.extend(h))))
+        # 子请求共享同一个会话，Set-Cookie只出现在外层响应中
+        self.assertEqual(["ok", "XueFeng", "XueFeng"], [r["body"] for r in result])
+        self.assertFalse(any("Set-Cookie" in r["headers"] for r in result))
+        cookies = [value for key, value in headers if key == "Set-Cookie"]
+        self.assertEqual(1, len(cookies))
+        self.assertTrue(cookies[0].startswith("feasp_session=") and "HttpOnly" in cookies[0])
+        self.assertEqual(1, len(store))
+
+    def test_batch_stream(self):
+        from feasp.feasp import Feasp, event_stream
+        from feasp.sse import EventHub
+
+        app = Feasp(__file__)
+        app.add_batch_endpoint("/batch")
+        hub = EventHub()
+
+        @app.route("/events", methods=["GET"])
+        def events():
+            return event_stream(hub)
+
+        body = json.dumps([{"method": "GET", "path": "/events"}]).encode()
+        environ = {"REQUEST_METHOD": "POST", "PATH_INFO": "/batch", "HTTP_HOST": "127.0.0.1:8000",
+                   "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(body), "CONTENT_LENGTH": str(len(body))}
+        # 流式子响应不会被读取，批量请求立即返回
+        result = json.loads(b"".join(app.wsgi_apl(environ, lambda s, h: None)))
+        self.assertEqual(400, result[0]["status"])
+        self.assertIn("streaming", result[0]["body"])
+        self.assertEqual(0, hub.subscribers)
+
+
+class TestStreamTemplate(unittest.TestCase):
+
+    def test_errors_before_response(self):
+        from contextlib import redirect_stderr
+        from feasp.feasp import Feasp, stream_template
+        from feasp.template import TemplateLoader
+
+        app = Feasp(__file__)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "list.html"), "w", encoding="utf-8") as fp:
+                fp.write("{% For n in items %}{{ n }}{% Endfor %}")
+            with open(os.path.join(tmpdir, "broken.html"), "w", encoding="utf-8") as fp:
+                fp.write("{% For n in items %}")
+            app.template_loader = TemplateLoader(tmpdir)
+
+            for name in ("list", "missing", "broken"):
+                app.route(f"/{name}", methods=["GET"])(
+                    lambda name=name: stream_template(f"{name}.html", items=[1, 2]))
+
+            self.assertEqual({"status": "200 OK", "body": "12"}, call(app, "/list"))
+            # 模板不存在或有语法错误时在发送响应之前就返回500，而不是在正文中途抛出异常
+            with redirect_stderr(io.StringIO()):
+                self.assertTrue(call(app, "/missing")["status"].startswith("500"))
+                self.assertTrue(call(app, "/broken")["status"].startswith("500"))
+
+
+class TestEventStream(unittest.TestCase):
+
+    def test_hub(self):
+        from feasp.sse import EventHub
+
+        hub = EventHub(history=2)
+        for i in range(3):
+            hub.publish({"n": i})
+        events = hub.subscribe(last_event_id=0, heartbeat=0.01)
+        # 只保留了最近2个事件
+        self.assertEqual('id: 2\ndata: {"n": 1}\n\nid: 3\ndata: {"n": 2}\n\n', next(events))
+        self.assertEqual(": keep-alive\n\n", next(events))
+        hub.publish("line1\nline2", event="note")
+        self.assertEqual("id: 4\nevent: note\ndata: line1\ndata: line2\n\n", next(events))
+        hub.close()
+        self.assertEqual([], list(events))
+        self.assertEqual(0, hub.subscribers)
+
+    def test_stream(self):
+        import http.client
+        from feasp.feasp import Feasp, event_stream
+        from feasp.sse import EventHub
+
+        app = Feasp(__file__)
+        hub = EventHub()
+
+        @app.route("/events", methods=["GET"])
+        def events():
+            return event_stream(hub, retry=1000)
+
+        hub.publish("first")
+        hub.publish("second")
+        server = make_server("127.0.0.1", 0, app.wsgi_apl, type(
+            "Server", (socketserver.ThreadingMixIn, WSGIServer), {"daemon_threads": True}), AccessLogHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=5)
+            conn.request("GET", "/events", headers={"Last-Event-ID": "1"})
+            response = conn.getresponse()
+            self.assertEqual("text/event-stream; charset=utf-8", response.getheader("Content-Type"))
+            self.assertEqual("no-cache", response.getheader("Cache-Control"))
+            self.assertEqual(b"retry: 1000\n", response.readline())
+            response.readline()
+            # 从Last-Event-ID之后的事件开始补发
+            self.assertEqual(b"id: 2\n", response.readline())
+            self.assertEqual(b"data: second\n", response.readline())
+            response.readline()
+            hub.publish("third")
+            self.assertEqual(b"id: 3\n", response.readline())
+            hub.close()
+            conn.close()
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,106 @@
+import io
+import os
+import time
+import tempfile
+import unittest
+
+from feasp.feasp import Feasp, session
+from feasp.sessions import SessionInterface, MemorySessionStore, SqliteSessionStore
+
+
+def call(app, path, cookie=None):
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "HTTP_HOST": "127.0.0.1:8000",
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(b""),
+        "CONTENT_LENGTH": "",
+    }
+    if cookie is not None:
+        environ["HTTP_COOKIE"] = cookie
+    result = {}
+
+    def start_response(status, headers):
+        result["status"], result["headers"] = status, headers
+
+    result["body"] = b"".join(app.wsgi_apl(environ, start_response)).decode()
+    return result
+
+
+class TestSession(unittest.TestCase):
+
+    def make_app(self, store):
+        app = Feasp(__name__)
+        app.session_interface = SessionInterface("secret", store)
+
+        @app.route("/login", methods=["GET"])
+        def login():
+            session["username"] = "Lns-XueFeng"
+            return "login"
+
+        @app.route("/whoami", methods=["GET"])
+        def whoami():
+            return str(session.get("username"))
+
+        @app.route("/plain", methods=["GET"])
+        def plain():
+            return "plain"
+
+        return app
+
+    def get_cookie(self, result):
+        cookies = [v for k, v in result["headers"] if k == "Set-Cookie"]
+        return cookies[0].split(';')[0] if cookies else None
+
+    def check_store(self, store):
+        app = self.make_app(store)
+        cookie = self.get_cookie(call(app, "/login"))
+        self.assertTrue(cookie.startswith("feasp_session="))
+        self.assertNotIn("Lns-XueFeng", cookie)
+        self.assertEqual("Lns-XueFeng", call(app, "/whoami", cookie)["body"])
+        # 未修改会话的请求不会写回存储，也不会设置cookie
+        self.assertIsNone(self.get_cookie(call(app, "/whoami", cookie)))
+        self.assertIsNone(self.get_cookie(call(app, "/plain", cookie)))
+        # 篡改过的会话ID会被忽略
+        self.assertEqual("None", call(app, "/whoami", cookie[:-2] + "xx")["body"])
+
+    def test_memory_store(self):
+        self.check_store(MemorySessionStore())
+
+    def test_sqlite_store(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self.check_store(SqliteSessionStore(os.path.join(tmpdir, "session.db")))
+
+    def check_sliding(self, store, set_expires):
+        app = self.make_app(store)
+        cookie = self.get_cookie(call(app, "/login"))
+        sid = cookie.split("=", 1)[1].rsplit(".", 1)[0]
+        # 剩余时间超过ttl的一半时不刷新
+        self.assertIsNone(self.get_cookie(call(app, "/whoami", cookie)))
+        # 剩余时间不足一半时，访问会话的请求延长过期时间并刷新Cookie
+        set_expires(sid, time.time() + 60)
+        self.assertEqual(cookie, self.get_cookie(call(app, "/whoami", cookie)))
+        self.assertGreater(store.load_entry(sid)[1], time.time() + 86000)
+        self.assertEqual({"username": "Lns-XueFeng"}, store.load(sid))
+
+        app.session_interface.sliding = False
+        set_expires(sid, time.time() + 60)
+        self.assertIsNone(self.get_cookie(call(app, "/whoami", cookie)))
+
+    def test_sliding_expiry(self):
+        store = MemorySessionStore()
+        self.check_sliding(store, lambda sid, expires: store._data.update({sid: (store._data[sid][0], expires)}))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = SqliteSessionStore(os.path.join(tmpdir, "session.db"))
+            self.check_sliding(store, lambda sid, expires: store._get_conn().execute(
+                "UPDATE feasp_session SET expires = ? WHERE sid = ?", (expires, sid)))
+
+    def test_memory_store_lru(self):
+        store = MemorySessionStore(maxsize=2)
+        for sid in ("a", "b", "c"):
+            store.save(sid, {"sid": sid}, 60)
+        self.assertIsNone(store.load("a"))
+        self.assertEqual({"sid": "c"}, store.load("c"))
+        store.save("d", {}, -1)
+        self.assertIsNone(store.load("d"))
@@ -35,3 +35,141 @@ class TestSimpleSqlite(unittest.TestCase):
             handler.update("Student", {"Name": "Lns-XueFeng"}, ("Name", "Lns_XueFeng"))
             result = handler.fetch_all("Student")
         self.assertEqual(result, [('Lns-XueFeng', 22), ('XueFeng', 22), ('XueXue', 25), ('XueLian', 28)])
+
+    def test_write_behind(self):
+        import os
+        import tempfile
+        import threading
+        from feasp.write_queue import WriteBehindQueue
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_name = os.path.join(tmpdir, "test.db")
+            with connect(db_name) as handler:
+                handler.create_table("Student", ["Name", "Age"])
+
+            write_queue = WriteBehindQueue(db_name, batch_size=64, max_latency=0.01)
+            futures = []
+
+            def submit(start):
+                for i in range(start, start + 50):
+                    futures.append(write_queue.submit("INSERT INTO Student VALUES (?, ?)", (f"XueFeng{i}", i)))
+
+            threads = [threading.Thread(target=submit, args=(i * 50,)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            bad = write_queue.submit("INSERT INTO NotExists VALUES (?)", (1,))
+            self.assertTrue(write_queue.flush(timeout=5))
+            write_queue.close()
+            with self.assertRaises(RuntimeError):
+                write_queue.submit("INSERT INTO Student VALUES (?, ?)", ("XueXue", 25))
+
+            self.assertTrue(all(f.result() for f in futures))
+            self.assertIsNotNone(bad.exception())
+            self.assertLess(write_queue.commits, 200)
+            with connect(db_name) as handler:
+                self.assertEqual(200, len(handler.fetch_all("Student")))
+
+    def test_write_queue_failure(self):
+        import os
+        import io
+        import tempfile
+        from contextlib import redirect_stderr
+        from feasp.write_queue import WriteBehindQueue
+
+        with tempfile.TemporaryDirectory() as tmpdir, redirect_stderr(io.StringIO()):
+            # 无法打开数据库：写线程退出，之后的提交立即失败
+            write_queue = WriteBehindQueue(os.path.join(tmpdir, "missing", "test.db"))
+            write_queue._thread.join(5)
+            with self.assertRaises(RuntimeError):
+                write_queue.flush()
+
+            # 写线程在执行中途出错：当前批次与队列中的写操作都以该异常失败
+            write_queue = WriteBehindQueue(os.path.join(tmpdir, "test.db"), max_latency=0.05)
+
+            def broken(conn, cursor, batch):
+                raise ValueError("broken writer")
+
+            write_queue._write_batch = broken
+            futures = [write_queue.submit("SELECT 1") for _ in range(3)]
+            for future in futures:
+                self.assertIsInstance(future.exception(timeout=5), ValueError)
+            write_queue._thread.join(5)
+            with self.assertRaises(RuntimeError):
+                write_queue.submit("SELECT 1")
+            write_queue.close()
+
+    def test_search(self):
+        with connect(":memory:") as handler:
+            handler.create_table("Article", ["Title", "Body"])
+            handler.insert("Article", ("Feasp", "a simple web framework based on wsgi"))
+            handler.create_search_index("Article", ["Title", "Body"])
+            handler.insert_many("Article", [("Sqlite", "full text search with fts5"),
+                                            ("Template", "a template engine for the web")])
+            handler.update("Article", {"Body": "an embedded database"}, ("Title", "Sqlite"))
+
+            result = handler.search("Article", "web")
+            self.assertEqual(["Feasp", "Template"], sorted(row[0] for row in result))
+            self.assertIn("<b>web</b>", result[0][-1])
+            self.assertEqual([], handler.search("Article", "fts5"))
+            self.assertEqual("Sqlite", handler.search("Article", "embedded")[0][0])
+            self.assertEqual(2, len(handler.search("Article", "web OR database", raw=True, limit=2)))
+            handler.delete("Article", {"Title": "Feasp"})
+            self.assertEqual(1, len(handler.search("Article", 'web "')))
+
+    def test_import_export(self):
+        import io
+
+        with connect(":memory:") as handler:
+            handler.create_table("Student", ["Name", "Age"])
+            csv_file = io.StringIO("Name,Age\r\n" + "".join(f"XueFeng{i},{i}\r\n" for i in range(2500)))
+            self.assertEqual(2500, handler.import_csv("Student", csv_file, batch_size=1000))
+            ndjson_file = io.StringIO('{"Name": "XueXue", "Age": 25}\n')
+            self.assertEqual(1, handler.import_ndjson("Student", ndjson_file))
+
+            chunks = list(handler.export_csv("Student", batch_size=1000))
+            self.assertEqual(3, len(chunks))
+            self.assertTrue(chunks[0].startswith("Name,Age\r\nXueFeng0,0\r\n"))
+
+            # 写入文件对象时返回导出的行数
+            self.assertEqual(2501, handler.export_csv("Student", io.StringIO(), batch_size=1000))
+            out = io.StringIO()
+            self.assertEqual(2501, handler.export_ndjson("Student", out))
+            lines = out.getvalue().splitlines()
+            self.assertEqual(2501, len(lines))
+            self.assertEqual('{"Name": "XueXue", "Age": 25}', lines[-1])
+
+    def test_row_class(self):
+        import json
+        from feasp.feasp import _json_default, make_row_class
+        from feasp.template import FeaspTemplate
+
+        with connect(":memory:", row_class=True) as handler:
+            handler.create_table("Student", ["Name", "Age"])
+            handler.insert_many("Student", [("XueFeng", 22), ("XueXue", 25)])
+            result = handler.fetch_all("Student")
+
+        student = result[0]
+        self.assertEqual(("XueFeng", 22), (student.Name, student.Age))
+        self.assertEqual("XueFeng", student[0])
+        self.assertEqual(("XueFeng", 22), student)
+        self.assertIs(type(student), type(result[1]))
+        self.assertFalse(hasattr(student, "__dict__"))
+        self.assertEqual('[{"Name": "XueFeng", "Age": 22}, {"Name": "XueXue", "Age": 25}]',
+                         json.dumps(result, default=_json_default))
+        html = "{% For s in students %}{{ s.Name }}:{{ s.Age }};{% Endfor %}"
+        self.assertEqual("XueFeng:22;XueXue:25;", FeaspTemplate(html, {"students": result}).render())
+
+        # 重复的列名与行类自身的属性名被重命名，不会丢失列
+        row = make_row_class("R", ("id", "id", "id_1", "_fields", "class", "__init__"))(0, 1, 2, 3, 4, 5)
+        self.assertEqual(("id", "id_1", "id_1_2", "_fields_3", "class_", "column_5"), row._fields)
+        self.assertEqual((0, 1, 2, 3, 4, 5), tuple(row))
+
+        # 表中的snippet列与搜索结果的匹配片段同时保留
+        with connect(":memory:", row_class=True) as handler:
+            handler.create_table("Note", ["Title", "snippet"])
+            handler.insert("Note", ("Feasp", "short"))
+            handler.create_search_index("Note", ["Title"])
+            row = handler.search("Note", "Feasp")[0]
+        self.assertEqual(("Feasp", "short", "<b>Feasp</b>"), (row.Title, row.snippet, row.snippet_2))
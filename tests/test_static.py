@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+from feasp.static import StaticManifest
+from feasp.assets import AssetBundler, minify_css, minify_js
+
+
+class TestStatic(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.write("style.css", b".title { color: red; }")
+        self.write("img/head.png", b"\x89PNG")
+        self.manifest = StaticManifest()
+        self.manifest.mount("static", "/static", self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fp:
+            fp.write(content)
+
+    def test_manifest(self):
+        self.assertFalse(self.manifest.is_static("/api/style.css"))
+        self.assertTrue(self.manifest.is_static("/static/style.css"))
+        entry = self.manifest.lookup("/static/img/head.png")
+        self.assertEqual("image/png", entry.mimetype)
+        self.assertEqual(4, entry.size)
+        self.assertEqual(b"\x89PNG", self.manifest.read(entry))
+        self.assertIsNone(self.manifest.lookup("/static/../test_static.py"))
+        self.assertIsNone(self.manifest.url_for("assets", "style.css"))
+
+    def test_refresh(self):
+        entry = self.manifest.lookup("/static/style.css")
+        self.manifest.read(entry)
+        self.write("my_js.js", b"let a = 1;")
+        self.manifest.refresh()
+        self.assertIsNotNone(self.manifest.lookup("/static/my_js.js"))
+        # 未修改的文件保留已缓存的内容
+        self.assertIs(entry, self.manifest.lookup("/static/style.css"))
+
+    def test_fingerprint(self):
+        url = self.manifest.url_for("static", "style.css")
+        self.assertRegex(url, r"^/static/style\.[0-9a-f]{8}\.css$")
+        entry = self.manifest.lookup(url)
+        self.assertIs(entry, self.manifest.lookup("/static/style.css"))
+        self.assertTrue(self.manifest.is_immutable(url, entry))
+        self.assertFalse(self.manifest.is_immutable("/static/style.css", entry))
+        # 内容改变后哈希随之改变，旧的URL不再有效
+        self.write("style.css", b".title { color: blue; }")
+        os.utime(os.path.join(self.tmpdir.name, "style.css"), (0, 0))
+        self.manifest.refresh()
+        self.assertNotEqual(url, self.manifest.url_for("static", "style.css"))
+        self.assertIsNone(self.manifest.lookup(url))
+
+        plain = StaticManifest(fingerprint=False)
+        plain.mount("static", "/static", self.tmpdir.name)
+        self.assertEqual("/static/style.css", plain.url_for("static", "style.css"))
+
+    def test_bundle(self):
+        self.write("a.js", b"// first\nlet a = 1 /* one */ ;\nlet s = 'x  // y';")
+        self.write("b.js", b"a ++\nb = /[/]*/g.test(s)")
+        self.manifest.refresh()
+        bundler = AssetBundler(self.manifest)
+        bundler.add("site.js", ["a.js", "b.js"])
+        bundler.add("site.css", ["style.css"])
+        self.assertRegex(bundler.url_for("site.js"), r"^/static/site\.[0-9a-f]{8}\.js$")
+        self.assertEqual('<link rel="stylesheet" href="%s">' % bundler.url_for("site.css"), bundler.tag("site.css"))
+        entry = self.manifest.lookup(bundler.url_for("site.js"))
+        self.assertEqual(b"let a=1;let s='x  // y';;a++\nb=/[/]*/g.test(s)", self.manifest.read(entry))
+
+        # 源文件修改后，刷新清单时重新打包
+        old_url = bundler.url_for("site.css")
+        self.write("style.css", b".title { color: blue; }")
+        os.utime(os.path.join(self.tmpdir.name, "style.css"), (0, 0))
+        self.manifest.refresh()
+        self.assertNotEqual(old_url, bundler.url_for("site.css"))
+        self.assertEqual(b".title{color:blue}", self.manifest.read(self.manifest.lookup(bundler.url_for("site.css"))))
+
+    def test_minify(self):
+        self.assertEqual('.a>b,.c{content:"a  /* x */ ;}"}@media (max-width:600px){.x{margin:0 auto}}',
+                         minify_css('/* c */ .a > b , .c { content: "a  /* x */ ;}" ; }\n'
+                                    '@media (max-width: 600px) { .x { margin: 0 auto; } }'))
+        self.assertEqual("return/a/.test(x)\nx=y/2/z\nvar c=a- -1",
+                         minify_js("return /a/.test(x)\nx = y / 2 / z\nvar c = a - -1"))
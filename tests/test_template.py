@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+
+from feasp.config import TemplateSyntaxError
+from feasp.template import FeaspTemplate, TemplateLoader, BytecodeCache, Markup, escape
+from feasp.template import LRUFragmentCache, SqliteFragmentCache
+
+
+class TestTemplate(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.loader = TemplateLoader(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, text):
+        with open(os.path.join(self.tmpdir.name, name), 'w', encoding="utf-8") as fp:
+            fp.write(text)
+
+    def test_literal_braces(self):
+        t = FeaspTemplate("<style>h1 { color: red; }</style>{{ name }}{}", {"name": "XueFeng"})
+        self.assertEqual("<style>h1 { color: red; }</style>XueFeng{}", t.render())
+
+    def test_nested_control(self):
+        html = ("{% For row in rows %}{% If row %}{% For c in row %}{{ c }}{% Endfor %}"
+                "{% Elif row == 0 %}zero{% Else %}none{% Endif %};{% Endfor %}")
+        t = FeaspTemplate(html, {"rows": ["ab", 0, None]})
+        self.assertEqual("ab;zero;none;", t.render())
+
+    def test_extends_and_include(self):
+        self.write("base.html", "<title>{% Block title %}Base{% Endblock %}</title>"
+                                "{% Include 'nav.html' %}{% Block content %}{% Endblock %}")
+        self.write("nav.html", "<nav>{{ user }}</nav>")
+        self.write("child.html", "{% Extends 'base.html' %}{% Block content %}Hello {{ user }}{% Endblock %}")
+        self.assertEqual("<title>Base</title><nav>XueFeng</nav>Hello XueFeng",
+                         self.loader.render("child.html", {"user": "XueFeng"}))
+        # 基础布局只会被编译一次
+        self.assertIs(self.loader.get_template("base.html"), self.loader.get_template("base.html"))
+
+    def test_include_in_for(self):
+        # 被包含的模板可以使用循环变量
+        self.write("row.html", "<li>{{ item }}{{ sep }}</li>")
+        self.write("list.html", "{% For item in items %}{% Include 'row.html' %}{% Endfor %}")
+        self.assertEqual("<li>a;</li><li>b;</li>", self.loader.render("list.html", {"items": ["a", "b"], "sep": ";"}))
+
+    def test_lambda(self):
+        t = FeaspTemplate("{{ sorted(items, key=lambda x, n=n: -x * n) }}|{{ (lambda *a, **k: len(a) + len(k))(1, b=2) }}",
+                          {"items": [1, 3, 2], "n": 1, "x": 100})
+        self.assertEqual("[3, 2, 1]|2", t.render())
+
+    def test_autoescape(self):
+        t = FeaspTemplate("{{ text }}|{{ safe }}|{{ '<br>' }}|{{ number }}",
+                          {"text": "<script>alert('x')</script>", "safe": Markup("<b>ok</b>"), "number": 1})
+        self.assertEqual("&lt;script&gt;alert(&#x27;x&#x27;)&lt;/script&gt;|<b>ok</b>|&lt;br&gt;|1", t.render())
+        self.assertEqual(Markup("&lt;a&gt; &amp;"), escape("<a> &"))
+
+        raw_loader = TemplateLoader(autoescape=False)
+        self.assertEqual("<i>", FeaspTemplate("{{ text }}", {"text": "<i>"}, loader=raw_loader).render())
+
+    def test_fragment_cache(self):
+        calls = []
+
+        def build_nav():
+            calls.append(1)
+            return "nav"
+
+        html = "{% Cache 'nav' 60 %}<nav>{{ build_nav() }}</nav>{% Endcache %}{{ name }}"
+        loader = TemplateLoader(fragment_cache=LRUFragmentCache(maxsize=2))
+        for name in ("XueFeng", "XueXue"):
+            t = FeaspTemplate(html, {"build_nav": build_nav, "name": name}, loader=loader)
+            self.assertEqual(f"<nav>nav</nav>{name}", t.render())
+        self.assertEqual(1, len(calls))
+
+    def test_fragment_cache_keys(self):
+        # 键为表达式：循环变量与上下文变量的不同取值各自缓存
+        html = "{% For i in xs %}{% Cache i %}{{ i }}{% Endcache %}{% Endfor %}"
+        self.assertEqual("121", FeaspTemplate(html, {"xs": [1, 2, 1]}, loader=self.loader).render())
+        html = "{% Cache user_id 60 %}{{ name }}{% Endcache %}"
+        self.assertEqual("A", FeaspTemplate(html, {"user_id": 1, "name": "A"}, loader=self.loader).render())
+        self.assertEqual("B", FeaspTemplate(html, {"user_id": 2, "name": "B"}, loader=self.loader).render())
+        self.assertEqual("A", FeaspTemplate(html, {"user_id": 1, "name": "x"}, loader=self.loader).render())
+
+        # 不同模板中的同名键互不覆盖，包括不同的模板字符串
+        self.write("one.html", "{% Cache 'nav' %}one{% Endcache %}")
+        self.write("two.html", "{% Cache 'nav' %}two{% Endcache %}")
+        self.assertEqual("one", self.loader.render("one.html"))
+        self.assertEqual("two", self.loader.render("two.html"))
+        self.assertEqual("1", FeaspTemplate("{% Cache 'nav' %}1{% Endcache %}", loader=self.loader).render())
+        self.assertEqual("2", FeaspTemplate("{% Cache 'nav' %}2{% Endcache %}", loader=self.loader).render())
+
+    def test_shared_fragment_cache(self):
+        backend = SqliteFragmentCache(os.path.join(self.tmpdir.name, "fragment.db"))
+        LRUFragmentCache(backend=backend).set("footer", "<footer></footer>", 60)
+        # 另一个进程的本地缓存未命中时从共享的后端读取
+        self.assertEqual("<footer></footer>", LRUFragmentCache(backend=backend).get("footer"))
+        backend.set("expired", "x", -1)
+        self.assertIsNone(backend.get("expired"))
+
+    def test_stream(self):
+        self.write("list.html", "{% For name in name_list %}<h2>{{ name }}</h2>{% Endfor %}")
+        name_list = [str(i) for i in range(100)]
+        chunks = list(self.loader.stream("list.html", {"name_list": name_list}, chunk_size=64))
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) >= 64 for chunk in chunks[:-1]))
+        self.assertEqual(self.loader.render("list.html", {"name_list": name_list}), "".join(chunks))
+
+    def test_precompile_and_bytecode_cache(self):
+        self.write("index.html", "<h1>Hello {{ name }}</h1>")
+        cache_dir = os.path.join(self.tmpdir.name, "cache")
+        loader = TemplateLoader(self.tmpdir.name, bytecode_cache=BytecodeCache(cache_dir))
+        self.assertIn("index.html", loader.precompile())
+        self.assertEqual(1, len(os.listdir(cache_dir)))
+
+        # 新的进程（此处用新的loader模拟）直接加载缓存的代码对象
+        other = TemplateLoader(self.tmpdir.name, bytecode_cache=BytecodeCache(cache_dir))
+        self.assertIsNotNone(other.bytecode_cache.load("index.html", "<h1>Hello {{ name }}</h1>"))
+        self.assertEqual("<h1>Hello XueFeng</h1>", other.render("index.html", {"name": "XueFeng"}))
+
+    def test_syntax_error(self):
+        with self.assertRaises(TemplateSyntaxError):
+            FeaspTemplate("{% For name in name_list %}{{ name }}")
+        with self.assertRaises(TemplateSyntaxError):
+            FeaspTemplate("{% Unknown %}")